@@ -1,19 +1,49 @@
+from marshal import dump, load
+from os import rename, stat
+from os.path import exists
 from sys import maxsize
 
-from enigma import eActionMap
+from enigma import eActionMap, eTimer
 
+import keyids
 from keyids import KEYIDS
 from Components.config import config
-from Tools.Directories import fileReadXML
+from Tools.Directories import SCOPE_CONFIG, fileReadXML, resolveFilename
 
 MODULE_NAME = __name__.split(".")[-1]
 
-keyBindings = {}
+KEYMAP_CACHE = "keymap_cache.bin"
+KEYMAP_CACHE_VERSION = 1
+KEYMAP_CACHE_DELAY = 30000  # Delay in ms before new key map cache data is written.
+
+keyBindings = {}  # Dictionary of (context, mapto): [(keyId, filename, flags)].
+keyContexts = {}  # Dictionary of context: {mapto: None} of the keyBindings.
+keyFilenames = {}  # Dictionary of filename: {(context, mapto): None} of the keyBindings.
 unmapDict = {}
+keymapCache = None  # Dictionary of filename: (signature, replace, operations) of the compiled key maps.
+keymapCacheTimer = None
 
 
 def addKeyBinding(filename, keyId, context, mapto, flags):
 	keyBindings.setdefault((context, mapto), []).append((keyId, filename, flags))
+	keyContexts.setdefault(context, {})[mapto] = None
+	keyFilenames.setdefault(filename, {})[(context, mapto)] = None
+
+
+def forgetKeyBindings(contextAction, removed, remaining):  # Update the indexes after some bindings of a context action were removed.
+	if not remaining:
+		mappings = keyContexts.get(contextAction[0])
+		if mappings is not None:
+			mappings.pop(contextAction[1], None)
+			if not mappings:
+				del keyContexts[contextAction[0]]
+	filenames = set(x[1] for x in remaining)
+	for filename in set(x[1] for x in removed) - filenames:
+		contextActions = keyFilenames.get(filename)
+		if contextActions is not None:
+			contextActions.pop(contextAction, None)
+			if not contextActions:
+				del keyFilenames[filename]
 
 
 def queryKeyBinding(context, mapto):  # Returns a list of (keyId, flags) for a specified mapto action in a context.
@@ -27,39 +57,47 @@ def getKeyBindingKeys(filterFunction=lambda key: True):
 
 
 def removeContext(context, actionMapInstance):  # Remove all entries for a context.
-	removeActions = []
-	for contxt, mapto in keyBindings:
-		if contxt == context:
-			contextAction = (context, mapto)
-			removeActions.append(contextAction)
-	for contextAction in removeActions:
-		if contextAction in keyBindings:
-			binding = keyBindings[contextAction]
-			actionMapInstance.unbindPythonKey(context, binding[0][0], contextAction[1])
-			del keyBindings[contextAction]
+	for mapto in list(keyContexts.get(context, ())):
+		contextAction = (context, mapto)
+		binding = keyBindings.pop(contextAction)
+		actionMapInstance.unbindPythonKey(context, binding[0][0], mapto)
+		forgetKeyBindings(contextAction, binding, [])
 
 
 def removeKeyBinding(keyId, context, mapto, wild=True):
 	if wild and mapto == "*":
-		for contxt, mapto in keyBindings.keys():
-			if contxt == context:
-				removeKeyBinding(keyId, context, mapto, False)
+		for mapto in list(keyContexts.get(context, ())):
+			removeKeyBinding(keyId, context, mapto, False)
 		return
 	contextAction = (context, mapto)
 	if contextAction in keyBindings:
-		bind = [x for x in keyBindings[contextAction] if x[0] != keyId]
+		binding = keyBindings[contextAction]
+		bind = [x for x in binding if x[0] != keyId]
 		if bind:
 			keyBindings[contextAction] = bind
 		else:
 			del keyBindings[contextAction]
+		forgetKeyBindings(contextAction, [x for x in binding if x[0] == keyId], bind)
 
 
 def removeKeyBindings(filename):  # Remove all entries of filename "domain".
-	for keyBinding in keyBindings:
-		keyBindings[keyBinding] = filter(lambda x: x[1] != filename, keyBindings[keyBinding])
+	for contextAction in list(keyFilenames.get(filename, ())):
+		binding = keyBindings[contextAction]
+		bind = [x for x in binding if x[1] != filename]
+		if bind:
+			keyBindings[contextAction] = bind
+		else:
+			del keyBindings[contextAction]
+		forgetKeyBindings(contextAction, [x for x in binding if x[1] == filename], bind)
 
 
 def parseKeymap(filename, context, actionMapInstance, device, domKeys):
+	operations, error = compileKeymap(filename, context, device, domKeys)
+	applyKeymap(filename, operations, False, actionMapInstance)
+
+
+def compileKeymap(filename, context, device, domKeys):  # Returns a list of the bind and unbind operations of the keys and if there were errors.
+	operations = []
 	unmapDict = {}
 	error = False
 	keyId = -1
@@ -118,13 +156,31 @@ def parseKeymap(filename, context, actionMapInstance, device, domKeys):
 		if not error:
 			if unmap is None:  # If a key was unmapped, it can only be assigned a new function in the same key map file (avoid file parsing sequence dependency).
 				if unmapDict.get((context, keyName, mapto)) in [filename, None]:
-					if config.crash.debugActionMaps.value:
-						print(f"[ActionMap] Context '{context}' keyName '{keyName}' ({keyId}) mapped to '{mapto}' (Device: {device.capitalize()}).")
-					actionMapInstance.bindKey(filename, device, keyId, flags, context, mapto)
-					addKeyBinding(filename, keyId, context, mapto, flags)
+					operations.append(("bind", device, keyId, flags, context, mapto, keyName))
 			else:
-				actionMapInstance.unbindPythonKey(context, keyId, unmap)
+				operations.append(("unbind", context, keyId, unmap))
 				unmapDict.update({(context, keyName, unmap): filename})
+	return operations, error
+
+
+def applyKeymap(filename, operations, replace, actionMapInstance):
+	for operation in operations:
+		action = operation[0]
+		if action == "bind":
+			device, keyId, flags, context, mapto, keyName = operation[1:]
+			if config.crash.debugActionMaps.value:
+				print(f"[ActionMap] Context '{context}' keyName '{keyName}' ({keyId}) mapped to '{mapto}' (Device: {device.capitalize()}).")
+			actionMapInstance.bindKey(filename, device, keyId, flags, context, mapto)
+			addKeyBinding(filename, keyId, context, mapto, flags)
+		elif action == "unbind":
+			actionMapInstance.unbindPythonKey(operation[1], operation[2], operation[3])
+		elif action == "context":
+			if replace and keyBindings:  # Remove all entries for an existing context.
+				removeContext(operation[1], actionMapInstance)
+		elif action == "toggle":
+			actionMapInstance.bindToggle(filename, operation[1], operation[2])
+		elif action == "translate":
+			actionMapInstance.bindTranslation(filename, *operation[1:])
 
 
 def getKeyId(id):
@@ -146,11 +202,16 @@ def getKeyId(id):
 
 
 def parseTrans(filename, actionmap, device, keys):
+	applyKeymap(filename, compileTrans(filename, device, keys), False, actionmap)
+
+
+def compileTrans(filename, device, keys):
+	operations = []
 	for toggle in keys.findall("toggle"):
 		get_attr = toggle.attrib.get
 		toggle_key = get_attr("from")
 		toggle_key = getKeyId(toggle_key)
-		actionmap.bindToggle(filename, device, toggle_key)
+		operations.append(("toggle", device, toggle_key))
 	for key in keys.findall("key"):
 		get_attr = key.attrib.get
 		keyin = get_attr("from")
@@ -161,33 +222,107 @@ def parseTrans(filename, actionmap, device, keys):
 		keyin = getKeyId(keyin)
 		keyout = getKeyId(keyout)
 		toggle = int(toggle)
-		actionmap.bindTranslation(filename, device, keyin, keyout, toggle)
+		operations.append(("translate", device, keyin, keyout, toggle))
+	return operations
+
+
+def readKeymapCache():
+	global keymapCache
+	if keymapCache is None:
+		keymapCache = {}
+		filename = resolveFilename(SCOPE_CONFIG, KEYMAP_CACHE)
+		try:
+			with open(filename, "rb") as fd:
+				version, cache = load(fd)
+			if version == KEYMAP_CACHE_VERSION:
+				keymapCache = cache
+				removed = [path for path in keymapCache if not exists(path)]  # Drop the key maps of removed files, like those of uninstalled plugins.
+				for path in removed:
+					del keymapCache[path]
+				if removed:
+					saveKeymapCache()
+		except FileNotFoundError:
+			pass
+		except Exception as err:
+			print(f"[ActionMap] Error: Unable to read key map cache '{filename}'!  ({err})")
+	return keymapCache
+
+
+def writeKeymapCache():
+	filename = resolveFilename(SCOPE_CONFIG, KEYMAP_CACHE)
+	try:
+		with open(f"{filename}.tmp", "wb") as fd:
+			dump((KEYMAP_CACHE_VERSION, keymapCache), fd)
+		rename(f"{filename}.tmp", filename)
+	except OSError as err:
+		print(f"[ActionMap] Error {err.errno}: Unable to write key map cache '{filename}'!  ({err.strerror})")
+
+
+def saveKeymapCache():
+	global keymapCacheTimer
+	if keymapCacheTimer is None:
+		keymapCacheTimer = eTimer()
+		keymapCacheTimer.callback.append(writeKeymapCache)
+	if not keymapCacheTimer.isActive():
+		keymapCacheTimer.start(KEYMAP_CACHE_DELAY, True)
+
+
+def getKeymapSignature(filename):  # The key ids are resolved while compiling so the cache also depends on keyids.
+	try:
+		status = stat(filename)
+		keyidsStatus = stat(keyids.__file__)
+	except OSError:
+		return None
+	return (status.st_mtime_ns, status.st_size, keyidsStatus.st_mtime_ns)
+
+
+def compileKeymapFile(filename):  # Returns (replace, operations) of the key map file or None if it can't be read.
+	signature = getKeymapSignature(filename)
+	cache = readKeymapCache()
+	entry = cache.get(filename)
+	if signature is None and cache.pop(filename, None):
+		saveKeymapCache()
+	if signature and entry and entry[0] == signature:
+		return entry[1], entry[2]
+	domKeymap = fileReadXML(filename, source=MODULE_NAME)
+	if domKeymap is None:
+		return None
+	errors = False
+	operations = []
+	for domMap in domKeymap.findall("map"):
+		context = domMap.attrib.get("context")
+		if context is None:
+			print(f"ActionMap] Error: All key map action maps in '{filename}' must have a context!")
+			errors = True
+		else:
+			operations.append(("context", context))
+			for device, domKeys in [("generic", domMap)] + [(domDevice.attrib.get("name"), domDevice) for domDevice in domMap.findall("device")]:
+				keys, error = compileKeymap(filename, context, device, domKeys)
+				operations.extend(keys)
+				errors = errors or error
+	for domMap in domKeymap.findall("translate"):
+		for domDevice in domMap.findall("device"):
+			operations.extend(compileTrans(filename, domDevice.attrib.get("name"), domDevice))
+	replace = domKeymap.get("load", "") == "replace"
+	if signature and not errors:  # Keep key maps with errors out of the cache so that the errors are reported every time.
+		cache[filename] = (signature, replace, operations)
+		saveKeymapCache()
+	return replace, operations
 
 
 def loadKeymap(filename, replace=False):
 	actionMapInstance = eActionMap.getInstance()
-	domKeymap = fileReadXML(filename, source=MODULE_NAME)
-	if domKeymap is not None:
-		replace = replace or (domKeymap.get("load", "") == "replace")
+	keymap = compileKeymapFile(filename)
+	if keymap is not None:
+		replace = replace or keymap[0]
 		print(f"[ActionMap] LoadKeymap '{filename}' with replace {replace}.")
-		for domMap in domKeymap.findall("map"):
-			context = domMap.attrib.get("context")
-			if context is None:
-				print(f"ActionMap] Error: All key map action maps in '{filename}' must have a context!")
-			else:
-				if replace and keyBindings:  # Remove all entries for an existing context.
-					removeContext(context, actionMapInstance)
-				parseKeymap(filename, context, actionMapInstance, "generic", domMap)
-				for domDevice in domMap.findall("device"):
-					parseKeymap(filename, context, actionMapInstance, domDevice.attrib.get("name"), domDevice)
-		for domMap in domKeymap.findall("translate"):
-			for domDevice in domMap.findall("device"):
-				parseTrans(filename, actionMapInstance, domDevice.attrib.get("name"), domDevice)
+		applyKeymap(filename, keymap[1], replace, actionMapInstance)
 
 
 def removeKeymap(filename):
 	actionMapInstance = eActionMap.getInstance()
 	actionMapInstance.unbindKeyDomain(filename)
+	removeKeyBindings(filename)
 
 
 class ActionMap:
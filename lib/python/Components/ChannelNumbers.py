@@ -0,0 +1,177 @@
+from os import listdir, stat
+from os.path import join
+from time import monotonic
+
+from enigma import eServiceCenter, eServiceReference
+
+from Components.config import config
+from Tools.Directories import SCOPE_CONFIG, resolveFilename
+
+BOUQUET_CHECK_INTERVAL = 5  # Minimum time in seconds between the checks of the bouquet and service list files.
+
+
+# Index of the services in the bouquets.  The channel numbers, the positions
+# of the playable services and the providers of a bouquet are collected the
+# first time they are needed and stay valid until the bouquets or the service
+# lists are reloaded or edited, at which point invalidate() must be called.
+# As bouquets can also be changed and reloaded by plugins and other programs,
+# the index is also dropped when the bouquet or service list files change.
+#
+class ChannelNumbers:
+	def __init__(self):
+		self.bouquets = {}  # Dictionary of bouquet: ({number: service}, number offset, [playable services], {service: position}, has streams, has alternatives).
+		self.lists = {}  # Dictionary of bouquet root: [bouquets].
+		self.roots = {}  # Dictionary of bouquet root: ([visible bouquets], {number: (service, bouquet)}).
+		self.providers = {}  # Dictionary of transponder provider root: {service: provider name}.
+		self.settings = None
+		self.files = None  # Tuple of (file name, mtime) of the bouquet and service list files.
+		self.checkTime = 0
+
+	def invalidate(self):
+		self.bouquets.clear()
+		self.lists.clear()
+		self.roots.clear()
+		self.providers.clear()
+
+	def checkSettings(self):
+		settings = (config.usage.multibouquet.value, config.usage.alternative_number_mode.value)
+		if settings != self.settings:
+			self.invalidate()
+			self.settings = settings
+		now = monotonic()
+		if now - self.checkTime >= BOUQUET_CHECK_INTERVAL:
+			self.checkTime = now
+			files = self.getFiles()
+			if files != self.files:
+				self.invalidate()
+				self.files = files
+
+	def getFiles(self):
+		path = resolveFilename(SCOPE_CONFIG)
+		files = []
+		try:
+			for name in sorted(listdir(path)):
+				if name.startswith(("bouquets.", "userbouquet.", "lamedb")):
+					files.append((name, stat(join(path, name)).st_mtime_ns))
+		except OSError:
+			pass
+		return tuple(files)
+
+	def getBouquet(self, bouquet):
+		self.checkSettings()
+		key = bouquet.toCompareString()
+		entry = self.bouquets.get(key)
+		if entry is None:
+			numbers = {}
+			offset = None
+			services = []
+			positions = {}
+			streams = False
+			alternatives = False
+			servicelist = eServiceCenter.getInstance().list(bouquet)
+			if servicelist:
+				service = servicelist.getNext()
+				while service.valid():
+					number = service.getChannelNum()
+					if number > 0:
+						if offset is None:
+							offset = number - 1
+						if number not in numbers:  # The first service with a number wins.
+							numbers[number] = service
+					if not service.flags & (eServiceReference.isMarker | eServiceReference.isDirectory):
+						services.append(service)
+						positions.setdefault(service.toCompareString(), len(services))
+						if service.flags & eServiceReference.isGroup:
+							alternatives = True
+						if "%3a//" in service.toString().lower():
+							streams = True
+					service = servicelist.getNext()
+			entry = self.bouquets[key] = (numbers, offset or 0, services, positions, streams, alternatives)
+		return entry
+
+	def getBouquets(self, root):  # Returns all bouquets of the root including the invisible ones.
+		self.checkSettings()
+		key = root.toCompareString()
+		bouquets = self.lists.get(key)
+		if bouquets is None:
+			bouquets = self.lists[key] = []
+			bouquetlist = eServiceCenter.getInstance().list(root)
+			if bouquetlist:
+				bouquet = bouquetlist.getNext()
+				while bouquet.valid():
+					if bouquet.flags & eServiceReference.isDirectory:
+						bouquets.append(bouquet)
+					bouquet = bouquetlist.getNext()
+		return bouquets
+
+	def getRoot(self, root):
+		self.checkSettings()
+		key = root.toCompareString()
+		entry = self.roots.get(key)
+		if entry is None:
+			bouquets = []
+			numbers = {}
+			for bouquet in self.getBouquets(root):
+				if not bouquet.flags & eServiceReference.isInvisible:
+					bouquets.append(bouquet)
+					for number, service in self.getBouquet(bouquet)[0].items():
+						if number not in numbers:
+							numbers[number] = (service, bouquet)
+			entry = self.roots[key] = (bouquets, numbers)
+		return entry
+
+	def getService(self, bouquet, number):
+		return self.getBouquet(bouquet)[0].get(number)
+
+	def getBouquetOffset(self, bouquet):
+		return self.getBouquet(bouquet)[1]
+
+	def getServices(self, bouquet):  # Returns the playable services of the bouquet.
+		return self.getBouquet(bouquet)[2]
+
+	def getServicePosition(self, bouquet, service):  # Returns the position of the service among the playable services of the bouquet or None.
+		return self.getBouquet(bouquet)[3].get(service.toCompareString())
+
+	def hasStreams(self, bouquet):
+		return self.getBouquet(bouquet)[4]
+
+	def hasAlternatives(self, bouquet):
+		return self.getBouquet(bouquet)[5]
+
+	def getProviderName(self, service):  # Returns the name of the provider of the service, "Unknown" for providers without a name or "" if the service has no provider.
+		from Screens.ChannelSelection import service_types_radio, service_types_tv
+		typestr = service.getData(0) in (2, 10) and service_types_radio or service_types_tv
+		pos = typestr.rfind(":")
+		key = f"{typestr[:pos + 1]} (channelID == {service.getUnsignedData(4):08x}{service.getUnsignedData(2):04x}{service.getUnsignedData(3):04x}) && {typestr[pos + 1:]} FROM PROVIDERS ORDER BY name"
+		providers = self.providers.get(key)
+		if providers is None:
+			providers = self.providers[key] = {}
+			serviceHandler = eServiceCenter.getInstance()
+			providerlist = serviceHandler.list(eServiceReference(key))
+			if providerlist:
+				provider = providerlist.getNext()
+				while provider.valid():
+					if provider.flags & eServiceReference.isDirectory:
+						info = serviceHandler.info(provider)
+						name = info and info.getName(provider) or "Unknown"
+						servicelist = serviceHandler.list(provider)
+						if servicelist:
+							providerService = servicelist.getNext()
+							while providerService.valid():
+								providers.setdefault(providerService.toCompareString(), name)
+								providerService = servicelist.getNext()
+					provider = providerlist.getNext()
+		return providers.get(service.toCompareString(), "")
+
+	def searchRoot(self, root, number, firstBouquetOnly=False):
+		# Returns the first service with the number in the visible bouquets
+		# of the root and the bouquet it was found in.
+		bouquets, numbers = self.getRoot(root)
+		if firstBouquetOnly:
+			if not bouquets:
+				return None, eServiceReference()
+			return self.getService(bouquets[0], number), bouquets[0]
+		return numbers.get(number, (None, eServiceReference()))
+
+
+channelNumbers = ChannelNumbers()
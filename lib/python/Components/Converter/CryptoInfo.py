@@ -3,22 +3,24 @@ from Components.Converter.Converter import Converter
 from Components.Element import cached
 from Components.config import config
 from enigma import iServiceInformation
-from Tools.GetEcmInfo import GetEcmInfo
+from Tools.GetEcmInfo import EcmInfoSubscriber, GetEcmInfo
 from Components.Converter.Poll import Poll
 
 
-class CryptoInfo(Poll, Converter):
+class CryptoInfo(EcmInfoSubscriber, Poll, Converter):
 	def __init__(self, type):
 		Converter.__init__(self, type)
 		Poll.__init__(self)
+		EcmInfoSubscriber.__init__(self)
 
 		self.type = type
 		self.active = False
 		self.visible = config.usage.show_cryptoinfo.value
 		self.textvalue = ""
-		self.poll_interval = 1000
+		self.poll_interval = 1000  # For the ECM intervals, the ECM info itself is pushed by ecmInfo.
 		self.poll_enabled = True
 		self.ecmdata = GetEcmInfo()
+		self.watchEcmInfo()
 
 	@cached
 	def getText(self):
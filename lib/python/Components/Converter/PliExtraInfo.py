@@ -7,9 +7,8 @@ from Components.Element import cached
 from Components.config import config
 from Components.SystemInfo import SystemInfo
 from Tools.Transponder import ConvertToHumanReadable
-from Tools.GetEcmInfo import GetEcmInfo
+from Tools.GetEcmInfo import EcmInfoSubscriber, GetEcmInfo, ecmInfo
 from Components.Converter.Poll import Poll
-from Tools.Directories import pathExists
 from skin import parameters
 
 dvbCIUI = eDVBCI_UI.getInstance()
@@ -98,10 +97,10 @@ def createCurrentCaidLabel(info, currentCaid=None):
 				if stateDecoding == 2 and stateSlot not in (-1, 0, 3):
 					decodingCiSlot = slot
 		
-	if not pathExists("/tmp/ecm.info") and decodingCiSlot == -1:
+	if not ecmInfo.exists() and decodingCiSlot == -1:
 		return "FTA"
 		
-	if decodingCiSlot > -1 and not pathExists("/tmp/ecm.info"):
+	if decodingCiSlot > -1 and not ecmInfo.exists():
 		return "CI%d" % (decodingCiSlot)
 		
 	for caid_entry in caid_data:
@@ -112,10 +111,11 @@ def createCurrentCaidLabel(info, currentCaid=None):
 	return res
 
 
-class PliExtraInfo(Poll, Converter):
+class PliExtraInfo(EcmInfoSubscriber, Poll, Converter):
 	def __init__(self, type):
 		Converter.__init__(self, type)
 		Poll.__init__(self)
+		EcmInfoSubscriber.__init__(self)
 		self.type = type
 		self.poll_interval = 1000
 		self.poll_enabled = True
@@ -154,6 +154,8 @@ class PliExtraInfo(Poll, Converter):
 			("CryptoCaidTandbergSelected", "TB", True),
 		)
 		self.ecmdata = GetEcmInfo()
+		if type in ("CryptoInfo", "CurrentCrypto", "CryptoBar", "CryptoSpecial", "All") or type in [x[0] for x in self.ca_table]:
+			self.watchEcmInfo()
 		self.feraw = self.fedata = self.updateFEdata = None
 
 	def getCryptoInfo(self, info):
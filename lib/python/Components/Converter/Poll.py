@@ -1,19 +1,101 @@
+from time import monotonic, perf_counter
+from traceback import print_exc
+
 from enigma import eTimer
 
 
+# Central scheduler of all pollers.  The pollers are grouped by their interval
+# and each group is polled on the multiples of its interval, so that the usual
+# 500, 1000, 5000 ms etc. pollers all wake up together and the main loop is
+# only woken once for them.
+#
+class PollScheduler:
+	SLACK = 10  # Groups due within this many ms are polled together with the current ones.
+
+	def __init__(self):
+		self.groups = {}  # Dictionary of interval: [next poll time in ms, {poller: None}].
+		self.intervals = {}  # Dictionary of poller: interval.
+		self.statistics = {}  # Dictionary of poller name: [polls, total time, maximum time].
+		self.timer = eTimer()
+		self.timer.callback.append(self.tick)
+
+	def now(self):
+		return int(monotonic() * 1000)
+
+	def add(self, poller, interval):
+		interval = max(int(interval), 1)
+		if self.intervals.get(poller) == interval:
+			return
+		self.remove(poller, reschedule=False)
+		self.intervals[poller] = interval
+		group = self.groups.get(interval)
+		if group is None:
+			now = self.now()
+			group = self.groups[interval] = [(now // interval + 1) * interval, {}]
+		group[1][poller] = None
+		self.schedule()
+
+	def remove(self, poller, reschedule=True):
+		interval = self.intervals.pop(poller, None)
+		if interval is not None:
+			pollers = self.groups[interval][1]
+			del pollers[poller]
+			if not pollers:
+				del self.groups[interval]
+			if reschedule:
+				self.schedule()
+
+	def schedule(self):
+		if self.groups:
+			due = min(group[0] for group in self.groups.values())
+			self.timer.start(max(due - self.now(), 0), True)
+		else:
+			self.timer.stop()
+
+	def tick(self):
+		now = self.now()
+		due = [(interval, group) for interval, group in self.groups.items() if group[0] <= now + self.SLACK]
+		for interval, group in due:
+			group[0] = (now // interval + 1) * interval
+		for interval, group in due:
+			for poller in list(group[1]):
+				if self.intervals.get(poller) == interval:  # The poller may have been removed by a previous one.
+					self.poll(poller)
+		self.schedule()
+
+	def poll(self, poller):
+		start = perf_counter()
+		try:
+			poller.poll()
+		except Exception:
+			print(f"[Poll] Error: Poll of '{poller.__class__.__name__}' failed!")
+			print_exc()
+		duration = perf_counter() - start
+		statistics = self.statistics.setdefault(poller.__class__.__name__, [0, 0.0, 0.0])
+		statistics[0] += 1
+		statistics[1] += duration
+		if duration > statistics[2]:
+			statistics[2] = duration
+
+	def getStatistics(self):  # Returns a list of (poller name, polls, total ms, average ms, maximum ms), most expensive first.
+		result = [(name, polls, total * 1000, total * 1000 / polls, maximum * 1000) for name, (polls, total, maximum) in self.statistics.items()]
+		return sorted(result, key=lambda x: x[2], reverse=True)
+
+
+pollScheduler = PollScheduler()
+
+
 class Poll:
 	def __init__(self):
-		self.__poll_timer = eTimer()
-		self.__poll_timer.callback.append(self.poll)
 		self.__interval = 1000
 		self.__enabled = False
 
 	def __setInterval(self, interval):
 		self.__interval = interval
 		if self.__enabled:
-			self.__poll_timer.start(self.__interval)
+			pollScheduler.add(self, self.__interval)
 		else:
-			self.__poll_timer.stop()
+			pollScheduler.remove(self)
 
 	def __setEnable(self, enabled):
 		self.__enabled = enabled
@@ -28,10 +110,10 @@ class Poll:
 	def doSuspend(self, suspended):
 		if self.__enabled:
 			if suspended:
-				self.__poll_timer.stop()
+				pollScheduler.remove(self)
 			else:
 				self.poll()
 				self.poll_enabled = True
 
 	def destroy(self):
-		self.__poll_timer.callback.remove(self.poll)
+		pollScheduler.remove(self)
@@ -1,7 +1,24 @@
 from functools import reduce
 
+from enigma import eTimer
+
 from Tools.CList import CList
 
+COALESCE_DELAY = {  # Flush delay in ms of the change coalescing modes.
+	"tick": 0,  # Once per main loop iteration.
+	"frame": 20  # Once per frame (50Hz).
+}
+
+coalescing = None  # The active change coalescing mode, None pushes all changes immediately.
+pendingChanges = {}  # Dictionary of renderer: [pending changes] in the order the renderers changed.
+coalesceTimer = None
+coalesceStatistics = {
+	"queued": 0,  # Changes pushed to coalescing renderers.
+	"delivered": 0,  # Changes actually delivered to the renderers after merging.
+	"avoided": 0,  # Redundant recomputations of the renderers that were saved.
+	"flushes": 0
+}
+
 
 # Render (Down) - Converter - Converter - Source (Up)
 # A bidirectional connection.
@@ -14,6 +31,7 @@ class Element:
 	CHANGED_POLL = 4  # A timer has expired.
 
 	SINGLE_SOURCE = True
+	COALESCE = False  # Set in elements whose changes may be delayed and merged until the next flush.
 
 	def __init__(self):
 		self.downstream_elements = CList()
@@ -60,7 +78,14 @@ class Element:
 
 	def changed(self, *args, **kwargs):  # The default action is to push downstream.
 		self.cache = {}
-		self.downstream_elements.changed(*args, **kwargs)
+		if coalescing and len(args) == 1 and not kwargs:
+			for element in self.downstream_elements:
+				if element.COALESCE:
+					queueChange(element, args[0])
+				else:
+					element.changed(*args)
+		else:
+			self.downstream_elements.changed(*args, **kwargs)
 		self.cache = None
 		for x in self.onChanged:
 			x()
@@ -107,3 +132,64 @@ def cached(item):
 
 	name = item.__name__
 	return wrapper
+
+
+# Change coalescing.  With a coalescing mode set the changes pushed to
+# renderers with COALESCE set are collected and merged, and delivered once
+# per main loop iteration or frame.  Every renderer still gets each distinct
+# CHANGED_SPECIFIC change, in the order of their last occurrence, but a run
+# of CHANGED_DEFAULT, CHANGED_ALL, CHANGED_CLEAR and CHANGED_POLL changes is
+# reduced to the last one as each of them makes the renderer refetch (or
+# clear) all its data.
+#
+REFRESH_CHANGES = (Element.CHANGED_DEFAULT, Element.CHANGED_ALL, Element.CHANGED_CLEAR, Element.CHANGED_POLL)
+
+
+def isRefresh(what):
+	return isinstance(what, tuple) and len(what) == 1 and what[0] in REFRESH_CHANGES
+
+
+def queueChange(element, what):
+	global coalesceTimer
+	coalesceStatistics["queued"] += 1
+	changes = pendingChanges.get(element)
+	if changes is None:
+		pendingChanges[element] = [what]
+		if coalesceTimer is None:
+			coalesceTimer = eTimer()
+			coalesceTimer.callback.append(flushChanges)
+		if not coalesceTimer.isActive():
+			coalesceTimer.start(COALESCE_DELAY[coalescing], True)
+	else:
+		refresh = isRefresh(what)
+		changes[:] = [x for x in changes if x != what and not (refresh and isRefresh(x))]
+		changes.append(what)
+
+
+def flushChanges():
+	global pendingChanges
+	if coalesceTimer:
+		coalesceTimer.stop()
+	changes = pendingChanges
+	pendingChanges = {}  # Changes caused by the renderers are flushed next time.
+	coalesceStatistics["flushes"] += 1
+	for element, whats in changes.items():
+		for what in whats:
+			if element.source is None:  # The renderer was disconnected in the meantime.
+				break
+			coalesceStatistics["delivered"] += 1
+			element.changed(what)
+	coalesceStatistics["avoided"] = coalesceStatistics["queued"] - coalesceStatistics["delivered"]
+
+
+def setCoalescing(mode):
+	global coalescing
+	if mode not in COALESCE_DELAY:
+		mode = None
+	if coalescing and not mode:
+		flushChanges()
+	coalescing = mode
+
+
+def getCoalesceStatistics():
+	return dict(coalesceStatistics)
@@ -2,6 +2,7 @@
 import os
 import time
 from Tools.CList import CList
+from Tools.Directories import clearResolveCache
 from Components.SystemInfo import BoxInfo
 from Components.Console import Console
 from Components import Task
@@ -49,28 +50,76 @@ def findMountPoint(path):
 	return path
 
 
-def getFolderSize(path):
+FOLDER_SIZE_CACHE_DIRS = 20000  # Maximum number of directories kept in the folder size cache.
+
+folderSizeCache = {}  # Dictionary of directory: (mtime, {(device, inode): allocated bytes of the files}, [subdirectories]).
+
+
+def scanDirectory(dirpath):  # Returns the status of the directory and its cache entry, the entry is only rebuilt when the directory was changed.
+	status = os.lstat(dirpath)
+	entry = folderSizeCache.get(dirpath)
+	if entry is None or entry[0] != status.st_mtime_ns:
+		files = {}
+		subdirs = []
+		try:
+			with os.scandir(dirpath) as entries:
+				for dirEntry in entries:
+					if dirEntry.is_dir(follow_symlinks=False):
+						subdirs.append(dirEntry.path)
+					elif not dirEntry.is_symlink():
+						st = dirEntry.stat(follow_symlinks=False)
+						files[(st.st_dev, st.st_ino)] = st.st_blocks * 512  # Hard links of a file share the key and are only counted once.
+		except OSError:
+			pass
+		entry = folderSizeCache[dirpath] = (status.st_mtime_ns, files, subdirs)
+	return status, entry
+
+
+def scanFolder(path):  # Returns {(device, inode): allocated bytes} of the directory tree.
+	inodes = {}
+	stack = [path]
+	while stack:
+		try:
+			status, entry = scanDirectory(stack.pop())
+		except OSError:
+			continue
+		inodes[(status.st_dev, status.st_ino)] = status.st_blocks * 512
+		inodes.update(entry[1])
+		stack.extend(entry[2])
+	return inodes
+
+
+# Returns the allocated size of a directory tree with every hard linked file
+# counted once.  The contents of the directories are cached until their mtime
+# changes, note that this means that files that grow without a change of their
+# directory, like a running recording, are only updated with the next change
+# in that directory.  With threads > 1 the top level subdirectories are scanned
+# in parallel.
+#
+def getFolderSize(path, threads=0):
 	if os.path.islink(path):
 		return (os.lstat(path).st_size, 0)
 	if os.path.isfile(path):
 		st = os.lstat(path)
 		return (st.st_size, st.st_blocks * 512)
-	total_bytes = 0
-	have = []
-	for dirpath, dirnames, filenames in os.walk(path):
-		total_bytes += os.lstat(dirpath).st_blocks * 512
-		for f in filenames:
-			fp = os.path.join(dirpath, f)
-			if os.path.islink(fp):
-				continue
-			st = os.lstat(fp)
-			if st.st_ino in have:
-				continue  # skip hardlinks which were already counted
-			have.append(st.st_ino)
-			total_bytes += st.st_blocks * 512
-		for d in dirnames:
-			dp = os.path.join(dirpath, d)
-	return total_bytes
+	if len(folderSizeCache) > FOLDER_SIZE_CACHE_DIRS:
+		folderSizeCache.clear()
+	try:
+		status, entry = scanDirectory(path)
+	except OSError:
+		return 0
+	subdirs = entry[2]
+	if threads > 1 and len(subdirs) > 1:
+		from concurrent.futures import ThreadPoolExecutor
+		inodes = {}
+		with ThreadPoolExecutor(max_workers=min(threads, len(subdirs))) as executor:
+			for result in executor.map(scanFolder, subdirs):
+				inodes.update(result)
+		inodes[(status.st_dev, status.st_ino)] = status.st_blocks * 512
+		inodes.update(entry[1])
+	else:
+		inodes = scanFolder(path)
+	return sum(inodes.values())
 
 
 def Freespace(dev):
@@ -653,6 +702,7 @@ class HarddiskManager:
 		self.partitions = []
 		self.devices_scanned_on_init = []
 		self.on_partition_list_change = CList()
+		self.on_partition_list_change.append(self.partitionListChanged)
 		self.enumerateBlockDevices()
 		self.enumerateNetworkMounts()
 		# Find stuff not detected by the enumeration
@@ -674,6 +724,9 @@ class HarddiskManager:
 			if (m not in known) and os.path.ismount(m):
 				self.partitions.append(Partition(mountpoint=m, description=d))
 
+	def partitionListChanged(self, action, partition):  # Resolved files may be on the partition.
+		clearResolveCache()
+
 	def getBlockDevInfo(self, blockdev):
 		devpath = "/sys/block/" + blockdev
 		error = False
@@ -4,6 +4,7 @@ from Tools.FuzzyDate import FuzzyTime
 from ServiceReference import ServiceReference
 from Components.MultiContent import MultiContentEntryText, MultiContentEntryPixmapAlphaBlend, MultiContentEntryProgress
 from Components.config import config
+from Components.ResumePoints import resumePoints
 import os
 import struct
 import random
@@ -22,6 +23,10 @@ MOVIE_EXTENSIONS = frozenset((".mpg", ".vob", ".m4v", ".mkv", ".avi", ".divx", "
 KNOWN_EXTENSIONS = MOVIE_EXTENSIONS.union(IMAGE_EXTENSIONS, DVD_EXTENSIONS, AUDIO_EXTENSIONS)
 
 cutsParser = struct.Struct('>QI')  # big-endian, 64-bit PTS and 32-bit type
+CUT_TYPE_LAST = 3  # undocumented, but 3 appears to be the stop
+CUTS_CACHE_SIZE = 5000  # Maximum number of cuts files kept in the play state cache.
+
+cutsCache = {}  # Dictionary of cuts file: (mtime, size, last stop position or None).
 
 
 class MovieListData:
@@ -61,24 +66,41 @@ justStubInfo = StubInfo()
 
 
 def lastPlayPosFromCache(ref):
-	from Screens.InfoBarGenerics import resumePointCache
-	return resumePointCache.get(ref.toString(), None)
+	return resumePoints.get(ref.toString())
+
+
+def readCuts(cutsFileName):
+	'''Returns the list of (PTS, type) of the cuts file'''
+	with open(cutsFileName, 'rb') as f:
+		data = f.read()
+	return list(cutsParser.iter_unpack(data[:len(data) - len(data) % cutsParser.size]))
+
+
+def lastCutsPosition(cutsFileName):
+	'''Returns None or the last stop position of the cuts file, the file is only read again when it was changed'''
+	status = os.stat(cutsFileName)
+	entry = cutsCache.get(cutsFileName)
+	if entry is None or entry[0] != status.st_mtime_ns or entry[1] != status.st_size:
+		if len(cutsCache) > CUTS_CACHE_SIZE:
+			cutsCache.clear()
+		lastPosition = None
+		for cut, cutType in reversed(readCuts(cutsFileName)):
+			if cutType == CUT_TYPE_LAST:
+				lastPosition = cut
+				break
+		entry = cutsCache[cutsFileName] = (status.st_mtime_ns, status.st_size, lastPosition)
+	return entry[2]
+
+
+def clearMoviePlayState(cutsFileName):
+	cutsCache.pop(cutsFileName, None)
 
 
 def moviePlayState(cutsFileName, ref, length):
 	'''Returns None, 0..100 for percentage'''
 	try:
 		# read the cuts file first
-		f = open(cutsFileName, 'rb')
-		lastPosition = None
-		while True:
-			data = f.read(cutsParser.size)
-			if len(data) < cutsParser.size:
-				break
-			cut, cutType = cutsParser.unpack(data)
-			if cutType == 3:  # undocumented, but 3 appears to be the stop
-				lastPosition = cut
-		f.close()
+		lastPosition = lastCutsPosition(cutsFileName)
 		# See what we have in RAM (it might help)
 		last = lastPlayPosFromCache(ref)
 		if last:
@@ -119,16 +141,8 @@ def resetMoviePlayState(cutsFileName, ref=None):
 		if ref is not None:
 			from Screens.InfoBarGenerics import delResumePoint
 			delResumePoint(ref)
-		f = open(cutsFileName, 'rb')
-		cutlist = []
-		while True:
-			data = f.read(cutsParser.size)
-			if len(data) < cutsParser.size:
-				break
-			cut, cutType = cutsParser.unpack(data)
-			if cutType != 3:
-				cutlist.append(data)
-		f.close()
+		cutlist = [cutsParser.pack(cut, cutType) for cut, cutType in readCuts(cutsFileName) if cutType != CUT_TYPE_LAST]
+		clearMoviePlayState(cutsFileName)
 		f = open(cutsFileName, 'wb')
 		f.write(b''.join(cutlist))
 		f.close()
@@ -1,8 +1,11 @@
-from os import sync
+from fnmatch import fnmatchcase
+from functools import cmp_to_key
+from gzip import decompress
+from os import listdir, stat, sync
 from os.path import join
 from time import sleep
 
-from enigma import eConsoleAppContainer
+from enigma import eConsoleAppContainer, eTimer
 
 from Components.config import config
 from Components.SystemInfo import BoxInfo
@@ -54,6 +57,204 @@ def onPartitionChange(why, part):
 				pass
 
 
+def versionOrder(char):
+	if "0" <= char <= "9":
+		return 0
+	if char.isascii() and char.isalpha():
+		return ord(char)
+	if char == "~":
+		return -1
+	return ord(char) + 256 if char else 0
+
+
+def compareVersionParts(version1, version2):  # The Debian comparison of version or revision strings, as done by opkg.
+	index1 = 0
+	index2 = 0
+	length1 = len(version1)
+	length2 = len(version2)
+	while index1 < length1 or index2 < length2:
+		while (index1 < length1 and not "0" <= version1[index1] <= "9") or (index2 < length2 and not "0" <= version2[index2] <= "9"):
+			order1 = versionOrder(version1[index1]) if index1 < length1 else 0
+			order2 = versionOrder(version2[index2]) if index2 < length2 else 0
+			if order1 != order2:
+				return order1 - order2
+			index1 += 1
+			index2 += 1
+		while index1 < length1 and version1[index1] == "0":
+			index1 += 1
+		while index2 < length2 and version2[index2] == "0":
+			index2 += 1
+		firstDiff = 0
+		while index1 < length1 and "0" <= version1[index1] <= "9" and index2 < length2 and "0" <= version2[index2] <= "9":
+			if not firstDiff:
+				firstDiff = ord(version1[index1]) - ord(version2[index2])
+			index1 += 1
+			index2 += 1
+		if index1 < length1 and "0" <= version1[index1] <= "9":
+			return 1
+		if index2 < length2 and "0" <= version2[index2] <= "9":
+			return -1
+		if firstDiff:
+			return firstDiff
+	return 0
+
+
+def splitVersion(version):  # Returns (epoch, upstream version, revision) of a version.
+	epoch = 0
+	if ":" in version:
+		epochText, version = version.split(":", 1)
+		epoch = int(epochText) if epochText.isdigit() else 0
+	version, separator, revision = version.rpartition("-")
+	if not separator:
+		version, revision = revision, ""
+	return epoch, version, revision
+
+
+def compareVersions(version1, version2):  # Returns a negative number, 0 or a positive number like opkg compare-versions.
+	epoch1, upstream1, revision1 = splitVersion(version1)
+	epoch2, upstream2, revision2 = splitVersion(version2)
+	if epoch1 != epoch2:
+		return epoch1 - epoch2
+	return compareVersionParts(upstream1, upstream2) or compareVersionParts(revision1, revision2)
+
+
+versionKey = cmp_to_key(compareVersions)
+
+
+def parsePackages(data):  # Returns a dictionary of package: [entries] of the data of an opkg status or Packages file.
+	packages = {}
+	for paragraph in data.split("\n\n"):
+		entry = {}
+		token = None
+		for line in paragraph.splitlines():
+			if line[:1] in (" ", "\t"):
+				if token:
+					entry[token] = f"{entry[token]} {line.strip()}"
+				continue
+			token, separator, value = line.partition(":")
+			if separator:
+				entry[token] = value.strip()
+			else:
+				token = None
+		if "Package" in entry:
+			size = entry.get("Size")
+			if size is not None:
+				entry["Size"] = int(size) if size.isdigit() else 0
+			packages.setdefault(entry["Package"], []).append(entry)
+	return packages
+
+
+# Index of the installed packages and the packages in the feeds read directly
+# from the opkg status file and the feed package lists.  A file is only parsed
+# again when it was changed, so that the package lists are available without
+# running opkg.
+#
+class PackageIndex:
+	def __init__(self, statusFile=PACKAGER_STATUS_FILE, listsDir=PACKAGER_LISTS_DIR):
+		self.statusFile = statusFile
+		self.listsDir = listsDir
+		self.files = {}  # Dictionary of file: ((mtime, size), {package: [entries]}).
+
+	def isAvailable(self):
+		try:
+			stat(self.statusFile)
+			return True
+		except OSError:
+			return False
+
+	def readFile(self, path):
+		try:
+			status = stat(path)
+		except OSError:
+			self.files.pop(path, None)
+			return {}
+		signature = (status.st_mtime_ns, status.st_size)
+		cached = self.files.get(path)
+		if cached is None or cached[0] != signature:
+			try:
+				with open(path, "rb") as fd:
+					data = fd.read()
+				if data[:2] == b"\x1f\x8b":  # Compressed package lists.
+					data = decompress(data)
+				cached = self.files[path] = (signature, parsePackages(data.decode("UTF-8", "ignore")))
+			except (OSError, EOFError) as err:
+				print(f"[Opkg] Error: Unable to read the package data from '{path}'!  ({err})")
+				return {}
+		return cached[1]
+
+	def getPackages(self, patterns=None):  # Returns a dictionary of package: (installed entry or None, [available entries]).
+		try:
+			feeds = [join(self.listsDir, feed) for feed in sorted(listdir(self.listsDir))]
+		except OSError:
+			feeds = []
+		for path in [path for path in self.files if path != self.statusFile and path not in feeds]:
+			del self.files[path]
+		packages = {}
+		for package, entries in self.readFile(self.statusFile).items():
+			for entry in entries:
+				if " installed" in entry.get("Status", "").lower():
+					packages[package] = (entry, [])
+		for feed in feeds:
+			for package, entries in self.readFile(feed).items():
+				if package not in packages:
+					packages[package] = (None, [])
+				packages[package][1].extend(entries)
+		if patterns:
+			packages = {package: data for package, data in packages.items() if any(fnmatchcase(package, pattern) for pattern in patterns)}
+		return packages
+
+	def getList(self, patterns=None):  # Returns the data of "opkg list".
+		data = {}
+		for package, (installed, available) in self.getPackages(patterns).items():
+			entries = data[package] = []
+			for entry in available + ([installed] if installed else []):
+				entries.append({"Package": package, "Version": entry.get("Version", ""), "Description": entry.get("Description", ""), "Installed": False})
+		return data
+
+	def getInstalled(self, patterns=None):  # Returns the data of "opkg list-installed".
+		data = {}
+		for package, (installed, available) in self.getPackages(patterns).items():
+			if installed:
+				version = installed.get("Version", "")
+				description = installed.get("Description") or next((entry.get("Description", "") for entry in available if entry.get("Version") == version), "")
+				data[package] = [{"Package": package, "Version": version, "Description": description, "Installed": True}]
+		return data
+
+	def getUpgradable(self, patterns=None):  # Returns the data of "opkg list-upgradable".
+		data = {}
+		for package, (installed, available) in self.getPackages(patterns).items():
+			if installed and available and "hold" not in installed.get("Status", "").split():
+				version = installed.get("Version", "")
+				latest = max((entry.get("Version", "") for entry in available), key=versionKey)
+				if compareVersions(latest, version) > 0:
+					data[package] = [{"Package": package, "Version": version, "Update": latest, "Installed": True}]
+		return data
+
+	def getInfo(self, patterns=None):  # Returns the data of "opkg info".
+		data = {}
+		for package, (installed, available) in self.getPackages(patterns).items():
+			entries = data[package] = []
+			if installed:
+				version = installed.get("Version")
+				entry = next((dict(entry) for entry in available if entry.get("Version") == version), {})
+				entry.update(installed)
+				entry["Installed"] = True
+				entries.append(entry)
+			versions = set()
+			for entry in available:
+				version = entry.get("Version")
+				if version not in versions and not (installed and version == installed.get("Version")):
+					versions.add(version)
+					entry = dict(entry)
+					entry["Status"] = "unknown ok not-installed"
+					entry["Installed"] = False
+					entries.append(entry)
+		return data
+
+
+packageIndex = PackageIndex()
+
+
 class OpkgComponent:
 	CMD_CLEAN_REFRESH = 0
 	CMD_REFRESH = 1
@@ -252,6 +453,9 @@ class OpkgComponent:
 		self.opkgCommands = []
 		self.opkgCommand = None
 		self.opkgCacheEmpty = False
+		self.indexTimer = eTimer()  # The list commands are answered from the package index after this timer.
+		self.indexTimer.callback.append(self.indexStepDone)
+		self.indexCommand = None
 
 	def runCommand(self, command, args=None):
 		self.command = command
@@ -293,8 +497,13 @@ class OpkgComponent:
 					opkgArgs.extend(self.args["arguments"])
 		else:
 			self.checklist = []
-		dataBuffer = 131072 if opkgCommand in ("list", "list-installed", "list-upgradable", "info") else 2048  # 128 * 1024 = 128 KB data buffer for lists and 2 KB for other commands.
 		self.debugMode = "debugMode" in self.args and self.args["debugMode"]
+		if opkgCommand in self.listCommands and "options" not in self.args and packageIndex.isAvailable():
+			print(f"[Opkg] Step {self.step} of {self.steps}: Reading the '{opkgCommand}' data from the package index.")
+			self.indexCommand = (opkgCommand, self.checklist or None, False)
+			self.indexTimer.start(0, True)
+			return
+		dataBuffer = 131072 if opkgCommand in ("list", "list-installed", "list-upgradable", "info") else 2048  # 128 * 1024 = 128 KB data buffer for lists and 2 KB for other commands.
 		msg = " in debug mode" if self.debugMode else ""
 		print(f"[Opkg] Step {self.step} of {self.steps}: Executing '{opkgArgs[0]}' with command line arguments '{' '.join(opkgArgs[1:])}'{msg}.")
 		self.removed = []
@@ -398,6 +607,23 @@ class OpkgComponent:
 				print(f"[Opkg] Opkg command '{self.opkgCommand}' resulted in no output.")
 		elif self.opkgCommand in self.listCommands:
 			print(f"[Opkg] Opkg command '{self.opkgCommand}' output suppressed to not flood the log file.")
+		self.stepDone(retVal)
+
+	def indexStepDone(self):
+		opkgCommand, patterns, legacy = self.indexCommand
+		self.indexCommand = None
+		if legacy:
+			self.cmdIndexDone(opkgCommand, patterns)
+		elif opkgCommand == "list":
+			self.stepDone(0, self.selectListPackages(packageIndex.getList(patterns)))
+		elif opkgCommand == "list-installed":
+			self.stepDone(0, self.selectListPackages(packageIndex.getInstalled(patterns)))
+		elif opkgCommand == "list-upgradable":
+			self.stepDone(0, self.selectListPackages(packageIndex.getUpgradable(patterns)))
+		else:
+			self.stepDone(0, self.selectInfoPackages(packageIndex.getInfo(patterns)))
+
+	def stepDone(self, retVal, packages=None):  # The packages are only given when the list commands were answered from the package index.
 		if self.opkgCommand == "clean":
 			sync()
 			sleep(0.5)  # Pause for 500ms to allow the synchronization of the files changed by clean to complete.
@@ -414,12 +640,14 @@ class OpkgComponent:
 		elif self.opkgCommand == "update":
 			self.callCallbacks(self.EVENT_REFRESH_DONE, retVal)
 		elif self.opkgCommand == "list":
-			packages = self.parseListData(self.dataCache, self.LIST_KEYS, False)
+			if packages is None:
+				packages = self.parseListData(self.dataCache, self.LIST_KEYS, False)
 			self.installable = packages[:]
 			if self.command in (self.CMD_REFRESH_LIST, self.CMD_LIST):
 				self.callCallbacks(self.EVENT_LIST_DONE, packages)
 		elif self.opkgCommand == "list-installed":
-			packages = self.parseListData(self.dataCache, self.LIST_KEYS, True)
+			if packages is None:
+				packages = self.parseListData(self.dataCache, self.LIST_KEYS, True)
 			if self.command in (self.CMD_REFRESH_INSTALLED, self.CMD_LIST_INSTALLED):
 				self.callCallbacks(self.EVENT_LIST_INSTALLED_DONE, packages)
 			elif self.command in (self.CMD_REFRESH_INSTALLABLE, self.CMD_LIST_INSTALLABLE):
@@ -437,10 +665,12 @@ class OpkgComponent:
 						packages.append(package)
 				self.callCallbacks(self.EVENT_LIST_INSTALLABLE_DONE, packages)
 		elif self.opkgCommand == "list-upgradable":
-			packages = self.parseListData(self.dataCache, self.UPDATE_KEYS, True)
+			if packages is None:
+				packages = self.parseListData(self.dataCache, self.UPDATE_KEYS, True)
 			self.callCallbacks(self.EVENT_LIST_UPDATES_DONE, packages)
 		elif self.opkgCommand == "info":
-			packages = self.parseInfoData(self.dataCache)
+			if packages is None:
+				packages = self.parseInfoData(self.dataCache)
 			for package in packages:
 				if package["Installed"]:
 					packageFile = package["Package"]
@@ -486,13 +716,16 @@ class OpkgComponent:
 						data[package] = [entry]
 				args = line.split(" - ", 2)
 				args = [x.strip() for x in args]
+		return self.selectListPackages(data)
+
+	def selectListPackages(self, data):  # Returns the entry with the latest version of each package.
 		packages = []
 		for package in sorted(data.keys()):
 			select = 0
 			if len(data[package]) > 1:
 				latest = ""
 				for index, entry in enumerate(data[package]):
-					if entry["Version"] > latest:
+					if compareVersions(entry.get("Version", ""), latest) > 0:
 						latest = entry["Version"]
 						select = index
 			packages.append(data[package][select])
@@ -531,6 +764,9 @@ class OpkgComponent:
 				if len(args) > 1:
 					value = args[1]
 					entry[token] = value.strip()
+		return self.selectInfoPackages(data)
+
+	def selectInfoPackages(self, data):  # Returns the entry with the latest version of each package with the data of the installed version.
 		packages = []
 		for package in sorted(data.keys()):
 			select = 0
@@ -540,7 +776,7 @@ class OpkgComponent:
 				for index, entry in enumerate(data[package]):
 					if entry["Installed"]:
 						installed = index
-					if entry["Version"] > latest:
+					if compareVersions(entry.get("Version", ""), latest) > 0:
 						latest = entry["Version"]
 						select = index
 				if installed != select:
@@ -567,10 +803,12 @@ class OpkgComponent:
 			print(f"[Opkg] Error: Callback '{str(callback)}' does not exist!")
 
 	def stop(self):
+		self.indexTimer.stop()
+		self.indexCommand = None
 		self.console.kill()
 
 	def isRunning(self):
-		return self.console.running()
+		return self.console.running() or self.indexTimer.isActive()
 
 	def write(self, what):
 		if what:
@@ -646,6 +884,11 @@ class OpkgComponent:
 			argv = ["info"]
 			consoleBuffer = 131072
 			self.console.setBufferSize(128 * 1024)
+		if cmd in (self.CMD_LIST, self.CMD_LIST_INSTALLED, self.CMD_UPGRADE_LIST) and packageIndex.isAvailable():
+			print(f"[Opkg] Reading the '{' '.join(argv)}' data from the package index.")
+			self.indexCommand = (argv[0], argv[1:] or None, True)
+			self.indexTimer.start(0, True)
+			return
 		print(f"[Opkg] Executing '{self.opkg}' with '{' '.join(argv)}'.")
 		self.cache = ""
 		self.cachePtr = -1
@@ -734,11 +977,33 @@ class OpkgComponent:
 			exclude = False
 		return exclude
 
+	def cmdIndexDone(self, opkgCommand, patterns):
+		if opkgCommand == "list":
+			data = packageIndex.getList(patterns)
+			keys = self.LIST_KEYS
+		elif opkgCommand == "list-installed":
+			data = packageIndex.getInstalled(patterns)
+			keys = self.LIST_KEYS
+		else:
+			data = packageIndex.getUpgradable(patterns)
+			keys = self.UPDATE_KEYS
+		for package in self.selectListPackages(data):
+			argv = [package.get(key, "") for key in keys]
+			if self.command == self.CMD_UPGRADE_LIST and self.isExcluded(argv[0]):
+				self.excludeList.append(argv)
+			else:
+				self.fetchedList.append(argv)
+				self.callCallbacks(self.EVENT_LISTITEM, argv)
+		self.cmdDone(0)
+
 	def cmdFinished(self, retVal):
 		self.console.dataAvail.remove(self.cmdData)
 		self.console.appClosed.remove(self.cmdFinished)
 		if config.crash.debugOpkg.value and self.command != self.CMD_INFO:
 			print(f"[Opkg] Opkg command '{self.getCommandText(self.command)}' output:\n{self.cache}")
+		self.cmdDone(retVal)
+
+	def cmdDone(self, retVal):
 		if self.nextCommand:
 			cmd, args = self.nextCommand
 			self.nextCommand = None
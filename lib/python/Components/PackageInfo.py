@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import xml.sax
 from Tools.Directories import crawlDirectory, resolveFilename, SCOPE_CONFIG, SCOPE_SKINS, copyfile, copytree
+from Components.ChannelNumbers import channelNumbers
 from Components.Console import Console
 from Components.NimManager import nimmanager
 from Components.Opkg import OpkgComponent
@@ -304,6 +305,7 @@ class PackageInfoHandler:
 		if self.reloadFavourites:
 			self.reloadFavourites = False
 			eDVBDB.getInstance().reloadBouquets()
+			channelNumbers.invalidate()
 
 		self.currentIndex += 1
 		attributes = self.installingAttributes
@@ -394,6 +396,7 @@ class PackageInfoHandler:
 		if os.path.isfile(directory + name):
 			db = eDVBDB.getInstance()
 			db.reloadServicelist()
+			channelNumbers.invalidate()
 			db.loadServicelist(directory + name)
 			db.saveServicelist()
 		self.installNext()
@@ -1,12 +1,150 @@
 # -*- coding: utf-8 -*-
 import os
-from enigma import eProfileWrite
+from enigma import eProfileWrite, eTimer
 from bisect import insort
+from marshal import dump, dumps, load
+from time import perf_counter
+from types import FunctionType
 from Components.ActionMap import loadKeymap
-from Tools.Directories import fileExists, resolveFilename, SCOPE_PLUGINS
+from Components.config import config
+from Components.International import international
+from Tools.Directories import fileExists, resolveFilename, SCOPE_CONFIG, SCOPE_PLUGINS
 from Tools.Import import my_import
+from Tools.Profile import profiled
 from Plugins.Plugin import PluginDescriptor
 
+PLUGIN_MANIFEST = "plugin_manifest.bin"
+PLUGIN_MANIFEST_VERSION = 1
+PLUGIN_MANIFEST_DELAY = 30000  # Delay in ms before new manifest data is written.
+PLUGIN_CODE_EXTENSIONS = (".py", ".pyc", ".so")
+
+# Plugins with any of these descriptors are always imported at boot as they
+# are called at startup or hook into the screens as they are created.
+#
+EAGER_WHERE = frozenset((
+	PluginDescriptor.WHERE_AUTOSTART,
+	PluginDescriptor.WHERE_WIZARD,
+	PluginDescriptor.WHERE_SESSIONSTART,
+	PluginDescriptor.WHERE_NETWORKCONFIG_READ,
+	PluginDescriptor.WHERE_INFOBAR_SCREEN,
+	PluginDescriptor.WHERE_SECONDINFOBAR_SCREEN,
+	PluginDescriptor.WHERE_PLAYSERVICE,
+	PluginDescriptor.WHERE_INFOBARLOADED
+))
+DESCRIPTOR_ATTRIBUTES = frozenset(("name", "internal", "needsRestart", "path", "key", "where", "description", "iconstr", "_icon", "weight", "wakeupfnc", "fnc"))
+DEFAULT_TYPES = (type(None), bool, int, float, str)
+
+
+def getPluginSignature(path):  # Returns the names, sizes and mtimes of the code files of the plugin.
+	signature = []
+	try:
+		with os.scandir(path) as entries:
+			for entry in entries:
+				if entry.name.endswith(PLUGIN_CODE_EXTENSIONS):
+					status = entry.stat()
+					signature.append((entry.name, status.st_size, status.st_mtime_ns))
+	except OSError:
+		return None
+	return tuple(sorted(signature))
+
+
+def describeFunction(fnc):  # Returns the argument specification of a plain function or None if a stand in can't be made for it.
+	if not isinstance(fnc, FunctionType):
+		return None
+	code = fnc.__code__
+	args = code.co_varnames[:code.co_argcount]
+	kwonly = code.co_varnames[code.co_argcount:code.co_argcount + code.co_kwonlyargcount]
+	index = code.co_argcount + code.co_kwonlyargcount
+	varargs = code.co_varnames[index] if code.co_flags & 0x04 else None
+	if varargs:
+		index += 1
+	varkw = code.co_varnames[index] if code.co_flags & 0x08 else None
+	defaults = fnc.__defaults__ or ()
+	kwdefaults = fnc.__kwdefaults__ or {}
+	if code.co_posonlyargcount or any(not isinstance(x, DEFAULT_TYPES) for x in list(defaults) + list(kwdefaults.values())):
+		return None
+	return (fnc.__name__, args, defaults, varargs, kwonly, kwdefaults, varkw)
+
+
+def describePlugins(plugins):  # Returns the manifest entries of the plugin descriptors or None if the plugin must be imported at boot.
+	descriptors = []
+	for plugin in plugins:
+		if not plugin:
+			descriptors.append(None)
+			continue
+		if EAGER_WHERE.intersection(plugin.where) or plugin.wakeupfnc or plugin._icon is not None or not DESCRIPTOR_ATTRIBUTES.issuperset(vars(plugin)):
+			return None
+		spec = describeFunction(plugin.fnc)
+		if spec is None:
+			return None
+		descriptor = (plugin.name, list(plugin.where), plugin.description, plugin.iconstr, plugin.weight, plugin.internal, plugin.needsRestart, spec)
+		try:
+			dumps(descriptor)
+		except ValueError:
+			return None
+		descriptors.append(descriptor)
+	return descriptors
+
+
+def makeStandIn(spec, call):  # Make a function with the arguments of the plugin function that calls call() with them.
+	name, args, defaults, varargs, kwonly, kwdefaults, varkw = spec
+	if not all(x.isidentifier() for x in (name,) + tuple(args) + tuple(kwonly) + tuple(x for x in (varargs, varkw) if x)):
+		raise ValueError(f"invalid plugin function specification {spec}")
+	firstDefault = len(args) - len(defaults)
+	parameters = [f"{arg}=_defaults[{index - firstDefault}]" if index >= firstDefault else arg for index, arg in enumerate(args)]
+	callArguments = list(args)
+	if varargs:
+		parameters.append(f"*{varargs}")
+		callArguments.append(f"*{varargs}")
+	elif kwonly:
+		parameters.append("*")
+	for arg in kwonly:
+		parameters.append(f"{arg}=_kwdefaults[{arg!r}]" if arg in kwdefaults else arg)
+		callArguments.append(f"{arg}={arg}")
+	if varkw:
+		parameters.append(f"**{varkw}")
+		callArguments.append(f"**{varkw}")
+	namespace = {"_call": call, "_defaults": defaults, "_kwdefaults": kwdefaults}
+	exec(f"def {name}({', '.join(parameters)}):\n\treturn _call({', '.join(callArguments)})", namespace)
+	return namespace[name]
+
+
+# A plugin that is registered from the manifest.  Its module is imported and
+# its real plugin functions are fetched the first time one of the descriptors
+# is used.
+#
+class LazyPlugin:
+	def __init__(self, component, category, name, path):
+		self.component = component
+		self.category = category
+		self.name = name
+		self.path = path
+		self.functions = None
+
+	def load(self, index):
+		if self.functions is None:
+			print(f"[PluginComponent] Importing plugin '{self.category}/{self.name}' on first use.")
+			plugins = self.component.importPlugin(self.category, self.name, self.path)
+			if plugins is None:
+				raise RuntimeError(f"plugin '{self.category}/{self.name}' failed to load")
+			signature = getPluginSignature(self.path)
+			if signature is not None:
+				self.component.updateManifest(self.path, signature, describePlugins(plugins))
+			self.functions = [plugin.fnc if plugin else None for plugin in plugins]
+		if index >= len(self.functions) or not callable(self.functions[index]):
+			raise RuntimeError(f"plugin '{self.category}/{self.name}' no longer provides descriptor {index}")
+		return self.functions[index]
+
+	def descriptors(self, entries):
+		plugins = []
+		for index, entry in enumerate(entries):
+			if entry is None:
+				continue
+			name, where, description, icon, weight, internal, needsRestart, spec = entry
+			fnc = makeStandIn(spec, lambda *args, _index=index, **kwargs: self.load(_index)(*args, **kwargs))
+			plugins.append(PluginDescriptor(name=name, where=where, description=description, icon=icon, fnc=fnc, needsRestart=needsRestart, internal=internal, weight=weight))
+		return plugins
+
 
 class PluginComponent:
 	firstRun = True
@@ -18,6 +156,9 @@ class PluginComponent:
 		self.installedPluginList = []
 		self.setPluginPrefix("Plugins.")
 		self.pluginWarnings = []
+		self.importTimes = {}  # Dictionary of "category/name": import time in ms of the plugins.
+		self.manifest = None  # Dictionary of plugin path: (code signature, descriptors or None if the plugin can't be loaded lazily).
+		self.manifestTimer = None
 
 	def setPluginPrefix(self, prefix):
 		self.prefix = prefix
@@ -43,9 +184,12 @@ class PluginComponent:
 			if x == PluginDescriptor.WHERE_AUTOSTART:
 				plugin(reason=1)
 
+	@profiled("readPluginList")
 	def readPluginList(self, directory):
 		"""enumerates plugins"""
 		new_plugins = []
+		manifest = self.readManifest()
+		lazy = self.firstRun and hasattr(config.usage, "plugin_lazy_load") and config.usage.plugin_lazy_load.value  # Only at boot, reloads import all plugins.
 		for c in os.listdir(directory):
 			directory_category = os.path.join(directory, c)
 			if not os.path.isdir(directory_category):
@@ -56,29 +200,16 @@ class PluginComponent:
 				path = os.path.join(directory_category, pluginname)
 				if os.path.isdir(path):
 						eProfileWrite('plugin ' + pluginname)
-						try:
-							plugin = my_import('.'.join(["Plugins", c, pluginname, "plugin"]))
-							plugins = plugin.Plugins(path=path)
-						except Exception as exc:
-							print("Plugin ", c + "/" + pluginname, "failed to load:", exc)
-							# supress errors due to missing plugin.py* files (badly removed plugin)
-							for fn in ('plugin.py', 'plugin.pyc'):
-								if os.path.exists(os.path.join(path, fn)):
-									self.pluginWarnings.append((c + "/" + pluginname, str(exc)))
-									from traceback import print_exc
-									print_exc()
-									break
-							else:
-								print("Plugin probably removed, but not cleanly in", path)
-								try:
-									os.rmdir(path)
-								except:
-									pass
-							continue
-
-						# allow single entry not to be a list
-						if not isinstance(plugins, list):
-							plugins = [plugins]
+						signature = getPluginSignature(path)
+						entry = manifest.get(path)
+						if lazy and entry and entry[0] == signature and entry[1] is not None:
+							plugins = LazyPlugin(self, c, pluginname, path).descriptors(entry[1])
+						else:
+							plugins = self.importPlugin(c, pluginname, path)
+							if plugins is None:
+								continue
+							if signature is not None:
+								self.updateManifest(path, signature, describePlugins(plugins))
 
 						for p in plugins:
 							if p:
@@ -121,6 +252,76 @@ class PluginComponent:
 			self.firstRun = False
 			self.installedPluginList = self.pluginList
 
+	def importPlugin(self, category, pluginname, path):  # Returns the list of plugin descriptors of the plugin or None if it failed to load.
+		start = perf_counter()
+		try:
+			plugin = my_import('.'.join(["Plugins", category, pluginname, "plugin"]))
+			plugins = plugin.Plugins(path=path)
+		except Exception as exc:
+			print("Plugin ", category + "/" + pluginname, "failed to load:", exc)
+			# supress errors due to missing plugin.py* files (badly removed plugin)
+			for fn in ('plugin.py', 'plugin.pyc'):
+				if os.path.exists(os.path.join(path, fn)):
+					self.pluginWarnings.append((category + "/" + pluginname, str(exc)))
+					from traceback import print_exc
+					print_exc()
+					break
+			else:
+				print("Plugin probably removed, but not cleanly in", path)
+				try:
+					os.rmdir(path)
+				except:
+					pass
+			return None
+		importTime = (perf_counter() - start) * 1000
+		self.importTimes[f"{category}/{pluginname}"] = importTime
+		eProfileWrite(f"plugin {pluginname} imported in {importTime:.1f}ms")
+		# allow single entry not to be a list
+		if not isinstance(plugins, list):
+			plugins = [plugins]
+		return plugins
+
+	def getImportTimes(self):  # Returns a list of ("category/name", import time in ms), slowest first.
+		return sorted(self.importTimes.items(), key=lambda x: x[1], reverse=True)
+
+	def readManifest(self):
+		if self.manifest is None:
+			self.manifest = {}
+			filename = resolveFilename(SCOPE_CONFIG, PLUGIN_MANIFEST)
+			try:
+				with open(filename, "rb") as fd:
+					version, locale, manifest = load(fd)
+				if version == PLUGIN_MANIFEST_VERSION and locale == international.getLocale():  # The descriptions are translated.
+					self.manifest = manifest
+			except FileNotFoundError:
+				pass
+			except Exception as err:
+				print(f"[PluginComponent] Error: Unable to read plugin manifest '{filename}'!  ({err})")
+		return self.manifest
+
+	def writeManifest(self):
+		filename = resolveFilename(SCOPE_CONFIG, PLUGIN_MANIFEST)
+		try:
+			with open(f"{filename}.tmp", "wb") as fd:
+				dump((PLUGIN_MANIFEST_VERSION, international.getLocale(), self.manifest), fd)
+			os.rename(f"{filename}.tmp", filename)
+		except OSError as err:
+			print(f"[PluginComponent] Error {err.errno}: Unable to write plugin manifest '{filename}'!  ({err.strerror})")
+
+	def saveManifest(self):
+		if self.manifestTimer is None:
+			self.manifestTimer = eTimer()
+			self.manifestTimer.callback.append(self.writeManifest)
+		if not self.manifestTimer.isActive():
+			self.manifestTimer.start(PLUGIN_MANIFEST_DELAY, True)
+
+	def updateManifest(self, path, signature, descriptors):
+		manifest = self.readManifest()
+		entry = (signature, descriptors)
+		if manifest.get(path) != entry:
+			manifest[path] = entry
+			self.saveManifest()
+
 	def getPlugins(self, where):
 		"""Get list of plugins in a specific category"""
 		if not isinstance(where, list):
@@ -12,6 +12,7 @@ from Components.Renderer.Renderer import Renderer
 
 
 class Listbox(Renderer):
+	COALESCE = False  # The list content and selection must follow the source immediately.
 	GUI_WIDGET = eListbox
 
 	def __init__(self):
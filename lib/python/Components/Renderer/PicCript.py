@@ -3,7 +3,8 @@ from os.path import isfile, join
 from enigma import ePixmap, iServiceInformation, eServiceReference
 
 from Components.Renderer.Renderer import Renderer
-from Tools.Directories import SCOPE_GUISKIN, resolveFilename, fileReadLines
+from Tools.Directories import SCOPE_GUISKIN, resolveFilename
+from Tools.GetEcmInfo import ecmInfo
 
 MODULE_NAME = __name__.split(".")[-1]
 
@@ -78,7 +79,7 @@ class PicCript(Renderer):
 	def changed(self, what):
 		if self.instance:
 			pngName = ""
-			if (what[0] != self.CHANGED_CLEAR) and isfile("/tmp/ecm.info"):
+			if (what[0] != self.CHANGED_CLEAR) and ecmInfo.exists():
 				sName = ""
 				service = self.source.service
 				if service:
@@ -107,12 +108,11 @@ class PicCript(Renderer):
 				self.instance.setPixmapFromFile(self.pngName)
 
 	def matchCAId(self, caids):
-		lines = []
 		from process import ProcessList
 		mgcamd = str(ProcessList().named("mgcamd_1.38")).strip("[]")
 		cccam = str(ProcessList().named("CCcam")).strip("[]")
 		try:
-			for line in fileReadLines("/tmp/ecm.info", lines, source=MODULE_NAME):
+			for line in ecmInfo.getLines():
 				if not mgcamd and not cccam:
 					for caid in caids:
 						sName = self.condAccessIds.get(line[8:10])
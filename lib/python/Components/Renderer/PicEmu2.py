@@ -3,7 +3,8 @@ from os.path import isfile, join
 from enigma import ePixmap, iServiceInformation, eServiceReference
 
 from Components.Renderer.Renderer import Renderer
-from Tools.Directories import SCOPE_GUISKIN, resolveFilename, fileReadLines
+from Tools.Directories import SCOPE_GUISKIN, resolveFilename
+from Tools.GetEcmInfo import ecmInfo
 
 MODULE_NAME = __name__.split(".")[-1]
 
@@ -45,7 +46,7 @@ class PicEmu2(Renderer):
 	def changed(self, what):
 		if self.instance:
 			pngName = ""
-			if (what[0] != self.CHANGED_CLEAR) and isfile("/tmp/ecm.info"):
+			if (what[0] != self.CHANGED_CLEAR) and ecmInfo.exists():
 				sName = ""
 				service = self.source.service
 				if service:
@@ -76,9 +77,8 @@ class PicEmu2(Renderer):
 	def matchCAId(self, caids):
 		from process import ProcessList
 		ncam = str(ProcessList().named("ncam")).strip("[]")
-		lines = []
 		try:
-			for line in fileReadLines("/tmp/ecm.info", lines, source=MODULE_NAME):
+			for line in ecmInfo.getLines():
 				if not ncam:
 					for caid in caids:
 						sName = self.camds.get(line[0:4])
@@ -2,6 +2,7 @@
 import os
 import re
 import unicodedata
+from time import time
 from Components.Renderer.Renderer import Renderer
 from enigma import ePixmap
 from Tools.Alternatives import GetWithAlternative
@@ -11,11 +12,17 @@ from ServiceReference import ServiceReference
 
 
 class PiconLocator:
+	CheckInterval = 60  # Seconds between checks of the picon directories for changes.
+	MaxNames = 10000  # Maximum number of remembered picon names.
+
 	def __init__(self, piconDirectories=['picon']):
 		harddiskmanager.on_partition_list_change.append(self.__onPartitionChange)
 		self.piconDirectories = piconDirectories
 		self.activePiconPath = None
 		self.searchPaths = []
+		self.piconFiles = {}  # Dictionary of search path: (mtime, set of picon file names).
+		self.piconNames = {}  # Dictionary of service reference: picon file name, "" for services without a picon.
+		self.lastCheck = time()
 		for mp in ('/usr/share/enigma2/', '/'):
 			self.__onMountpointAdded(mp)
 		for part in harddiskmanager.getMountedPartitions():
@@ -26,22 +33,29 @@ class PiconLocator:
 			try:
 				path = os.path.join(mountpoint, piconDirectory) + '/'
 				if os.path.isdir(path) and path not in self.searchPaths:
-					for fn in os.listdir(path):
-						if fn.endswith('.png') or fn.endswith('.svg'):
-							print("[Picon] adding path:", path)
-							self.searchPaths.append(path)
-							break
+					self.scanPath(path)
+					if self.piconFiles[path][1]:
+						print("[Picon] adding path:", path)
+						self.searchPaths.append(path)
+						self.piconNames.clear()
+					else:
+						del self.piconFiles[path]
 			except:
 				pass
 
 	def __onMountpointRemoved(self, mountpoint):
 		for piconDirectory in self.piconDirectories:
-			path = os.path.join(mountpoint, self.piconDirectories) + '/'
+			path = os.path.join(mountpoint, piconDirectory) + '/'
 			try:
 				self.searchPaths.remove(path)
 				print("[Picon] removed path:", path)
 			except:
 				pass
+			else:
+				self.piconFiles.pop(path, None)
+				if self.activePiconPath == path:
+					self.activePiconPath = None
+				self.piconNames.clear()
 
 	def __onPartitionChange(self, why, part):
 		if why == 'add':
@@ -49,19 +63,41 @@ class PiconLocator:
 		elif why == 'remove':
 			self.__onMountpointRemoved(part.mountpoint)
 
+	def scanPath(self, path):
+		try:
+			mtime = os.stat(path).st_mtime
+			files = set([fn for fn in os.listdir(path) if fn.endswith('.png') or fn.endswith('.svg')])
+		except OSError:
+			mtime = None
+			files = set()
+		self.piconFiles[path] = (mtime, files)
+
+	def checkPaths(self):
+		# Rescan the picon directories that have been changed since they were scanned.
+		self.lastCheck = time()
+		for path in self.searchPaths:
+			try:
+				mtime = os.stat(path).st_mtime
+			except OSError:
+				mtime = None
+			if path not in self.piconFiles or self.piconFiles[path][0] != mtime:
+				print("[Picon] rescanning path:", path)
+				self.scanPath(path)
+				self.piconNames.clear()
+
 	def findPicon(self, serviceName):
 		if self.activePiconPath is not None:
+			files = self.piconFiles.get(self.activePiconPath, (None, ()))[1]
 			for ext in ('.png', '.svg'):
-				pngname = self.activePiconPath + serviceName + ext
-				if pathExists(pngname):
-					return pngname
+				if serviceName + ext in files:
+					return self.activePiconPath + serviceName + ext
 		else:
 			for path in self.searchPaths:
+				files = self.piconFiles.get(path, (None, ()))[1]
 				for ext in ('.png', '.svg'):
-					pngname = path + serviceName + ext
-					if pathExists(pngname):
+					if serviceName + ext in files:
 						self.activePiconPath = path
-						return pngname
+						return path + serviceName + ext
 		return ""
 
 	def addSearchPath(self, value):
@@ -70,8 +106,24 @@ class PiconLocator:
 				value += '/'
 			if not value.startswith('/media/net') and not value.startswith('/media/autofs') and value not in self.searchPaths:
 				self.searchPaths.append(value)
+				self.scanPath(value)
+				self.piconNames.clear()
 
 	def getPiconName(self, serviceName):
+		if time() - self.lastCheck > self.CheckInterval:
+			self.checkPaths()
+		try:
+			return self.piconNames[serviceName]
+		except KeyError:
+			pngname = self.searchPiconName(serviceName)
+		except TypeError:
+			return self.searchPiconName(serviceName)
+		if len(self.piconNames) >= self.MaxNames:
+			self.piconNames.clear()
+		self.piconNames[serviceName] = pngname
+		return pngname
+
+	def searchPiconName(self, serviceName):
 		#remove the path and name fields, and replace ':' by '_'
 		fields = GetWithAlternative(serviceName).split(':', 10)[:10]
 		if not fields or len(fields) < 10:
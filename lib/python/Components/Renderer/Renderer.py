@@ -3,6 +3,8 @@ from Components.Element import Element
 
 
 class Renderer(GUIComponent, Element):
+	COALESCE = True  # Renderers only display the data, their changes may be merged.
+
 	def __init__(self):
 		Element.__init__(self)
 		GUIComponent.__init__(self)
@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from json import dumps, loads
+from os import remove, rename
+from os.path import exists, realpath
+from time import time
+
+from enigma import eTimer
+from twisted.internet import threads
+
+from Tools.Directories import SCOPE_CONFIG, resolveFilename
+
+RESUME_POINTS_LOG = "resumepoints.log"
+RESUME_POINTS_PICKLE = "resumepoints.pkl"  # The former store, it is converted into the log when there is no log yet.
+RESUME_POINTS_MAX = 5000  # Maximum number of resume points, the least recently used ones are dropped.
+RESUME_POINTS_COMPACT = 500  # The log is rewritten when it has this many more lines than there are resume points.
+RESUME_POINTS_SWEEP_DELAY = 300  # Seconds after the last change before the resume points of deleted files are removed.
+
+
+def readMountPoints():  # Returns the mount points of the mounted file systems except the root file system, longest first.
+	mountPoints = []
+	try:
+		with open("/proc/mounts") as fd:
+			for line in fd:
+				fields = line.split()
+				if len(fields) > 1 and fields[1] != "/":
+					mountPoints.append(fields[1].replace("\\040", " "))
+	except OSError as err:
+		print(f"[ResumePoints] Error {err.errno}: Unable to read the mount points!  ({err.strerror})")
+	return sorted(mountPoints, key=len, reverse=True)
+
+
+def findStaleResumePoints(keys):  # Runs in a thread, returns the keys of the resume points of deleted files on mounted file systems.
+	mountPoints = readMountPoints()
+	stale = []
+	for key in keys:
+		path = key.split(":")[-1]
+		if not path.startswith("/"):
+			continue
+		path = realpath(path)
+		for mountPoint in mountPoints:
+			if path.startswith(f"{mountPoint}/"):
+				if not exists(path):
+					stale.append(key)
+				break
+	return stale
+
+
+# Store of the resume points of played files and streams.  The resume points
+# are kept in least recently used order and every change is appended to a log
+# file, so that a change costs the same no matter how many resume points are
+# stored.  The log is rewritten when it has grown too much and when enigma2
+# shuts down.  The resume points of deleted files are removed by a sweep in a
+# thread a while after the last change.
+#
+# A resume point is a list of [last use time, position, length].
+#
+class ResumePoints:
+	def __init__(self):
+		self.filename = resolveFilename(SCOPE_CONFIG, RESUME_POINTS_LOG)
+		self.points = OrderedDict()
+		self.logLines = 0
+		self.sweeping = False
+		self.sweepTimer = eTimer()
+		self.sweepTimer.callback.append(self.sweep)
+		self.load()
+
+	def __len__(self):
+		return len(self.points)
+
+	def __contains__(self, key):
+		return key in self.points
+
+	def __getitem__(self, key):
+		return self.points[key]
+
+	def __setitem__(self, key, value):
+		self.set(key, value[1], value[2])
+
+	def __delitem__(self, key):
+		if key not in self.points:
+			raise KeyError(key)
+		self.delete(key)
+
+	def get(self, key, default=None):
+		return self.points.get(key, default)
+
+	def items(self):
+		return self.points.items()
+
+	def touch(self, key):  # Returns the resume point and marks it as used or None.
+		entry = self.points.get(key)
+		if entry is not None:
+			entry[0] = int(time())
+			self.points.move_to_end(key)
+		return entry
+
+	def set(self, key, position, length):
+		entry = self.points[key] = [int(time()), position, length]
+		self.points.move_to_end(key)
+		while len(self.points) > RESUME_POINTS_MAX:
+			self.points.popitem(last=False)
+		self.append(["set", key] + entry)
+		self.sweepTimer.startLongTimer(RESUME_POINTS_SWEEP_DELAY)
+
+	def delete(self, key):
+		if self.points.pop(key, None) is not None:
+			self.append(["delete", key])
+
+	def load(self):
+		self.points.clear()
+		self.logLines = 0
+		invalid = False
+		try:
+			with open(self.filename) as fd:
+				for line in fd:
+					self.logLines += 1
+					try:
+						record = loads(line)
+						if record[0] == "set" and len(record) == 5:
+							self.points[record[1]] = record[2:5]
+							self.points.move_to_end(record[1])
+						elif record[0] == "delete":
+							self.points.pop(record[1], None)
+					except (ValueError, IndexError, TypeError):  # A record that was cut off by a power failure.
+						print(f"[ResumePoints] Warning: Ignoring invalid record in line {self.logLines} of '{self.filename}'!")
+						invalid = True
+			while len(self.points) > RESUME_POINTS_MAX:
+				self.points.popitem(last=False)
+			if invalid:  # Rewrite the log so that the next records are not appended to the invalid one.
+				self.save()
+		except FileNotFoundError:
+			self.convert()
+		except OSError as err:
+			print(f"[ResumePoints] Error {err.errno}: Unable to load the resume points from '{self.filename}'!  ({err.strerror})")
+
+	def convert(self):
+		filename = resolveFilename(SCOPE_CONFIG, RESUME_POINTS_PICKLE)
+		if exists(filename):
+			import pickle
+			try:
+				with open(filename, "rb") as fd:
+					points = pickle.load(fd)
+				for key, entry in sorted(points.items(), key=lambda x: x[1][0])[-RESUME_POINTS_MAX:]:
+					self.points[key] = list(entry)
+				if self.save():
+					remove(filename)
+					print(f"[ResumePoints] {len(self.points)} resume points converted from '{filename}'.")
+			except Exception as err:
+				print(f"[ResumePoints] Error: Unable to convert the resume points from '{filename}'!  ({err})")
+
+	def append(self, record):
+		try:
+			with open(self.filename, "a") as fd:
+				fd.write(f"{dumps(record)}\n")
+			self.logLines += 1
+		except OSError as err:
+			print(f"[ResumePoints] Error {err.errno}: Unable to write the resume point to '{self.filename}'!  ({err.strerror})")
+		if self.logLines > len(self.points) + RESUME_POINTS_COMPACT:
+			self.save()
+
+	def save(self):  # Rewrite the log with only the current resume points.
+		try:
+			with open(f"{self.filename}.tmp", "w") as fd:
+				for key, entry in self.points.items():
+					fd.write(f"{dumps(['set', key] + entry)}\n")
+			rename(f"{self.filename}.tmp", self.filename)
+			self.logLines = len(self.points)
+			return True
+		except OSError as err:
+			print(f"[ResumePoints] Error {err.errno}: Unable to save the resume points to '{self.filename}'!  ({err.strerror})")
+			return False
+
+	def sweep(self):
+		if not self.sweeping and self.points:
+			self.sweeping = True
+			threads.deferToThread(findStaleResumePoints, list(self.points)).addCallbacks(self.sweepReady, self.sweepFail)
+
+	def sweepReady(self, stale):
+		self.sweeping = False
+		for key in stale:
+			self.delete(key)
+		if stale:
+			print(f"[ResumePoints] {len(stale)} resume points of deleted files removed.")
+
+	def sweepFail(self, failure):
+		self.sweeping = False
+		print(f"[ResumePoints] Error: Unable to remove the resume points of deleted files!  ({failure})")
+
+
+resumePoints = ResumePoints()
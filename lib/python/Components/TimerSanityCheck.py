@@ -1,16 +1,19 @@
 # -*- coding: utf-8 -*-
 import NavigationInstance
-from time import localtime, mktime, gmtime, time
+from time import localtime, time
 from enigma import iServiceInformation, eServiceCenter, eServiceReference, getBestPlayableServiceReference
-from timer import TimerEntry
+from timer import TimerEntry, repeatedOccurrences
 import RecordTimer
+from ServiceReference import ServiceReference
 from Tools.CIHelper import cihelper
 from Components.config import config
 
 
 class TimerSanityCheck:
+	feasible_environment = None
+	feasible_clusters = set()
+
 	def __init__(self, timerlist, newtimer=None):
-		self.localtimediff = 25 * 3600 - mktime(gmtime(25 * 3600))
 		self.timerlist = timerlist
 		self.newtimer = newtimer
 		self.simultimer = []
@@ -55,6 +58,44 @@ class TimerSanityCheck:
 						return True
 		return False
 
+	def getEnvironment(self):
+		# what else uses tuners and CI slots besides the simulated timers and how the tuners and CI slots are set up
+		playing = NavigationInstance.instance.getCurrentlyPlayingServiceReference()
+		recordings = tuple(sorted(recording.__deref__() for recording in NavigationInstance.instance.getRecordings()))
+		nims = str(config.Nims.saved_value) if hasattr(config, "Nims") else None
+		assignments = str((cihelper.CI_ASSIGNMENT_LIST, cihelper.CI_ASSIGNMENT_SERVICES_LIST, cihelper.CI_MULTIDESCRAMBLE)) if config.misc.use_ci_assignment.value else None
+		return (playing and playing.toString(), recordings, nims, assignments)
+
+	def getTimerRef(self, timer):
+		ref = timer.service_ref and timer.service_ref.ref
+		timer_ref = timer.service_ref
+		if ref and ref.flags & eServiceReference.isGroup and timer.isRunning():
+			alternativeref = None
+			if not timer.justplay:
+				alternativeref = hasattr(timer, "rec_ref") and timer.rec_ref
+				if alternativeref:
+					timer_ref = alternativeref
+			if not alternativeref:
+				timer_ref = getBestPlayableServiceReference(timer.service_ref.ref, eServiceReference())
+		return timer_ref
+
+	def sweepEvents(self):
+		# yields (first, last, simultaneous) for each run of nrep_eventlist[first:last] in which
+		# timers overlap, simultaneous is the highest number of timers running at the same time
+		count = 0
+		first = 0
+		simultaneous = 0
+		for idx, event in enumerate(self.nrep_eventlist):
+			count -= event[1]  # bflag is -1, eflag is 1
+			simultaneous = max(simultaneous, count)
+			if count <= 0:
+				yield first, idx + 1, simultaneous
+				first = idx + 1
+				count = 0
+				simultaneous = 0
+		if first < len(self.nrep_eventlist):
+			yield first, len(self.nrep_eventlist), simultaneous
+
 	def checkTimerlist(self, ext_timer=None):
 		# with special service for external plugins
 		# Entries in eventlist
@@ -83,19 +124,8 @@ class TimerSanityCheck:
 		if curtime.tm_year > 1970 and self.newtimer.end < time():
 			print("[TimerSanityCheck] timer is finished!")
 			return True
-		rflags = self.newtimer.repeated
-		rflags = ((rflags & 0x7F) >> 3) | ((rflags & 0x07) << 4)
-		if rflags:
-			begin = self.newtimer.begin % 86400  # map to first day
-			if (self.localtimediff > 0) and ((begin + self.localtimediff) > 86400):
-				rflags = ((rflags >> 1) & 0x3F) | ((rflags << 6) & 0x40)
-			elif (self.localtimediff < 0) and (begin < self.localtimediff):
-				rflags = ((rflags << 1) & 0x7E) | ((rflags >> 6) & 0x01)
-			while rflags:  # then arrange on the week
-				if rflags & 1:
-					self.rep_eventlist.append((begin, -1))
-				begin += 86400
-				rflags >>= 1
+		if self.newtimer.repeated:
+			self.rep_eventlist.append(-1)
 		else:
 			self.nrep_eventlist.extend([(self.newtimer.begin, self.bflag, -1), (self.newtimer.end, self.eflag, -1)])
 
@@ -108,18 +138,7 @@ class TimerSanityCheck:
 				if timer.disabled or not timer.conflict_detection or not timer.service_ref or '%3a//' in timer.service_ref.ref.toString() or timer.state == TimerEntry.StateEnded:
 					continue
 				if timer.repeated:
-					rflags = timer.repeated
-					rflags = ((rflags & 0x7F) >> 3) | ((rflags & 0x07) << 4)
-					begin = timer.begin % 86400  # map all to first day
-					if (self.localtimediff > 0) and ((begin + self.localtimediff) > 86400):
-						rflags = ((rflags >> 1) & 0x3F) | ((rflags << 6) & 0x40)
-					elif (self.localtimediff < 0) and (begin < self.localtimediff):
-						rflags = ((rflags << 1) & 0x7E) | ((rflags >> 6) & 0x01)
-					while rflags:
-						if rflags & 1:
-							self.rep_eventlist.append((begin, idx))
-						begin += 86400
-						rflags >>= 1
+					self.rep_eventlist.append(idx)
 				else:
 					self.nrep_eventlist.extend([(timer.begin, self.bflag, idx), (timer.end, self.eflag, idx)])
 			self.check_timerlist.append(timer)
@@ -130,42 +149,20 @@ class TimerSanityCheck:
 		if self.nrep_eventlist:
 			interval_begin = min(self.nrep_eventlist)[0]
 			interval_end = max(self.nrep_eventlist)[0]
-			offset_0 = interval_begin - (interval_begin % 604800)
-			weeks = (interval_end - offset_0) // 604800
-			if (interval_end - offset_0) % 604800:
+			window_begin = interval_begin - (interval_begin % 604800)
+			weeks = (interval_end - window_begin) // 604800
+			if (interval_end - window_begin) % 604800:
 				weeks += 1
-			for cnt in range(int(weeks)):
-				for event in self.rep_eventlist:
-					if event[1] == -1:  # -1 is the identifier of the changed timer
-						event_begin = self.newtimer.begin
-						event_end = self.newtimer.end
-					else:
-						event_begin = self.check_timerlist[event[1]].begin
-						event_end = self.check_timerlist[event[1]].end
-					new_event_begin = event[0] + offset_0 + (cnt * 604800)
-					# summertime correction
-					new_lth = localtime(new_event_begin).tm_hour
-					new_event_begin += 3600 * (localtime(event_begin).tm_hour - new_lth)
-					new_event_end = new_event_begin + (event_end - event_begin)
-					if event[1] == -1:
-						if new_event_begin >= self.newtimer.begin:  # is the soap already running?
-							self.nrep_eventlist.extend([(new_event_begin, self.bflag, event[1]), (new_event_end, self.eflag, event[1])])
-					else:
-						if new_event_begin >= self.check_timerlist[event[1]].begin:  # is the soap already running?
-							self.nrep_eventlist.extend([(new_event_begin, self.bflag, event[1]), (new_event_end, self.eflag, event[1])])
-		else:
-			offset_0 = 345600  # the Epoch begins on Thursday
-			for cnt in (0, 1):  # test two weeks to take care of Sunday-Monday transitions
-				for event in self.rep_eventlist:
-					if event[1] == -1:  # -1 is the identifier of the changed timer
-						event_begin = self.newtimer.begin
-						event_end = self.newtimer.end
-					else:
-						event_begin = self.check_timerlist[event[1]].begin
-						event_end = self.check_timerlist[event[1]].end
-					new_event_begin = event[0] + offset_0 + (cnt * 604800)
-					new_event_end = new_event_begin + (event_end - event_begin)
-					self.nrep_eventlist.extend([(new_event_begin, self.bflag, event[1]), (new_event_end, self.eflag, event[1])])
+			window_end = window_begin + weeks * 604800
+		elif self.rep_eventlist:
+			# test two weeks from the moment all repeated timers have started to take care of Sunday-Monday transitions
+			window_begin = max(self.newtimer.begin if idx == -1 else self.check_timerlist[idx].begin for idx in self.rep_eventlist) - 86400
+			window_end = window_begin + 2 * 604800 + 86400
+		for idx in self.rep_eventlist:
+			timer = self.newtimer if idx == -1 else self.check_timerlist[idx]  # -1 is the identifier of the changed timer
+			# repetitions before the timer begins are not included, the soap is not running yet
+			for begin, end in repeatedOccurrences(timer.begin, timer.end, timer.repeated, window_begin, window_end):
+				self.nrep_eventlist.extend([(begin, self.bflag, idx), (end, self.eflag, idx)])
 
 ################################################################################
 # order list chronological
@@ -177,8 +174,6 @@ class TimerSanityCheck:
 		ConflictTimer = None
 		ConflictTunerType = None
 		newTimerTunerType = None
-		cnt = 0
-		idx = 0
 		overlaplist = []
 		is_ci_timer_conflict = False
 		ci_timer = False
@@ -193,108 +188,139 @@ class TimerSanityCheck:
 					if ev[2] == -1:
 						ci_timer_events.append((ev[0], ev[0] + ci_timer_dur))
 
-		for event in self.nrep_eventlist:
-			cnt += event[1]
-			if event[2] == -1:  # new timer
-				timer = self.newtimer
-			else:
-				timer = self.check_timerlist[event[2]]
-			if event[1] == self.bflag:
-				tunerType = []
-				ref = timer.service_ref and timer.service_ref.ref
-				timer_ref = timer.service_ref
-				if ref and ref.flags & eServiceReference.isGroup and timer.isRunning():
-					alternativeref = None
-					if not timer.justplay:
-						alternativeref = hasattr(timer, "rec_ref") and timer.rec_ref
-						if alternativeref:
-							timer_ref = alternativeref
-					if not alternativeref:
-						timer_ref = getBestPlayableServiceReference(timer.service_ref.ref, eServiceReference())
-				fakeRecService = NavigationInstance.instance.recordService(timer_ref, True)
-				if fakeRecService:
-					fakeRecResult = fakeRecService.start(True)
+		# only timers overlapping each other can conflict, so the events are split up into clusters of
+		# overlapping timers and the recordings are simulated per cluster. clusters of timers which were
+		# found to fit on the tuners before are not simulated again as long as nothing else changed.
+		environment = self.getEnvironment()
+		if TimerSanityCheck.feasible_environment != environment or len(TimerSanityCheck.feasible_clusters) > 1000:
+			TimerSanityCheck.feasible_environment = environment
+			TimerSanityCheck.feasible_clusters = set()
+		timer_refs = {}
+		timer_keys = {}
+		assignments = {}
+		self.nrep_eventlist = [(event[0], event[1], event[2], 0, []) for event in self.nrep_eventlist]
+		clusters = [(first, last) for first, last, simultaneous in self.sweepEvents() if simultaneous > 1]  # a timer on its own can not conflict
+		skipped = []
+		position = 0
+		while position < len(clusters):
+			first, last = clusters[position]
+			position += 1
+			for event in self.nrep_eventlist[first:last]:
+				if event[2] not in timer_refs:
+					timer_ref = timer_refs[event[2]] = self.getTimerRef(self.newtimer if event[2] == -1 else self.check_timerlist[event[2]])
+					timer_keys[event[2]] = str(timer_ref) if isinstance(timer_ref, ServiceReference) else timer_ref and timer_ref.toString()
+			cluster = None
+			# once there is a conflict, the overlaps of all clusters are needed to find the involved (repeated) timers
+			if ConflictTimer is None and not ci_timer and not any(event[2] == -1 for event in self.nrep_eventlist[first:last]):
+				cluster = tuple((event[1], timer_keys[event[2]]) for event in self.nrep_eventlist[first:last])
+				if cluster in TimerSanityCheck.feasible_clusters:
+					skipped.append((first, last))
+					continue
+			cnt = 0
+			for idx in range(first, last):
+				event = self.nrep_eventlist[idx]
+				cnt += event[1]
+				if event[2] == -1:  # new timer
+					timer = self.newtimer
 				else:
-					fakeRecResult = -1
-				# TODO
-				# if fakeRecResult == -6 and len(NavigationInstance.instance.getRecordings(True)) < 2:
-				# print("[TimerSanityCheck] less than two timers in the simulated recording list - timer conflict is not plausible - ignored !")
-				# fakeRecResult = 0
-				if not fakeRecResult:  # tune okay
-					if hasattr(fakeRecService, 'frontendInfo'):
-						feinfo = fakeRecService.frontendInfo()
-						if feinfo and hasattr(feinfo, 'getFrontendData'):
-							tunerType.append(feinfo.getFrontendData().get("tuner_type", "UNKNOWN"))
-						feinfo = None
-				else:  # tune failed.. so we must go another way to get service type (DVB-S, DVB-T, DVB-C)
+					timer = self.check_timerlist[event[2]]
+				if event[1] == self.bflag:
+					tunerType = []
+					ref = timer.service_ref and timer.service_ref.ref
+					timer_ref = timer_refs[event[2]]
+					fakeRecService = NavigationInstance.instance.recordService(timer_ref, True)
+					if fakeRecService:
+						fakeRecResult = fakeRecService.start(True)
+					else:
+						fakeRecResult = -1
+					# TODO
+					# if fakeRecResult == -6 and len(NavigationInstance.instance.getRecordings(True)) < 2:
+					# print("[TimerSanityCheck] less than two timers in the simulated recording list - timer conflict is not plausible - ignored !")
+					# fakeRecResult = 0
+					if not fakeRecResult:  # tune okay
+						if hasattr(fakeRecService, 'frontendInfo'):
+							feinfo = fakeRecService.frontendInfo()
+							if feinfo and hasattr(feinfo, 'getFrontendData'):
+								tunerType.append(feinfo.getFrontendData().get("tuner_type", "UNKNOWN"))
+							feinfo = None
+					else:  # tune failed.. so we must go another way to get service type (DVB-S, DVB-T, DVB-C)
 
-					def getServiceType(ref):  # helper function to get a service type of a service reference
-						serviceInfo = serviceHandler.info(ref)
-						serviceInfo = serviceInfo and serviceInfo.getInfoObject(ref, iServiceInformation.sTransponderData)
-						return serviceInfo and serviceInfo.get("tuner_type", "UNKNOWN") or "UNKNOWN"
+						def getServiceType(ref):  # helper function to get a service type of a service reference
+							serviceInfo = serviceHandler.info(ref)
+							serviceInfo = serviceInfo and serviceInfo.getInfoObject(ref, iServiceInformation.sTransponderData)
+							return serviceInfo and serviceInfo.get("tuner_type", "UNKNOWN") or "UNKNOWN"
 
-					if ref and ref.flags & eServiceReference.isGroup:  # service group ?
-						serviceList = serviceHandler.list(ref)  # get all alternative services
-						if serviceList:
-							for ref in serviceList.getContent("R"):  # iterate over all group service references
-								type = getServiceType(ref)
-								if type not in tunerType:  # just add single time
-									tunerType.append(type)
-					elif ref:
-						tunerType.append(getServiceType(ref))
+						if ref and ref.flags & eServiceReference.isGroup:  # service group ?
+							serviceList = serviceHandler.list(ref)  # get all alternative services
+							if serviceList:
+								for ref in serviceList.getContent("R"):  # iterate over all group service references
+									type = getServiceType(ref)
+									if type not in tunerType:  # just add single time
+										tunerType.append(type)
+						elif ref:
+							tunerType.append(getServiceType(ref))
 
-				if event[2] == -1:  # new timer
-					newTimerTunerType = tunerType
-				overlaplist.append((fakeRecResult, timer, tunerType))
-				fakeRecList.append((timer, fakeRecService))
-				if fakeRecResult:
-					if ConflictTimer is None:  # just take care of the first conflict
-						ConflictTimer = timer
-						ConflictTunerType = tunerType
-			elif event[1] == self.eflag:
-				for fakeRec in fakeRecList:
-					if timer == fakeRec[0] and fakeRec[1]:
-						NavigationInstance.instance.stopRecordService(fakeRec[1])
-						fakeRecList.remove(fakeRec)
-				fakeRec = None
-				for entry in overlaplist:
-					if entry[1] == timer:
-						overlaplist.remove(entry)
-			else:
-				print("[TimerSanityCheck] bug: unknown flag!")
+					if event[2] == -1:  # new timer
+						newTimerTunerType = tunerType
+					overlaplist.append((fakeRecResult, timer, tunerType))
+					fakeRecList.append((timer, fakeRecService))
+					if fakeRecResult:
+						if ConflictTimer is None:  # just take care of the first conflict
+							ConflictTimer = timer
+							ConflictTunerType = tunerType
+				elif event[1] == self.eflag:
+					for fakeRec in fakeRecList:
+						if timer == fakeRec[0] and fakeRec[1]:
+							NavigationInstance.instance.stopRecordService(fakeRec[1])
+							fakeRecList.remove(fakeRec)
+					fakeRec = None
+					for entry in overlaplist:
+						if entry[1] == timer:
+							overlaplist.remove(entry)
+				else:
+					print("[TimerSanityCheck] bug: unknown flag!")
 
-			if ci_timer and timer != ci_timer and not is_ci_timer_conflict and not (timer.record_ecm and not timer.descramble):
-				is_assignment = cihelper.ServiceIsAssigned(timer.service_ref.ref.toString(), timer)
-				if is_assignment and new_assignment[0] == is_assignment[0]:
-					if event[1] == self.bflag:
-						timer_begin = event[0]
-						timer_end = event[0] + (timer.end - timer.begin)
-					else:
-						timer_end = event[0]
-						timer_begin = event[0] - (timer.end - timer.begin)
-					for ci_ev in ci_timer_events:
-						if (ci_ev[0] >= timer_begin and ci_ev[0] <= timer_end) or (ci_ev[1] >= timer_begin and ci_ev[1] <= timer_end):
-							timerstr = is_assignment[1] or timer.service_ref.ref.toString()
-							ci_timerstr = ci_timer.service_ref.ref.toString()
-							if ci_timerstr != timerstr:
-								if not ci_timerstr.startswith('1:134:') and not timerstr.startswith('1:134:') and cihelper.canMultiDescramble(is_assignment[0]):
-									eService = eServiceReference(timerstr)
-									eService1 = ci_timer.service_ref.ref
-									for x in (4, 2, 3):
-										if eService.getUnsignedData(x) != eService1.getUnsignedData(x):
-											is_ci_timer_conflict = True
-											break
-								else:
-									is_ci_timer_conflict = True
-								if is_ci_timer_conflict:
-									break
-					if is_ci_timer_conflict and ConflictTimer is None:
-						ConflictTimer = timer
-						ConflictTunerType = tunerType
+				if ci_timer and timer != ci_timer and not is_ci_timer_conflict and not (timer.record_ecm and not timer.descramble):
+					if event[2] not in assignments:
+						assignments[event[2]] = cihelper.ServiceIsAssigned(timer.service_ref.ref.toString(), timer)
+					is_assignment = assignments[event[2]]
+					if is_assignment and new_assignment[0] == is_assignment[0]:
+						if event[1] == self.bflag:
+							timer_begin = event[0]
+							timer_end = event[0] + (timer.end - timer.begin)
+						else:
+							timer_end = event[0]
+							timer_begin = event[0] - (timer.end - timer.begin)
+						for ci_ev in ci_timer_events:
+							if (ci_ev[0] >= timer_begin and ci_ev[0] <= timer_end) or (ci_ev[1] >= timer_begin and ci_ev[1] <= timer_end):
+								timerstr = is_assignment[1] or timer.service_ref.ref.toString()
+								ci_timerstr = ci_timer.service_ref.ref.toString()
+								if ci_timerstr != timerstr:
+									if not ci_timerstr.startswith('1:134:') and not timerstr.startswith('1:134:') and cihelper.canMultiDescramble(is_assignment[0]):
+										eService = eServiceReference(timerstr)
+										eService1 = ci_timer.service_ref.ref
+										for x in (4, 2, 3):
+											if eService.getUnsignedData(x) != eService1.getUnsignedData(x):
+												is_ci_timer_conflict = True
+												break
+									else:
+										is_ci_timer_conflict = True
+									if is_ci_timer_conflict:
+										break
+						if is_ci_timer_conflict and ConflictTimer is None:
+							ConflictTimer = timer
+							ConflictTunerType = tunerType
 
-			self.nrep_eventlist[idx] = (event[0], event[1], event[2], cnt, overlaplist[:])  # insert a duplicate into current overlaplist
-			fakeRecService = None
-			idx += 1
+				self.nrep_eventlist[idx] = (event[0], event[1], event[2], cnt, overlaplist[:])  # insert a duplicate into current overlaplist
+				fakeRecService = None
+
+			if cluster is not None and ConflictTimer is None:
+				TimerSanityCheck.feasible_clusters.add(cluster)
+			if ConflictTimer is not None and skipped:
+				# the skipped clusters fit on the tuners but their overlaps are needed to find all timers
+				# involved in the conflict, the occurrences of a repeated timer can be in any of them
+				clusters.extend(skipped)
+				skipped = []
 
 		if ConflictTimer is None:
 			print("[TimerSanityCheck] conflict not found!")
@@ -7,6 +7,7 @@ from skin import getcomponentTemplateNames, parameters, domScreens
 from Components.Harddisk import harddiskmanager
 from Components.International import international
 from Components.Console import Console
+from Components.Element import setCoalescing
 from Components.config import ConfigSubsection, ConfigDirectory, ConfigYesNo, config, ConfigSelection, ConfigText, ConfigNumber, ConfigSet, ConfigLocations, ConfigSelectionNumber, ConfigSelectionInteger, ConfigClock, ConfigSlider, ConfigEnableDisable, ConfigSubDict, ConfigDictionarySet, ConfigInteger, ConfigSequence, ConfigPassword, ConfigIP, NoSave, ConfigBoolean
 from Tools.Directories import SCOPE_HDD, SCOPE_TIMESHIFT, defaultRecordingLocation, resolveFilename, fileWriteLine, fileReadXML, SCOPE_SKIN
 from enigma import setTunerTypePriorityOrder, setPreferredTuner, setSpinnerOnOff, setEnableTtCachingOnOff, eEnv, eDVBDB, Misc_Options, eBackgroundFileEraser, eServiceEvent, eSubtitleSettings, eSettings, eDVBLocalTimeHandler, eEPGCache
@@ -274,7 +275,13 @@ def InitUsageConfig():
 	config.usage.channelselection_preview = ConfigYesNo(default=False)
 	config.usage.show_spinner = ConfigYesNo(default=True)
 	config.usage.enable_blinking = ConfigYesNo(default=True)
+	config.usage.coalesce_changes = ConfigSelection(default="off", choices=[
+		("off", _("Off")),
+		("tick", _("Once per main loop cycle")),
+		("frame", _("Once per frame"))
+	])
 	config.usage.plugin_sort_weight = ConfigDictionarySet()
+	config.usage.plugin_lazy_load = ConfigYesNo(default=False)
 	config.usage.menu_sort_weight = ConfigDictionarySet(default={"mainmenu": {"submenu": {}}})
 	config.usage.menu_sort_mode = ConfigSelection(default="default", choices=[
 		("a_z", _("Alphabetical")),
@@ -803,6 +810,10 @@ def InitUsageConfig():
 		setSpinnerOnOff(int(configElement.value))
 	config.usage.show_spinner.addNotifier(SpinnerOnOffChanged)
 
+	def CoalesceChangesChanged(configElement):
+		setCoalescing(configElement.value)
+	config.usage.coalesce_changes.addNotifier(CoalesceChangesChanged)
+
 	def EnableTtCachingChanged(configElement):
 		setEnableTtCachingOnOff(int(configElement.value))
 	config.usage.enable_tt_caching.addNotifier(EnableTtCachingChanged)
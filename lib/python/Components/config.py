@@ -7,6 +7,7 @@ from enigma import getPrevAsciiCode
 
 from Tools.Directories import SCOPE_CONFIG, fileAccess, resolveFilename
 from Tools.NumericalTextInput import NumericalTextInput
+from Tools.Profile import profiled
 from Components.Harddisk import harddiskmanager  # This import is order critical!
 
 ACTIONKEY_LEFT = 0
@@ -2351,6 +2352,7 @@ class Config(ConfigSubsection):
 class ConfigFile:
 	CONFIG_FILE = resolveFilename(SCOPE_CONFIG, "settings")
 
+	@profiled("configfile.load")
 	def load(self):
 		try:
 			config.loadFromFile(self.CONFIG_FILE, baseFile=True)
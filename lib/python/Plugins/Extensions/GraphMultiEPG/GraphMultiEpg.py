@@ -614,12 +614,13 @@ class EPGList(GUIComponent):
 			end = start + self.time_epoch * 60
 
 			now = time()
-			for ev in events:  # (event_id, event_title, begin_time, duration)
+			timerEvents = [(ev[0], ev[2], ev[3], service) for ev in events]
+			recs = self.timer.isInTimers(timerEvents)
+			disabled = self.timer.isInTimers(timerEvents, disabledTimers=True) if config.misc.graph_mepg.show_disabled_timers.value else [None] * len(events)
+			for ev, rec, dis in zip(events, recs, disabled):  # (event_id, event_title, begin_time, duration)
 				stime = ev[2]
 				duration = ev[3]
 				xpos, ewidth = self.calcEntryPosAndWidthHelper(stime, duration, start, end, width)
-				rec = self.timer.isInTimer(ev[0], stime, duration, service)
-				dis = self.timer.isInTimer(ev[0], stime, duration, service, disabledTimers=True) if config.misc.graph_mepg.show_disabled_timers.value else None
 
 				# event box background
 				foreColorSelected = foreColor = self.foreColor
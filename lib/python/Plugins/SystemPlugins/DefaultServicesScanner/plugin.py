@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from Components.ChannelNumbers import channelNumbers
 from Components.NimManager import nimmanager
 from Plugins.Plugin import PluginDescriptor
 from Screens.ScanSetup import ScanSetup
@@ -42,6 +43,7 @@ class DefaultServiceScan(ServiceScan):
 			pass
 		db = eDVBDB.getInstance()
 		db.reloadServicelist()
+		channelNumbers.invalidate()
 		ServiceScan.__init__(self, session, scanList)
 		self.timer = eTimer()
 		self.timer.callback.append(self.keySave)
@@ -121,6 +123,7 @@ class DefaultServicesScannerPlugin(ScanSetup):
 			confdir = resolveFilename(SCOPE_CONFIG)
 			copyfile(confdir + "/lamedb.backup", confdir + "/lamedb")
 			db.reloadServicelist()
+			channelNumbers.invalidate()
 			self.close()
 		else:
 			self.selectSat(self.scanIndex)
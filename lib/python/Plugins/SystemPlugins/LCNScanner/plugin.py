@@ -7,6 +7,7 @@ from sys import maxsize
 from enigma import eDVBDB, eServiceCenter, eServiceReference, eTimer
 
 from Components.ActionMap import HelpableActionMap
+from Components.ChannelNumbers import channelNumbers
 from Components.config import ConfigSelection, ConfigSubsection, ConfigYesNo, config
 from Components.PluginComponent import plugins
 from Components.Sources.StaticText import StaticText
@@ -459,6 +460,7 @@ class LCNScanner:
 				print("[LCNScanner] Error: The 'lcndb' file could not be updated!")
 			eDVBDB.getInstance().reloadServicelist()
 		eDVBDB.getInstance().reloadBouquets()
+		channelNumbers.invalidate()
 		print("[LCNScanner] LCN scan finished.")
 		if callback and callable(callback):
 			callback()
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
-from enigma import eEPGCache, getBestPlayableServiceReference, eStreamServer, eServiceReference, iRecordableService, quitMainloop, eActionMap, setPreferredTuner
+from enigma import eEPGCache, getBestPlayableServiceReference, eStreamServer, eServiceReference, iRecordableService, quitMainloop, eActionMap, setPreferredTuner, eTimer
 
 from Components.config import config
 from Components.UsageConfig import defaultMoviePath
@@ -26,8 +26,11 @@ import NavigationInstance
 from ServiceReference import ServiceReference, isPlayableForCur
 
 from time import localtime, strftime, ctime, time
-from bisect import insort
-from sys import maxsize
+from bisect import bisect_left, bisect_right, insort
+from struct import Struct
+from sys import intern, maxsize
+from weakref import WeakValueDictionary
+from zlib import crc32
 
 # ok, for descriptions etc we have:
 # service reference  (to get the service name)
@@ -87,6 +90,10 @@ def checkForRecordings():
 	return rec_time > 0 and (rec_time - time()) < 360
 
 
+# ended timers of the same service share one ServiceReference
+sharedServiceReferences = WeakValueDictionary()
+
+
 def createRecordTimerEntry(timer):
 	return RecordTimerEntry(timer.service_ref, timer.begin, timer.end, timer.name, timer.description,
 		timer.eit, timer.disabled, timer.justplay, timer.afterEvent, dirname=timer.dirname,
@@ -98,6 +105,8 @@ def createRecordTimerEntry(timer):
 
 
 class RecordTimerEntry(timer.TimerEntry):
+	MaxEndedLogEntries = 25
+
 # the following static methods and members are only in use when the box is in (soft) standby
 	wasInStandby = False
 	wasInDeepStandby = False
@@ -234,6 +243,18 @@ class RecordTimerEntry(timer.TimerEntry):
 		self.log_entries.append((int(time()), code, msg))
 		print("[[RecordTimer]]", msg)
 
+	def compact(self):
+		# keep ended timers small, they may stay in processed_timers for days
+		if not isinstance(self.log_entries, timer.CompactTimerLog):
+			self.log_entries = timer.CompactTimerLog(self.log_entries, self.MaxEndedLogEntries)
+		self.service_ref = sharedServiceReferences.setdefault(str(self.service_ref), self.service_ref)
+		for attribute in ("name", "description", "dirname"):
+			value = getattr(self, attribute)
+			if type(value) is str:
+				setattr(self, attribute, intern(value))
+		self.tags = [intern(tag) for tag in self.tags]
+		self.ts_dialog = None
+
 	def calculateFilename(self, name=None):
 		service_name = self.service_ref.getServiceName()
 		begin_date = strftime("%Y%m%d %H%M", localtime(self.begin))
@@ -872,12 +893,86 @@ def createTimer(xml):
 	return entry
 
 
+# service keyed lookup table used by RecordTimer.isInTimer()
+# single timers are kept sorted by begin time per service, so only the timers
+# around the requested event are checked, repeated timers are split up per
+# weekday on the first lookup for that day.
+class RecordTimerIndex:
+	def __init__(self, timers, disabledOnly=False):
+		self.size = len(timers)
+		self.services = {}
+		for position, x in enumerate(timers):
+			if disabledOnly and not x.disabled:
+				continue
+			refstr = ':'.join(x.service_ref.ref.toString().split(':')[:11])
+			service = self.services.get(refstr)
+			if service is None:
+				service = self.services[refstr] = RecordTimerIndexService()
+			service.add(position, x)
+		for service in self.services.values():
+			service.sort()
+
+	def lookup(self, service, begin, end):
+		service = self.services.get(':'.join(service.split(':')[:11]))
+		return service.lookup(begin, end) if service else []
+
+
+class RecordTimerIndexService:
+	def __init__(self):
+		self.begins = []
+		self.timers = []
+		self.repeated = []
+		self.weekdays = {}
+		self.span = 0
+
+	def add(self, position, x):
+		if x.repeated:
+			self.repeated.append((position, x))
+		else:
+			self.timers.append((x.begin, position, x))
+			# an event may still match a timer which began up to a minute too late or ended up to a minute too early
+			self.span = max(self.span, x.end - x.begin + 60)
+
+	def sort(self):
+		self.timers.sort(key=lambda entry: (entry[0], entry[1]))
+		self.begins = [entry[0] for entry in self.timers]
+
+	def getRepeated(self, wday):
+		timers = self.weekdays.get(wday)
+		if timers is None:
+			# the previous day is needed for timers running over midnight
+			mask = (1 << wday) | (1 << ((wday - 1) % 7))
+			timers = self.weekdays[wday] = [(position, x) for position, x in self.repeated if x.repeated & mask or x.disabled and x.isRunning()]
+		return timers
+
+	def lookup(self, begin, end):
+		found = [(position, x) for timer_begin, position, x in self.timers[bisect_left(self.begins, begin - self.span):bisect_right(self.begins, end + 60)]]
+		if self.repeated:
+			found += [(position, x) for position, x in self.getRepeated(localtime(begin).tm_wday) if x.begin <= end]
+			found.sort(key=lambda entry: entry[0])
+		return [x for position, x in found]
+
+
 class RecordTimer(timer.Timer):
+	JOURNAL_MAGIC = b"E2TIMERJOURNAL1\n"
+	JOURNAL_HEADER = Struct("<qq")
+	JOURNAL_RECORD = Struct("<BIII")
+	JOURNAL_SET = 1
+	JOURNAL_DELETE = 2
+	JournalSizeLimit = 256 * 1024
+	JournalCompactInterval = 15 * 60
+
 	def __init__(self):
+		self.timer_index = {}
 		timer.Timer.__init__(self)
 
 		self.Filename = resolveFilename(SCOPE_CONFIG, "timers.xml")
 		self.fallback_timer_list = []
+		self.saved_timers = {}
+		self.journal_base = None
+		self.journal_next_id = 0
+		self.compact_timer = eTimer()
+		self.compact_timer.callback.append(self.compactTimers)
 
 		try:
 			self.loadTimer()
@@ -903,12 +998,12 @@ class RecordTimer(timer.Timer):
 			if w.activate():
 				w.state += 1
 
-		self.timer_list.remove(w)
+		self.removeTimer(w)
 
 		# did this timer reached the last state?
 		if w.state < RecordTimerEntry.StateEnded:
 			# no, sort it into active list
-			insort(self.timer_list, w)
+			self.insertTimer(w)
 		else:
 			# yes. Process repeated, and re-add.
 			if w.repeated:
@@ -926,6 +1021,7 @@ class RecordTimer(timer.Timer):
 				# If we want to keep done timers, re-insert in the active list
 				if config.recording.keep_timers.value > 0 and w not in self.processed_timers:
 					insort(self.processed_timers, w)
+					w.compact()
 					self.saveTimer()
 
 		self.stateChanged(w)
@@ -945,14 +1041,44 @@ class RecordTimer(timer.Timer):
 		return False
 
 	def loadTimer(self):
+		# timers.xml is streamed and the timers are checked as they come in, entries which
+		# were changed or deleted after the last compaction are replaced from the journal
+		self.saved_timers = {}
+		self.journal_base = None
+		changes = self.readJournal()
+		checkit = False
+		timer_text = ""
+		position = 0
+		root = None
+
+		def loadEntry(element, position):
+			newTimer = createTimer(element)
+			self.saved_timers[newTimer] = (position, self.timerToXML(newTimer))
+			conflict_list = self.record(newTimer, ignoreTSC=True, dosave=False, loadtimer=True)
+			if conflict_list and newTimer in conflict_list:
+				return conflict_list, _("\nTimer '%s' disabled!") % newTimer.name
+			return conflict_list, ""
+
 		try:
-			doc = xml.etree.ElementTree.parse(self.Filename)
+			for event, element in xml.etree.ElementTree.iterparse(self.Filename, events=("start", "end")):
+				if root is None:
+					root = element
+				elif event == "end" and element.tag == "timer":
+					if position in changes:
+						fragment = changes.pop(position)
+						element = fragment and xml.etree.ElementTree.fromstring(fragment)
+					if element is not None:
+						conflict_list, text = loadEntry(element, position)
+						checkit = checkit or bool(conflict_list)
+						timer_text += text
+					position += 1
+					root.clear()
 		except SyntaxError:
 			AddPopup(_("The timer file (timers.xml) is corrupt and could not be loaded."), type=MessageBox.TYPE_ERROR, timeout=0, id="TimerLoadFailed")
 
 			print("[RecordTimer] timers.xml failed to load!")
+			self.removeJournal()
 			try:
-				import os
 				os.rename(self.Filename, self.Filename + "_old")
 			except (IOError, OSError):
 				print("renaming broken timer failed")
@@ -961,113 +1087,94 @@ class RecordTimer(timer.Timer):
 			print("[RecordTimer] timers.xml not found!")
 			return
 
-		root = doc.getroot()
-
-		checkit = False
-		timer_text = ""
-		for timer in root.findall("timer"):
-			newTimer = createTimer(timer)
-			conflict_list = self.record(newTimer, ignoreTSC=True, dosave=False, loadtimer=True)
-			if conflict_list:
-				checkit = True
-				if newTimer in conflict_list:
-					timer_text += _("\nTimer '%s' disabled!") % newTimer.name
+		self.journal_base = self.getTimerFileStat()
+		self.journal_next_id = max([position] + [x + 1 for x in changes])
+		for position, fragment in sorted(changes.items()):
+			if fragment:
+				conflict_list, text = loadEntry(xml.etree.ElementTree.fromstring(fragment), position)
+				checkit = checkit or bool(conflict_list)
+				timer_text += text
+		if os.path.exists(self.Filename + ".journal"):
+			self.compact_timer.start(self.JournalCompactInterval * 1000, True)
 		if checkit:
 			AddPopup(_("Timer overlap in timers.xml detected!\nPlease recheck it!") + timer_text, type=MessageBox.TYPE_ERROR, timeout=0, id="TimerLoadFailed")
 
-	def saveTimer(self):
-		# root_element = xml.etree.ElementTree.Element('timers')
-		# root_element.text = "\n"
-
-		# for timer in self.timer_list + self.processed_timers:
-			# some timers (instant records) don't want to be saved.
-			# skip them
-			# if timer.dontSave:
-				#continue
-			# t = xml.etree.ElementTree.SubElement(root_element, 'timers')
-			# t.set("begin", str(int(timer.begin)))
-			# t.set("end", str(int(timer.end)))
-			# t.set("serviceref", str(timer.service_ref))
-			# t.set("repeated", str(timer.repeated))
-			# t.set("name", timer.name)
-			# t.set("description", timer.description)
-			# t.set("afterevent", str({
-			#	AFTEREVENT.NONE: "nothing",
-			#	AFTEREVENT.STANDBY: "standby",
-			#	AFTEREVENT.DEEPSTANDBY: "deepstandby",
-			#	AFTEREVENT.AUTO: "auto"}))
-			# if timer.eit is not None:
-			#	t.set("eit", str(timer.eit))
-			# if timer.dirname is not None:
-			#	t.set("location", str(timer.dirname))
-			# t.set("disabled", str(int(timer.disabled)))
-			# t.set("justplay", str(int(timer.justplay)))
-			# t.text = "\n"
-			# t.tail = "\n"
-
-			#for time, code, msg in timer.log_entries:
-				#l = xml.etree.ElementTree.SubElement(t, 'log')
-				#l.set("time", str(time))
-				#l.set("code", str(code))
-				#l.text = str(msg)
-				#l.tail = "\n"
-
-		#doc = xml.etree.ElementTree.ElementTree(root_element)
-		#doc.write(self.Filename)
-
+	def timerToXML(self, timer):
 		list = []
+		list.append('<timer')
+		list.append(' begin="' + str(int(timer.begin)) + '"')
+		list.append(' end="' + str(int(timer.end)) + '"')
+		list.append(' serviceref="' + stringToXML(str(timer.service_ref)) + '"')
+		list.append(' repeated="' + str(int(timer.repeated)) + '"')
+		list.append(' name="' + str(stringToXML(timer.name)) + '"')
+		list.append(' description="' + str(stringToXML(timer.description)) + '"')
+		list.append(' afterevent="' + str(stringToXML({
+			AFTEREVENT.NONE: "nothing",
+			AFTEREVENT.STANDBY: "standby",
+			AFTEREVENT.DEEPSTANDBY: "deepstandby",
+			AFTEREVENT.AUTO: "auto"
+			}[timer.afterEvent])) + '"')
+		if timer.eit is not None:
+			list.append(' eit="' + str(timer.eit) + '"')
+		if timer.dirname:
+			list.append(' location="' + str(stringToXML(timer.dirname)) + '"')
+		if timer.tags:
+			list.append(' tags="' + str(stringToXML(' '.join(timer.tags))) + '"')
+		if timer.disabled:
+			list.append(' disabled="' + str(int(timer.disabled)) + '"')
+		list.append(' justplay="' + str(int(timer.justplay)) + '"')
+		list.append(' always_zap="' + str(int(timer.always_zap)) + '"')
+		list.append(' pipzap="' + str(int(timer.pipzap)) + '"')
+		list.append(' zap_wakeup="' + str(timer.zap_wakeup) + '"')
+		list.append(' rename_repeat="' + str(int(timer.rename_repeat)) + '"')
+		list.append(' conflict_detection="' + str(int(timer.conflict_detection)) + '"')
+		list.append(' descramble="' + str(int(timer.descramble)) + '"')
+		list.append(' record_ecm="' + str(int(timer.record_ecm)) + '"')
+		if timer.flags:
+			list.append(' flags="' + ' '.join([stringToXML(x) for x in timer.flags]) + '"')
+		list.append('>\n')
+
+		if config.recording.debug.value:
+			for time, code, msg in timer.log_entries:
+				list.append('<log')
+				list.append(' code="' + str(code) + '"')
+				list.append(' time="' + str(time) + '"')
+				list.append('>')
+				list.append(str(stringToXML(msg)))
+				list.append('</log>\n')
+
+		list.append('</timer>\n')
+		return ''.join(list)
 
-		list.append('<?xml version="1.0" ?>\n')
-		list.append('<timers>\n')
-
+	def saveTimer(self):
+		# only the timers which changed since the last save are appended to the journal,
+		# timers.xml itself is rewritten when the journal gets too big, periodically and at shutdown
+		saved_timers = {}
+		changes = []
 		for timer in self.timer_list + self.processed_timers:
 			if timer.dontSave:
 				continue
-
-			list.append('<timer')
-			list.append(' begin="' + str(int(timer.begin)) + '"')
-			list.append(' end="' + str(int(timer.end)) + '"')
-			list.append(' serviceref="' + stringToXML(str(timer.service_ref)) + '"')
-			list.append(' repeated="' + str(int(timer.repeated)) + '"')
-			list.append(' name="' + str(stringToXML(timer.name)) + '"')
-			list.append(' description="' + str(stringToXML(timer.description)) + '"')
-			list.append(' afterevent="' + str(stringToXML({
-				AFTEREVENT.NONE: "nothing",
-				AFTEREVENT.STANDBY: "standby",
-				AFTEREVENT.DEEPSTANDBY: "deepstandby",
-				AFTEREVENT.AUTO: "auto"
-				}[timer.afterEvent])) + '"')
-			if timer.eit is not None:
-				list.append(' eit="' + str(timer.eit) + '"')
-			if timer.dirname:
-				list.append(' location="' + str(stringToXML(timer.dirname)) + '"')
-			if timer.tags:
-				list.append(' tags="' + str(stringToXML(' '.join(timer.tags))) + '"')
-			if timer.disabled:
-				list.append(' disabled="' + str(int(timer.disabled)) + '"')
-			list.append(' justplay="' + str(int(timer.justplay)) + '"')
-			list.append(' always_zap="' + str(int(timer.always_zap)) + '"')
-			list.append(' pipzap="' + str(int(timer.pipzap)) + '"')
-			list.append(' zap_wakeup="' + str(timer.zap_wakeup) + '"')
-			list.append(' rename_repeat="' + str(int(timer.rename_repeat)) + '"')
-			list.append(' conflict_detection="' + str(int(timer.conflict_detection)) + '"')
-			list.append(' descramble="' + str(int(timer.descramble)) + '"')
-			list.append(' record_ecm="' + str(int(timer.record_ecm)) + '"')
-			if timer.flags:
-				list.append(' flags="' + ' '.join([stringToXML(x) for x in timer.flags]) + '"')
-			list.append('>\n')
-
-			if config.recording.debug.value:
-				for time, code, msg in timer.log_entries:
-					list.append('<log')
-					list.append(' code="' + str(code) + '"')
-					list.append(' time="' + str(time) + '"')
-					list.append('>')
-					list.append(str(stringToXML(msg)))
-					list.append('</log>\n')
-
-			list.append('</timer>\n')
-
+			fragment = self.timerToXML(timer)
+			previous = self.saved_timers.pop(timer, None)
+			if previous is None:
+				saved_timers[timer] = (self.journal_next_id, fragment)
+				changes.append((self.JOURNAL_SET, self.journal_next_id, fragment))
+				self.journal_next_id += 1
+			else:
+				saved_timers[timer] = (previous[0], fragment)
+				if previous[1] != fragment:
+					changes.append((self.JOURNAL_SET, previous[0], fragment))
+		changes += [(self.JOURNAL_DELETE, position, "") for position, fragment in self.saved_timers.values()]
+		self.saved_timers = saved_timers
+		if changes and not self.appendJournal(changes):
+			self.compactTimers()
+
+	def compactTimers(self):
+		self.compact_timer.stop()
+		list = []
+		list.append('<?xml version="1.0" ?>\n')
+		list.append('<timers>\n')
+		list += [fragment for position, fragment in self.saved_timers.values()]
 		list.append('</timers>\n')
 
 		file = open(self.Filename + ".writing", "w")
@@ -1075,10 +1182,84 @@ class RecordTimer(timer.Timer):
 			file.write(x)
 		file.flush()
 
-		import os
 		os.fsync(file.fileno())
 		file.close()
 		os.rename(self.Filename + ".writing", self.Filename)
+		self.removeJournal()
+		self.saved_timers = {timer: (position, fragment) for position, (timer, (oldposition, fragment)) in enumerate(self.saved_timers.items())}
+		self.journal_next_id = len(self.saved_timers)
+		self.journal_base = self.getTimerFileStat()
+
+	def getTimerFileStat(self):
+		try:
+			st = os.stat(self.Filename)
+			return (st.st_size, st.st_mtime_ns)
+		except OSError:
+			return None
+
+	def removeJournal(self):
+		try:
+			os.remove(self.Filename + ".journal")
+		except OSError:
+			pass
+
+	# the journal starts with a header naming the size and mtime of the timers.xml it belongs to,
+	# followed by (operation, position, length, crc32) records each carrying one <timer> element
+	def appendJournal(self, changes):
+		if self.journal_base is None:
+			return False
+		try:
+			with open(self.Filename + ".journal", "ab") as file:
+				size = file.tell()
+				if size > self.JournalSizeLimit:
+					return False
+				data = []
+				if size == 0:
+					data.append(self.JOURNAL_MAGIC + self.JOURNAL_HEADER.pack(*self.journal_base))
+				for operation, position, fragment in changes:
+					fragment = fragment.encode("UTF-8")
+					data.append(self.JOURNAL_RECORD.pack(operation, position, len(fragment), crc32(fragment)))
+					data.append(fragment)
+				file.write(b"".join(data))
+				file.flush()
+				os.fsync(file.fileno())
+		except OSError as err:
+			print("[RecordTimer] Error: Unable to write timer journal!  (%s)" % str(err))
+			return False
+		if not self.compact_timer.isActive():
+			self.compact_timer.start(self.JournalCompactInterval * 1000, True)
+		return True
+
+	# returns a dict of position -> <timer> element text, or None for deleted timers
+	def readJournal(self):
+		changes = {}
+		filename = self.Filename + ".journal"
+		try:
+			with open(filename, "rb") as file:
+				data = file.read()
+		except OSError:
+			return changes
+		offset = len(self.JOURNAL_MAGIC) + self.JOURNAL_HEADER.size
+		if data[:len(self.JOURNAL_MAGIC)] != self.JOURNAL_MAGIC or len(data) < offset or self.JOURNAL_HEADER.unpack_from(data, len(self.JOURNAL_MAGIC)) != self.getTimerFileStat():
+			# timers.xml was written (or replaced) after this journal, so it is already part of it
+			print("[RecordTimer] Discarding stale timer journal.")
+			self.removeJournal()
+			return changes
+		while offset + self.JOURNAL_RECORD.size <= len(data):
+			operation, position, length, crc = self.JOURNAL_RECORD.unpack_from(data, offset)
+			fragment = data[offset + self.JOURNAL_RECORD.size:offset + self.JOURNAL_RECORD.size + length]
+			if len(fragment) != length or crc32(fragment) != crc:
+				break
+			changes[position] = fragment.decode("UTF-8") if operation == self.JOURNAL_SET else None
+			offset += self.JOURNAL_RECORD.size + length
+		if offset != len(data):
+			print("[RecordTimer] Timer journal has a damaged tail, truncating it.")
+			try:
+				os.truncate(filename, offset)
+			except OSError:
+				self.removeJournal()
+				self.journal_base = None
+		return changes
 
 	def getNextZapTime(self, isWakeup=False):
 		now = time()
@@ -1253,6 +1434,7 @@ class RecordTimer(timer.Timer):
 
 	def setFallbackTimerList(self, list):
 		self.fallback_timer_list = [timer for timer in list if timer.state != 3]
+		self.invalidateTimerIndex()
 
 	def getAllTimersList(self):
 		return self.timer_list + self.fallback_timer_list
@@ -1260,105 +1442,99 @@ class RecordTimer(timer.Timer):
 	def getDisabledTimers(self):
 		return self.processed_timers # TODO add  fallback processed timers too
 
+	def invalidateTimerIndex(self):
+		self.timer_index = {}
+
+	def getTimerIndex(self, disabledTimers=False):
+		index = self.timer_index.get(disabledTimers)
+		# the size check catches lists which were changed without notifying us
+		size = len(self.processed_timers) if disabledTimers else len(self.timer_list) + len(self.fallback_timer_list)
+		if index is None or index.size != size:
+			timersList = self.getDisabledTimers() if disabledTimers else self.getAllTimersList()
+			index = self.timer_index[disabledTimers] = RecordTimerIndex(timersList, disabledOnly=disabledTimers)
+		return index
+
 	def isInTimer(self, eventid, begin, duration, service, disabledTimers=False):
+		return self.isInTimers(((eventid, begin, duration, service),), disabledTimers)[0]
+
+	def isInTimers(self, events, disabledTimers=False):
+		# events is a sequence of (eventid, begin, duration, service) tuples, the result
+		# is a list with the isInTimer() result for each of them in the same order
+		index = self.getTimerIndex(disabledTimers)
+		check_offset_time = not config.recording.margin_before.value and not config.recording.margin_after.value
+		return [self.matchTimers(index.lookup(service, begin, begin + duration), begin, duration, check_offset_time) for eventid, begin, duration, service in events]
+
+	def matchTimers(self, timersList, begin, duration, check_offset_time):
 		returnValue = None
 		type = 0
 		time_match = 0
 		bt = None
-		check_offset_time = not config.recording.margin_before.value and not config.recording.margin_after.value
 		end = begin + duration
-		refstr = ':'.join(service.split(':')[:11])
-		timersList = self.getAllTimersList() if not disabledTimers else self.getDisabledTimers()
 		for x in timersList:
-			if disabledTimers and not x.disabled:
-				continue
-			check = ':'.join(x.service_ref.ref.toString().split(':')[:11]) == refstr
-			if check:
-				timer_end = x.end
-				timer_begin = x.begin
-				type_offset = 0
-				if not x.repeated and check_offset_time:
-					if 0 < end - timer_end <= 59:
-						timer_end = end
-					elif 0 < timer_begin - begin <= 59:
-						timer_begin = begin
-				if x.justplay:
-					type_offset = 5
-					if (timer_end - x.begin) <= 1:
-						timer_end += 60
-					if x.pipzap and not x.repeated:
-						type_offset = 30
-				if x.always_zap:
-					type_offset = 10
-
-				timer_repeat = x.repeated
-				# if set 'don't stop current event but disable coming events' for repeat timer
-				running_only_curevent = x.disabled and x.isRunning() and timer_repeat
-				if running_only_curevent:
-					timer_repeat = 0
-					type_offset += 15
-
-				if timer_repeat != 0:
-					type_offset += 15
-					if bt is None:
-						bt = localtime(begin)
-						bday = bt.tm_wday
-						begin2 = 1440 + bt.tm_hour * 60 + bt.tm_min
-						end2 = begin2 + duration / 60
-					xbt = localtime(x.begin)
-					xet = localtime(timer_end)
-					offset_day = False
-					checking_time = x.begin < begin or begin <= x.begin <= end
-					if xbt.tm_yday != xet.tm_yday:
-						oday = bday - 1
-						if oday == -1:
-							oday = 6
-						offset_day = x.repeated & (1 << oday)
-					xbegin = 1440 + xbt.tm_hour * 60 + xbt.tm_min
-					xend = xbegin + ((timer_end - x.begin) / 60)
-					if xend < xbegin:
-						xend += 1440
-					if x.repeated & (1 << bday) and checking_time:
-						if begin2 < xbegin <= end2:
-							if xend < end2:
-								# recording within event
-								time_match = (xend - xbegin) * 60
-								type = type_offset + 3
-							else:
-								# recording last part of event
-								time_match = (end2 - xbegin) * 60
-								type = type_offset + 1
-						elif xbegin <= begin2 <= xend:
-							if xend < end2:
-								# recording first part of event
-								time_match = (xend - begin2) * 60
-								type = type_offset + 4
-							else:
-								# recording whole event
-								time_match = (end2 - begin2) * 60
-								type = type_offset + 2
-						elif offset_day:
-							xbegin -= 1440
-							xend -= 1440
-							if begin2 < xbegin <= end2:
-								if xend < end2:
-									# recording within event
-									time_match = (xend - xbegin) * 60
-									type = type_offset + 3
-								else:
-									# recording last part of event
-									time_match = (end2 - xbegin) * 60
-									type = type_offset + 1
-							elif xbegin <= begin2 <= xend:
-								if xend < end2:
-									# recording first part of event
-									time_match = (xend - begin2) * 60
-									type = type_offset + 4
-								else:
-									# recording whole event
-									time_match = (end2 - begin2) * 60
-									type = type_offset + 2
-					elif offset_day and checking_time:
+			timer_end = x.end
+			timer_begin = x.begin
+			type_offset = 0
+			if not x.repeated and check_offset_time:
+				if 0 < end - timer_end <= 59:
+					timer_end = end
+				elif 0 < timer_begin - begin <= 59:
+					timer_begin = begin
+			if x.justplay:
+				type_offset = 5
+				if (timer_end - x.begin) <= 1:
+					timer_end += 60
+				if x.pipzap and not x.repeated:
+					type_offset = 30
+			if x.always_zap:
+				type_offset = 10
+
+			timer_repeat = x.repeated
+			# if set 'don't stop current event but disable coming events' for repeat timer
+			running_only_curevent = x.disabled and x.isRunning() and timer_repeat
+			if running_only_curevent:
+				timer_repeat = 0
+				type_offset += 15
+
+			if timer_repeat != 0:
+				type_offset += 15
+				if bt is None:
+					bt = localtime(begin)
+					bday = bt.tm_wday
+					begin2 = 1440 + bt.tm_hour * 60 + bt.tm_min
+					end2 = begin2 + duration / 60
+				xbt = localtime(x.begin)
+				xet = localtime(timer_end)
+				offset_day = False
+				checking_time = x.begin < begin or begin <= x.begin <= end
+				if xbt.tm_yday != xet.tm_yday:
+					oday = bday - 1
+					if oday == -1:
+						oday = 6
+					offset_day = x.repeated & (1 << oday)
+				xbegin = 1440 + xbt.tm_hour * 60 + xbt.tm_min
+				xend = xbegin + ((timer_end - x.begin) / 60)
+				if xend < xbegin:
+					xend += 1440
+				if x.repeated & (1 << bday) and checking_time:
+					if begin2 < xbegin <= end2:
+						if xend < end2:
+							# recording within event
+							time_match = (xend - xbegin) * 60
+							type = type_offset + 3
+						else:
+							# recording last part of event
+							time_match = (end2 - xbegin) * 60
+							type = type_offset + 1
+					elif xbegin <= begin2 <= xend:
+						if xend < end2:
+							# recording first part of event
+							time_match = (xend - begin2) * 60
+							type = type_offset + 4
+						else:
+							# recording whole event
+							time_match = (end2 - begin2) * 60
+							type = type_offset + 2
+					elif offset_day:
 						xbegin -= 1440
 						xend -= 1440
 						if begin2 < xbegin <= end2:
@@ -1379,35 +1555,56 @@ class RecordTimer(timer.Timer):
 								# recording whole event
 								time_match = (end2 - begin2) * 60
 								type = type_offset + 2
-				else:
-					if begin < timer_begin <= end:
-						if timer_end < end:
+				elif offset_day and checking_time:
+					xbegin -= 1440
+					xend -= 1440
+					if begin2 < xbegin <= end2:
+						if xend < end2:
 							# recording within event
-							time_match = timer_end - timer_begin
+							time_match = (xend - xbegin) * 60
 							type = type_offset + 3
 						else:
 							# recording last part of event
-							time_match = end - timer_begin
+							time_match = (end2 - xbegin) * 60
 							type = type_offset + 1
-					elif timer_begin <= begin <= timer_end:
-						if timer_end < end:
+					elif xbegin <= begin2 <= xend:
+						if xend < end2:
 							# recording first part of event
-							time_match = timer_end - begin
+							time_match = (xend - begin2) * 60
 							type = type_offset + 4
 						else:
 							# recording whole event
-							time_match = end - begin
+							time_match = (end2 - begin2) * 60
 							type = type_offset + 2
-				if time_match:
-					if type in (2, 7, 12, 17, 22, 27, 32):
-						# When full recording do not look further
-						returnValue = (time_match, [type])
-						break
-					elif returnValue:
-						if type not in returnValue[1]:
-							returnValue[1].append(type)
+			else:
+				if begin < timer_begin <= end:
+					if timer_end < end:
+						# recording within event
+						time_match = timer_end - timer_begin
+						type = type_offset + 3
+					else:
+						# recording last part of event
+						time_match = end - timer_begin
+						type = type_offset + 1
+				elif timer_begin <= begin <= timer_end:
+					if timer_end < end:
+						# recording first part of event
+						time_match = timer_end - begin
+						type = type_offset + 4
 					else:
-						returnValue = (time_match, [type])
+						# recording whole event
+						time_match = end - begin
+						type = type_offset + 2
+			if time_match:
+				if type in (2, 7, 12, 17, 22, 27, 32):
+					# When full recording do not look further
+					returnValue = (time_match, [type])
+					break
+				elif returnValue:
+					if type not in returnValue[1]:
+						returnValue[1].append(type)
+				else:
+					returnValue = (time_match, [type])
 
 		return returnValue
 
@@ -1436,15 +1633,32 @@ class RecordTimer(timer.Timer):
 		if entry in self.processed_timers:
 			# now the timer should be in the processed_timers list. remove it from there.
 			self.processed_timers.remove(entry)
+		self.invalidateTimerIndex()
 		self.saveTimer()
 
+	def addTimerEntry(self, entry, noRecalc=0):
+		timer.Timer.addTimerEntry(self, entry, noRecalc)
+		self.invalidateTimerIndex()
+
+	def timeChanged(self, entry):
+		timer.Timer.timeChanged(self, entry)
+		self.invalidateTimerIndex()
+
+	def stateChanged(self, entry):
+		self.invalidateTimerIndex()
+		timer.Timer.stateChanged(self, entry)
+
 	def shutdown(self):
 		self.saveTimer()
+		if self.journal_base is None or os.path.exists(self.Filename + ".journal"):
+			self.compactTimers()
 
 	def cleanup(self):
 		timer.Timer.cleanup(self)
+		self.invalidateTimerIndex()
 		self.saveTimer()
 
 	def cleanupDaily(self, days):
 		timer.Timer.cleanupDaily(self, days)
+		self.invalidateTimerIndex()
 		self.saveTimer()
@@ -5,6 +5,7 @@ import Screens.InfoBar
 from Screens.ScreenSaver import InfoBarScreenSaver
 import Components.ParentalControl
 from Components.Button import Button
+from Components.ChannelNumbers import channelNumbers
 from Components.Label import Label
 from Components.Sources.Boolean import Boolean
 from Components.Pixmap import Pixmap
@@ -390,12 +391,14 @@ class ChannelContextMenu(Screen):
 	def addDedicated3DFlag(self):
 		eDVBDB.getInstance().addFlag(eServiceReference(self.csel.getCurrentSelection().toString()), FLAG_IS_DEDICATED_3D)
 		eDVBDB.getInstance().reloadBouquets()
+		channelNumbers.invalidate()
 		self.set3DMode(True)
 		self.close()
 
 	def removeDedicated3DFlag(self):
 		eDVBDB.getInstance().removeFlag(eServiceReference(self.csel.getCurrentSelection().toString()), FLAG_IS_DEDICATED_3D)
 		eDVBDB.getInstance().reloadBouquets()
+		channelNumbers.invalidate()
 		self.set3DMode(False)
 		self.close()
 
@@ -415,12 +418,14 @@ class ChannelContextMenu(Screen):
 	def addCenterDVBSubsFlag(self):
 		eDVBDB.getInstance().addFlag(eServiceReference(self.csel.getCurrentSelection().toString()), FLAG_CENTER_DVB_SUBS)
 		eDVBDB.getInstance().reloadBouquets()
+		channelNumbers.invalidate()
 		config.subtitles.dvb_subtitles_centered.value = True
 		self.close()
 
 	def removeCenterDVBSubsFlag(self):
 		eDVBDB.getInstance().removeFlag(eServiceReference(self.csel.getCurrentSelection().toString()), FLAG_CENTER_DVB_SUBS)
 		eDVBDB.getInstance().reloadBouquets()
+		channelNumbers.invalidate()
 		config.subtitles.dvb_subtitles_centered.value = False
 		self.close()
 
@@ -438,11 +443,13 @@ class ChannelContextMenu(Screen):
 	def addNoAITranslationFlag(self):
 		eDVBDB.getInstance().addFlag(eServiceReference(self.csel.getCurrentSelection().toString()), FLAG_NO_AI_TRANSLATION)
 		eDVBDB.getInstance().reloadBouquets()
+		channelNumbers.invalidate()
 		self.close()
 
 	def removeNoAITranslationFlag(self):
 		eDVBDB.getInstance().removeFlag(eServiceReference(self.csel.getCurrentSelection().toString()), FLAG_NO_AI_TRANSLATION)
 		eDVBDB.getInstance().reloadBouquets()
+		channelNumbers.invalidate()
 		self.close()
 
 	def addServiceToBouquetOrAlternative(self):
@@ -499,6 +506,7 @@ class ChannelContextMenu(Screen):
 				self.csel.toggleMoveMode()
 			self.csel.removeBouquet()
 			eDVBDB.getInstance().reloadBouquets()
+			channelNumbers.invalidate()
 			self.close()
 
 	def purgeDeletedBouquets(self):
@@ -522,6 +530,7 @@ class ChannelContextMenu(Screen):
 		eDVBDBInstance = eDVBDB.getInstance()
 		eDVBDBInstance.setLoadUnlinkedUserbouquets(1)
 		eDVBDBInstance.reloadBouquets()
+		channelNumbers.invalidate()
 		eDVBDBInstance.setLoadUnlinkedUserbouquets(int(config.misc.load_unlinked_userbouquets.value))
 		refreshServiceList()
 		self.csel.showFavourites()
@@ -550,6 +559,7 @@ class ChannelContextMenu(Screen):
 	def reloadServicesBouquets(self):
 		eDVBDB.getInstance().reloadServicelist()
 		eDVBDB.getInstance().reloadBouquets()
+		channelNumbers.invalidate()
 		self.session.openWithCallback(self.close, MessageBox, _("The services/bouquets list is reloaded!"), MessageBox.TYPE_INFO, timeout=5)
 
 	def showServiceInformations(self):
@@ -1111,6 +1121,7 @@ class ChannelSelectionEdit:
 				mutableList.addService(current)
 				mutableList.moveService(current, index)
 				mutableList.flushChanges()
+				channelNumbers.invalidate()
 				self.servicelist.addService(current, True)
 				self.servicelist.removeCurrent()
 				if not self.servicelist.atEnd():
@@ -1125,6 +1136,7 @@ class ChannelSelectionEdit:
 			if not mutableList.addService(ref, current):
 				self.servicelist.addService(ref, True)
 				mutableList.flushChanges()
+				channelNumbers.invalidate()
 
 	def insertService(self, serviceref):
 		current = self.servicelist.getCurrent()
@@ -1132,6 +1144,7 @@ class ChannelSelectionEdit:
 		if mutableList:
 			if not mutableList.addService(serviceref, current):
 				mutableList.flushChanges()
+				channelNumbers.invalidate()
 				self.servicelist.addService(serviceref, True)
 				self.servicelist.resetRoot()
 
@@ -1146,10 +1159,12 @@ class ChannelSelectionEdit:
 				if not mutableList.addService(ref, current):
 					self.servicelist.addService(ref, True)
 					mutableList.flushChanges()
+					channelNumbers.invalidate()
 					break
 			elif not mutableList.addService(ref):
 				self.servicelist.addService(ref, True)
 				mutableList.flushChanges()
+				channelNumbers.invalidate()
 				break
 			cnt += 1
 
@@ -1183,12 +1198,14 @@ class ChannelSelectionEdit:
 				mutableBouquet.removeService(cur_service.ref)
 				mutableBouquet.flushChanges()
 				eDVBDB.getInstance().reloadBouquets()
+				channelNumbers.invalidate()
 				mutableAlternatives = new_ref.list().startEdit()
 				if mutableAlternatives:
 					mutableAlternatives.setListName(name)
 					if mutableAlternatives.addService(cur_service.ref):
 						print("[ChannelSelection] add", cur_service.ref.toString(), "to new alternatives failed")
 					mutableAlternatives.flushChanges()
+					channelNumbers.invalidate()
 					self.servicelist.addService(new_ref.ref, True)
 					self.servicelist.removeCurrent()
 					if not end:
@@ -1219,6 +1236,7 @@ class ChannelSelectionEdit:
 			if not mutableBouquetList.addService(new_bouquet_ref):
 				mutableBouquetList.flushChanges()
 				eDVBDB.getInstance().reloadBouquets()
+				channelNumbers.invalidate()
 				mutableBouquet = serviceHandler.list(new_bouquet_ref).startEdit()
 				if mutableBouquet:
 					mutableBouquet.setListName(bName)
@@ -1227,6 +1245,7 @@ class ChannelSelectionEdit:
 							if mutableBouquet.addService(service):
 								print("add", service.toString(), "to new bouquet failed")
 					mutableBouquet.flushChanges()
+					channelNumbers.invalidate()
 				else:
 					print("[ChannelSelection] get mutable list for new created bouquet failed")
 				# do some voodoo to check if current_root is equal to bouquet_root
@@ -1329,6 +1348,7 @@ class ChannelSelectionEdit:
 					if idx != -1:
 						satpos = int(tmp[:idx])
 						eDVBDB.getInstance().removeServices(-1, -1, -1, satpos)
+			channelNumbers.invalidate()
 			refreshServiceList()
 			if hasattr(self, 'showSatellites'):
 				self.showSatellites()
@@ -1377,6 +1397,7 @@ class ChannelSelectionEdit:
 				if self.bouquet_mark_edit == EDIT_ALTERNATIVES and not new_marked and self.__marked:
 					self.mutableList.addService(eServiceReference(self.__marked[0]))
 				self.mutableList.flushChanges()
+				channelNumbers.invalidate()
 		self.__marked = []
 		self.clearMarks()
 		self.bouquet_mark_edit = OFF
@@ -1428,6 +1449,7 @@ class ChannelSelectionEdit:
 		if ref.valid() and mutableList is not None:
 			if not mutableList.removeService(ref):
 				mutableList.flushChanges()  # FIXME do not flush on each single removed service
+				channelNumbers.invalidate()
 				self.servicelist.removeCurrent()
 				self.servicelist.resetRoot()
 				playingref = self.session.nav.getCurrentlyPlayingServiceOrGroup()
@@ -1441,6 +1463,7 @@ class ChannelSelectionEdit:
 				service = self.servicelist.getCurrent()
 			if not mutableList.addService(service):
 				mutableList.flushChanges()
+				channelNumbers.invalidate()
 				# do some voodoo to check if current_root is equal to dest
 				cur_root = self.getRoot()
 				str1 = cur_root and cur_root.toString() or -1
@@ -1458,6 +1481,7 @@ class ChannelSelectionEdit:
 				self.toggleMoveMarked()  # unmark current entry
 			self.movemode = False
 			self.mutableList.flushChanges()  # FIXME add check if changes was made
+			channelNumbers.invalidate()
 			self.mutableList = None
 			self.functiontitle = ""
 			self.compileTitle()
@@ -1633,20 +1657,9 @@ class ChannelSelectionBase(Screen):
 	def getBouquetNumOffset(self, bouquet):
 		if not config.usage.multibouquet.value:
 			return 0
-		str = bouquet.toString()
 		offset = 0
 		if 'userbouquet.' in bouquet.toCompareString():
-			serviceHandler = eServiceCenter.getInstance()
-			servicelist = serviceHandler.list(bouquet)
-			if not servicelist is None:
-				while True:
-					serviceIterator = servicelist.getNext()
-					if not serviceIterator.valid():  # check if end of list
-						break
-					number = serviceIterator.getChannelNum()
-					if number > 0:
-						offset = number - 1
-						break
+			offset = channelNumbers.getBouquetOffset(bouquet)
 		return offset
 
 	def recallBouquetMode(self):
@@ -2,11 +2,13 @@
 from Screens.ChannelSelection import ChannelSelection, BouquetSelector, SilentBouquetSelector
 
 from Components.ActionMap import ActionMap, HelpableActionMap, HelpableNumberActionMap, NumberActionMap
-from Components.Harddisk import harddiskmanager, findMountPoint
+from Components.ChannelNumbers import channelNumbers
+from Components.Harddisk import harddiskmanager
 from Components.Input import Input
 from Components.Label import Label
-from Components.MovieList import AUDIO_EXTENSIONS, MOVIE_EXTENSIONS, DVD_EXTENSIONS
+from Components.MovieList import AUDIO_EXTENSIONS, MOVIE_EXTENSIONS, DVD_EXTENSIONS, clearMoviePlayState
 from Components.PluginComponent import plugins
+from Components.ResumePoints import resumePoints
 from Components.ServiceEventTracker import ServiceEventTracker
 from Components.Sources.ServiceEvent import ServiceEvent
 from Components.Sources.Boolean import Boolean
@@ -67,7 +69,6 @@ def isStandardInfoBar(self):
 
 
 def setResumePoint(session):
-	global resumePointCache, resumePointCacheLast
 	service = session.nav.getCurrentService()
 	ref = session.nav.getCurrentlyPlayingServiceOrGroup()
 	if (service is not None) and (ref is not None):  # and (ref.type != 1):
@@ -76,78 +77,40 @@ def setResumePoint(session):
 		if seek:
 			pos = seek.getPlayPosition()
 			if not pos[0]:
-				key = ref.toString()
-				lru = int(time())
 				sl = seek.getLength()
 				if sl:
 					sl = sl[1]
 				else:
 					sl = None
-				resumePointCache[key] = [lru, pos[1], sl]
-				for k, v in list(resumePointCache.items()):
-					if v[0] < lru:
-						candidate = k
-						filepath = os.path.realpath(candidate.split(':')[-1])
-						mountpoint = findMountPoint(filepath)
-						if os.path.ismount(mountpoint) and not os.path.exists(filepath):
-							del resumePointCache[candidate]
-				if lru - resumePointCacheLast > 3600:
-					saveResumePoints()
+				resumePointCache.set(ref.toString(), pos[1], sl)
+				clearMoviePlayState(ref.getPath() + ".cuts")  # The player writes the stop position to the cuts file.
 
 
 def delResumePoint(ref):
-	global resumePointCache, resumePointCacheLast
-	try:
-		del resumePointCache[ref.toString()]
-	except KeyError:
-		pass
-	if int(time()) - resumePointCacheLast > 3600:
-		saveResumePoints()
+	resumePointCache.delete(ref.toString())
 
 
 def getResumePoint(session):
-	global resumePointCache
 	ref = session.nav.getCurrentlyPlayingServiceOrGroup()
 	if (ref is not None) and (ref.type != 1):
-		try:
-			entry = resumePointCache[ref.toString()]
-			entry[0] = int(time())  # update LRU timestamp
-			return entry[1]
-		except KeyError:
-			return None
+		entry = resumePointCache.touch(ref.toString())
+		return entry and entry[1]
 
 
 def saveResumePoints():
-	global resumePointCache, resumePointCacheLast
-	import pickle
-	try:
-		f = open('/etc/enigma2/resumepoints.pkl', 'wb')
-		pickle.dump(resumePointCache, f, pickle.HIGHEST_PROTOCOL)
-		f.close()
-	except Exception as ex:
-		print("[saveResumePoints] Failed to write resumepoints:", ex)
-	resumePointCacheLast = int(time())
+	resumePointCache.save()
 
 
 def loadResumePoints():
-	import pickle
-	try:
-		f = open('/etc/enigma2/resumepoints.pkl', 'rb')
-		pickleFile = pickle.load(f)
-		f.close()
-		return pickleFile
-	except Exception as ex:
-		print("[loadResumePoints] Failed to load resumepoints:", ex)
-		return {}
+	resumePointCache.load()
+	return resumePointCache
 
 
 def updateResumePointCache():
-	global resumePointCache
-	resumePointCache = loadResumePoints()
+	resumePointCache.load()
 
 
-resumePointCache = loadResumePoints()
-resumePointCacheLast = int(time())
+resumePointCache = resumePoints
 
 
 class whitelist:
@@ -861,38 +824,20 @@ class InfoBarNumberZap:
 		if service:
 			self.selectAndStartService(service, bouquet)
 
-	def searchNumberHelper(self, serviceHandler, num, bouquet):
-		servicelist = serviceHandler.list(bouquet)
-		if servicelist:
-			serviceIterator = servicelist.getNext()
-			while serviceIterator.valid():
-				if num == serviceIterator.getChannelNum():
-					return serviceIterator
-				serviceIterator = servicelist.getNext()
-		return None
+	def searchNumberHelper(self, serviceHandler, num, bouquet):  # The serviceHandler argument is no longer used, the lookup is served by the channel number index.
+		return channelNumbers.getService(bouquet, num)
 
 	def searchNumber(self, number, firstBouquetOnly=False, bouquet=None):
 		bouquet = bouquet or self.servicelist.getRoot()
 		service = None
-		serviceHandler = eServiceCenter.getInstance()
 		if not firstBouquetOnly:
-			service = self.searchNumberHelper(serviceHandler, number, bouquet)
+			service = self.searchNumberHelper(eServiceCenter.getInstance(), number, bouquet)
 		if config.usage.multibouquet.value and not service:
-			bouquet = self.servicelist.bouquet_root
-			bouquetlist = serviceHandler.list(bouquet)
-			if bouquetlist:
-				bouquet = bouquetlist.getNext()
-				while bouquet.valid():
-					if bouquet.flags & eServiceReference.isDirectory and not bouquet.flags & eServiceReference.isInvisible:
-						service = self.searchNumberHelper(serviceHandler, number, bouquet)
-						if service:
-							playable = not (service.flags & (eServiceReference.isMarker | eServiceReference.isDirectory)) or (service.flags & eServiceReference.isNumberedMarker)
-							if not playable:
-								service = None
-							break
-						if config.usage.alternative_number_mode.value or firstBouquetOnly:
-							break
-					bouquet = bouquetlist.getNext()
+			service, bouquet = channelNumbers.searchRoot(self.servicelist.bouquet_root, number, config.usage.alternative_number_mode.value or firstBouquetOnly)
+			if service:
+				playable = not (service.flags & (eServiceReference.isMarker | eServiceReference.isDirectory)) or (service.flags & eServiceReference.isNumberedMarker)
+				if not playable:
+					service = None
 		return service, bouquet
 
 	def selectAndStartService(self, service, bouquet):
@@ -1313,17 +1258,7 @@ class InfoBarEPG:
 			self.servicelist.startRoot = None
 
 	def getBouquetServices(self, bouquet):
-		services = []
-		servicelist = eServiceCenter.getInstance().list(bouquet)
-		if servicelist:
-			while True:
-				service = servicelist.getNext()
-				if not service.valid():  # check if end of list
-					break
-				if service.flags & (eServiceReference.isDirectory | eServiceReference.isMarker):  # ignore non playable services
-					continue
-				services.append(ServiceReference(service))
-		return services
+		return [ServiceReference(service) for service in channelNumbers.getServices(bouquet)]
 
 	def openBouquetEPG(self, bouquet, withCallback=True):
 		services = self.getBouquetServices(bouquet)
@@ -2792,10 +2727,10 @@ class InfoBarInstantRecord:
 
 	def moveToTrash(self, entry):
 		print("[instantRecord] stop and delete recording: %s", entry.name)
-		from Tools.Trashcan import createTrashFolder
+		from Tools.Trashcan import createTrashFolder, markTrashed
 		trash = createTrashFolder(entry.Filename)
 		from Screens.MovieSelection import moveServiceFiles
-		moveServiceFiles(entry.Filename, trash, entry.name, allowCopy=False)
+		markTrashed(trash, moveServiceFiles(entry.Filename, trash, entry.name, allowCopy=False))
 
 	def stopCurrentRecording(self, entry=-1):
 		def confirm(answer=False):
@@ -3549,6 +3484,7 @@ class InfoBarNotifications:
 				if "channels" in config.usage.remote_fallback_import.value:
 					eDVBDB.getInstance().reloadBouquets()
 					eDVBDB.getInstance().reloadServicelist()
+					channelNumbers.invalidate()
 					from Components.ParentalControl import parentalControl
 					parentalControl.open()
 					refreshServiceList()
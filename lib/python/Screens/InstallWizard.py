@@ -2,6 +2,7 @@
 from Screens.Screen import Screen
 from Components.ConfigList import ConfigListScreen, ConfigList
 from Components.ActionMap import ActionMap
+from Components.ChannelNumbers import channelNumbers
 from Components.Sources.StaticText import StaticText
 from Components.config import config, ConfigSubsection, ConfigBoolean, ConfigSelection, ConfigYesNo, ConfigIP, ConfigNothing
 from Components.Network import iNetwork
@@ -186,4 +187,5 @@ class InstallWizardOpkgUpdater(Screen):
 					config.misc.installwizard.channellistdownloaded.value = True
 					eDVBDB.getInstance().reloadBouquets()
 					eDVBDB.getInstance().reloadServicelist()
+					channelNumbers.invalidate()
 			self.close()
@@ -13,7 +13,7 @@ from Components.Button import Button
 from Plugins.Plugin import PluginDescriptor
 from Screens.ParentalControlSetup import ProtectedScreen
 from Screens.Screen import Screen
-from Screens.Setup import Setup
+from Screens.Setup import Setup, compileExpression
 from Screens.MessageBox import MessageBox
 from Tools.BoundFunction import boundFunction
 from Tools.Directories import resolveFilename, SCOPE_CURRENT_SKIN, SCOPE_GUISKIN, SCOPE_SKINS
@@ -164,7 +164,7 @@ class Menu(Screen, ProtectedScreen):
 			elif not SystemInfo.get(requires, False):
 				return
 		conditional = node.get("conditional")
-		if conditional and not eval(conditional):
+		if conditional and not eval(compileExpression(conditional)[0]):
 			return
 		menu_text = _(x) if (x := node.get("text")) else "* fix me *"
 		weight = node.get("weight", 50)
@@ -201,7 +201,7 @@ class Menu(Screen, ProtectedScreen):
 			elif not SystemInfo.get(requires, False):
 				return
 		conditional = node.get("conditional")
-		if conditional and not eval(conditional):
+		if conditional and not eval(compileExpression(conditional)[0]):
 			return
 		item_text = _(x) if (x := node.get("text")) else "* fix me *"
 		weight = node.get("weight", 50)
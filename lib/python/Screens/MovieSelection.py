@@ -182,6 +182,7 @@ def createMoveList(serviceref, dest):
 
 
 def moveServiceFiles(serviceref, dest, name=None, allowCopy=True):
+	# Returns the list of files that have been renamed into dest.
 	moveList = createMoveList(serviceref, dest)
 	# Try to "atomically" move these files
 	movedList = []
@@ -211,6 +212,7 @@ def moveServiceFiles(serviceref, dest, name=None, allowCopy=True):
 				print("[MovieSelection] Failed to undo move:", item)
 		# rethrow exception
 		raise
+	return [item[1] for item in movedList]
 
 
 def copyServiceFiles(serviceref, dest, name=None):
@@ -1910,6 +1912,7 @@ class MovieSelection(Screen, SelectionEventInfo, InfoBarBase, ProtectedScreen):
 								print("rmdir", os.path.join(trashroot, dn))
 								os.rmdir(os.path.join(root, dn))
 						os.rmdir(cur_path)
+						Tools.Trashcan.markTrashed(os.path.dirname(trash), [trash])
 						self["list"].removeService(current)
 						self.showActionFeedback(_("Deleted") + " " + name)
 						# Files were moved to .Trash, ok.
@@ -1980,7 +1983,7 @@ class MovieSelection(Screen, SelectionEventInfo, InfoBarBase, ProtectedScreen):
 					if cur_path.startswith(trash):
 						msg = _("Deleted items") + "\n"
 					else:
-						moveServiceFiles(current, trash, name, allowCopy=False)
+						Tools.Trashcan.markTrashed(trash, moveServiceFiles(current, trash, name, allowCopy=False))
 						self["list"].removeService(current)
 						# Files were moved to .Trash, ok.
 						from Screens.InfoBarGenerics import delResumePoint
@@ -7,6 +7,7 @@ from enigma import checkInternetAccess, eDVBDB, eTimer, gRGB
 
 from skin import parseColor
 from Components.ActionMap import HelpableActionMap, HelpableNumberActionMap
+from Components.ChannelNumbers import channelNumbers
 from Components.config import ConfigDictionarySet, ConfigSelection, ConfigSubsection, ConfigText, ConfigYesNo, config
 from Components.GUIComponent import GUIComponent
 from Components.Harddisk import harddiskmanager
@@ -1007,6 +1008,7 @@ class PackageAction(Screen, NumericalTextInput):
 				self["description"].setText(_("Reloading bouquets and services."))
 				eDVBDB.getInstance().reloadServicelist()
 				eDVBDB.getInstance().reloadBouquets()
+				channelNumbers.invalidate()
 			pluginComponent.readPluginList(resolveFilename(SCOPE_PLUGINS))
 		self.close()
 
@@ -5,6 +5,7 @@ from Components.SystemInfo import BoxInfo
 from Components.ActionMap import ActionMap
 from Components.NimManager import nimmanager
 from Components.Button import Button
+from Components.ChannelNumbers import channelNumbers
 from Components.International import international
 from Components.Label import Label
 from Components.UsageConfig import showrotorpositionChoicesUpdate, preferredTunerChoicesUpdate
@@ -578,6 +579,7 @@ class NimSetup(Setup, ServiceStopScreen):
 
 		if confirmed[1] == "yes" or confirmed[1] == "yestoall":
 			eDVBDB.getInstance().removeServices(-1, -1, -1, self.satpos_to_remove)
+			channelNumbers.invalidate()
 
 		if self.satpos_to_remove is not None:
 			self.unconfed_sats.remove(self.satpos_to_remove)
@@ -1,6 +1,7 @@
 from enigma import eComponentScan, eServiceReference, eTimer, iDVBFrontend
 
 from Components.ActionMap import HelpableActionMap
+from Components.ChannelNumbers import channelNumbers
 from Components.config import config
 from Components.Label import Label
 from Components.MenuList import MenuList
@@ -358,6 +359,7 @@ class ServiceScan(Screen):
 		self.finish(True)
 
 	def finish(self, returnValue):
+		channelNumbers.invalidate()  # The scan may have added services and changed the bouquets.
 		# try:
 		# 	self.session.nav.playService(self.currentServiceRef)
 		# except Exception:
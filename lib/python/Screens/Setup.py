@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from ast import Attribute, Name, iter_child_nodes, parse
 from xml.etree.ElementTree import fromstring
 
 from gettext import dgettext
@@ -18,6 +19,53 @@ MODULE_NAME = __name__.split(".")[-1]
 
 domSetups = {}
 setupModTimes = {}
+compiledExpressions = {}  # Dictionary of expression: (code object, tuple of config element path code objects or None).
+CONFIG_FUNCTIONS = ("bool", "int", "len", "str")  # Names that an expression may use and still only depend on config elements.
+
+
+# Compile the requires, conditional and item expressions of the setup and menu
+# XML files only once.  When an expression only depends on the values of config
+# elements the paths of these elements are compiled as well so that its result
+# can be kept until one of them changes.
+#
+def compileExpression(expression):
+	compiled = compiledExpressions.get(expression)
+	if compiled is None:
+		source = expression.strip()
+		code = compile(source, "<expression>", "eval")
+		paths = []
+		expressionPaths(parse(source, mode="eval").body, paths)
+		dependencies = []
+		for path in paths:
+			if path in CONFIG_FUNCTIONS:
+				continue
+			if path.endswith(".value"):
+				path = path[:-6]
+			elif path != source:  # Only a plain "config.x.y" expression may refer to the element itself.
+				dependencies = None
+				break
+			if not path.startswith("config."):
+				dependencies = None
+				break
+			dependencies.append(compile(path, "<expression>", "eval"))
+		compiled = compiledExpressions[expression] = (code, None if dependencies is None else tuple(dependencies))
+	return compiled
+
+
+def expressionPaths(node, paths):  # Collect the longest dotted name paths like "config.usage.setup_level.value" in the expression.
+	path = []
+	root = node
+	while isinstance(root, Attribute):
+		path.append(root.attr)
+		root = root.value
+	if isinstance(root, Name):
+		path.append(root.id)
+		paths.append(".".join(reversed(path)))
+	elif path:
+		expressionPaths(root, paths)
+	else:
+		for child in iter_child_nodes(node):
+			expressionPaths(child, paths)
 
 
 class Setup(ConfigListScreen, Screen):
@@ -34,6 +82,9 @@ class Setup(ConfigListScreen, Screen):
 			self.setImage(setup, "setup")
 		self.skinName.append("Setup")
 		self.list = []
+		self.expressionCache = {}  # Dictionary of expression: result of the expressions that only depend on config elements.
+		self.expressionWatches = {}  # Dictionary of id(config element): (config element, [expressions depending on it]).
+		self.dynamicExpressions = False  # The last list build used expressions that don't only depend on config elements.
 		xmlData = setupDom(self.setup, self.plugin)
 		allowDefault = False
 		for setup in xmlData.findall("setup"):
@@ -49,16 +100,28 @@ class Setup(ConfigListScreen, Screen):
 			self.onLayoutFinish.append(self.layoutFinished)
 		if self.selectionChanged not in self["config"].onSelectionChanged:
 			self["config"].onSelectionChanged.append(self.selectionChanged)
+		self.onClose.append(self.removeExpressionWatches)
 
 	def changedEntry(self):
-		if isinstance(self["config"].getCurrent()[1], (ConfigBoolean, ConfigSelection)):
+		current = self["config"].getCurrent()[1]
+		if isinstance(current, (ConfigBoolean, ConfigSelection)) and self.changeAffectsSetup(current):
 			self.createSetup()
 
+	# Only rebuild the list when the changed element can change it, this is
+	# when an expression of the last build depends on it or when the list
+	# depends on more than the config elements, like a createSetup() override.
+	#
+	def changeAffectsSetup(self, configElement):
+		if self.dynamicExpressions or type(self).createSetup is not Setup.createSetup:
+			return True
+		return id(configElement) in self.expressionWatches or configElement is config.usage.setupShowDefault or configElement is config.usage.boolean_graphic
+
 	def createSetup(self, appendItems=None, prependItems=None):
 		if self.setup:
 			oldList = self.list
 			self.showDefaultChanged = False
 			self.graphicSwitchChanged = False
+			self.dynamicExpressions = False
 			self.list = prependItems or []
 			title = None
 			xmlData = setupDom(self.setup, self.plugin)
@@ -112,7 +175,10 @@ class Setup(ConfigListScreen, Screen):
 		else:
 			itemText = _(x) if (x := element.get("text")) else "* fix me *"
 			itemDescription = _(x) if (x := element.get("description")) else ""
-		item = eval(element.text or "")
+		code, dependencies = compileExpression(element.text or "")
+		if dependencies is None:
+			self.dynamicExpressions = True
+		item = eval(code)
 		if item == "":
 			self.list.append((self.formatItemText(itemText),))  # Add the comment line to the config list.
 		elif not isinstance(item, ConfigNothing):
@@ -145,7 +211,7 @@ class Setup(ConfigListScreen, Screen):
 					require = require[1:]
 				if require.startswith("config."):
 					try:
-						result = eval(require)
+						result = self.evaluateExpression(require)
 						result = bool(result.value and str(result.value).lower() not in ("0", "Disable", "disable", "False", "false", "No", "no", "Off", "off"))
 					except Exception:
 						return self.logIncludeElementError(element, "requires", require)
@@ -156,12 +222,47 @@ class Setup(ConfigListScreen, Screen):
 		conditional = element.get("conditional")
 		if conditional:
 			try:
-				if not bool(eval(conditional)):
+				if not bool(self.evaluateExpression(conditional)):
 					return False
 			except Exception:
 				return self.logIncludeElementError(element, "conditional", conditional)
 		return True
 
+	def evaluateExpression(self, expression):
+		if expression in self.expressionCache:
+			return self.expressionCache[expression]
+		code, dependencies = compileExpression(expression)
+		result = eval(code)
+		if dependencies is None:
+			self.dynamicExpressions = True
+		else:
+			elements = [eval(dependency) for dependency in dependencies]
+			if not all(hasattr(element, "addNotifier") for element in elements):
+				self.dynamicExpressions = True
+			else:
+				for element in elements:
+					watch = self.expressionWatches.get(id(element))
+					if watch is None:
+						watch = self.expressionWatches[id(element)] = (element, [])
+						element.addNotifier(self.expressionDependencyChanged, initial_call=False)
+					if expression not in watch[1]:
+						watch[1].append(expression)
+				self.expressionCache[expression] = result
+		return result
+
+	def expressionDependencyChanged(self, configElement):
+		watch = self.expressionWatches.get(id(configElement))
+		if watch:
+			for expression in watch[1]:
+				self.expressionCache.pop(expression, None)
+			del watch[1][:]
+
+	def removeExpressionWatches(self):
+		for element, expressions in self.expressionWatches.values():
+			element.removeNotifier(self.expressionDependencyChanged)
+		self.expressionWatches = {}
+		self.expressionCache = {}
+
 	def logIncludeElementError(self, element, type, token):
 		item = "title" if element.tag == "screen" else "text"
 		text = element.get(item)
@@ -322,6 +423,7 @@ def setupDom(setup=None, plugin=None):
 		del domSetups[setupFile]
 	if setupFile in setupModTimes:
 		del setupModTimes[setupFile]
+	compiledExpressions.clear()
 	fileDom = fileReadXML(setupFile, source=MODULE_NAME)
 	if fileDom is not None:
 		checkItems(fileDom, None)
@@ -559,7 +559,7 @@ class TimerLog(Screen):
 	def __init__(self, session, timer):
 		Screen.__init__(self, session)
 		self.timer = timer
-		self.log_entries = self.timer.log_entries[:]
+		self.log_entries = list(self.timer.log_entries)
 
 		self.fillLogList()
 
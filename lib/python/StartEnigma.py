@@ -9,6 +9,7 @@ import eConsoleImpl
 enigma.eTimer = eBaseImpl.eTimer
 enigma.eSocketNotifier = eBaseImpl.eSocketNotifier
 enigma.eConsoleAppContainer = eConsoleImpl.eConsoleAppContainer
+from Tools.Profile import profile, profileBegin, profileEnd, profileFinal  # Trace the startup, including the imports, from here on.
 
 MODULE_NAME = "StartEnigma"  # This is done here as "__name__.split(".")[-1]" returns "__main__" for this module.
 
@@ -271,7 +272,7 @@ class PowerKey:
 
 
 if enigma.eAVControl.getInstance().hasScartSwitch():
-	enigma.eProfileWrite("Scart")
+	profile("Scart")
 	print("[StartEnigma] Initialising Scart module")
 	from Screens.Scart import Scart
 
@@ -302,19 +303,20 @@ class AutoScartControl:
 				else:
 					self.scartDialog.switchToTV()
 def runScreenTest():
+	profileBegin("runScreenTest")
 	config.misc.startCounter.value += 1
 	config.misc.startCounter.save()
-	enigma.eProfileWrite("ReadPluginList")
+	profile("ReadPluginList")
 	enigma.pauseInit()
 	plugins.readPluginList(resolveFilename(SCOPE_PLUGINS))
 	enigma.resumeInit()
-	enigma.eProfileWrite("Session")
+	profile("Session")
 	nav = Navigation()
 	session = Session(desktop=enigma.getDesktop(0), summaryDesktop=enigma.getDesktop(1), navigation=nav)
 	CiHandler.setSession(session)
 	powerOffTimer.setSession(session)
 	screensToRun = [p.fnc for p in plugins.getPlugins(PluginDescriptor.WHERE_WIZARD)]
-	enigma.eProfileWrite("Wizards")
+	profile("Wizards")
 	screensToRun += wizardManager.getWizards()
 	screensToRun.append((100, InfoBar.InfoBar))
 	screensToRun.sort(key=lambda x: x[0])  # works in both Pythons but let's not use sort method here first we must see if we have work network in the wizard.
@@ -331,23 +333,28 @@ def runScreenTest():
 		else:
 			session.open(screen, *args)
 	runNextScreen(session, screensToRun)
-	enigma.eProfileWrite("VolumeControl")
+	profile("VolumeControl")
 	vol = VolumeControl(session)
-	enigma.eProfileWrite("Processing Screen")
+	profile("Processing Screen")
 	processing = Processing(session)
-	enigma.eProfileWrite("PowerKey")
+	profile("PowerKey")
 	power = PowerKey(session)
 	if enigma.getVFDSymbolsPoll():
-		enigma.eProfileWrite("VFDSymbolsCheck")
+		profile("VFDSymbolsCheck")
 		from Components.VfdSymbols import SymbolsCheck
 		SymbolsCheck(session)
 	# we need session.scart to access it from within menu.xml
 	session.scart = AutoScartControl(session) if enigma.eAVControl.getInstance().hasScartSwitch() else None
-	enigma.eProfileWrite("Trashcan")
+	profile("Trashcan")
 	import Tools.Trashcan
 	Tools.Trashcan.init(session)
-	enigma.eProfileWrite("RunReactor")
+	profile("RunReactor")
+	profileEnd()
 	enigma.eProfileDone()
+	profileTimer = enigma.eTimer()  # The startup profile ends after the first main loop cycle when the first screen is shown.
+	profileTimer.callback.append(profileFinal)
+	profileTimer.callback.append(startupGraph.firstFrame)
+	profileTimer.start(0, True)
 	runReactor()
 	from Screens.SleepTimerEdit import isNextWakeupTime
 	# get currentTime
@@ -422,7 +429,7 @@ def dump(dir, p=""):
 #                               #
 #################################
 
-enigma.eProfileWrite("Twisted")
+profile("Twisted")
 print("[StartEnigma] Initializing Twisted.")
 try:  # Configure the twisted processor.
 	from twisted.python.runtime import platform
@@ -484,10 +491,10 @@ def localeNotifier(configElement):
 
 # Initialize the country, language and locale data.
 #
-enigma.eProfileWrite("International")
+profile("International")
 from Components.International import international
 
-enigma.eProfileWrite("BoxInfo")
+profile("BoxInfo")
 from Components.SystemInfo import BoxInfo
 
 BRAND = BoxInfo.getItem("brand")
@@ -536,11 +543,11 @@ config.plugins = ConfigSubsection()
 config.plugins.remotecontroltype = ConfigSubsection()
 config.plugins.remotecontroltype.rctype = ConfigInteger(default=0)
 
-enigma.eProfileWrite("InitSetupDevices")
+profile("InitSetupDevices")
 import Components.SetupDevices
 Components.SetupDevices.InitSetupDevices()
 
-enigma.eProfileWrite("InfoBar")
+profile("InfoBar")
 from Screens import InfoBar
 
 def setEPGCachePath(configElement):
@@ -548,11 +555,11 @@ def setEPGCachePath(configElement):
 		configElement.value = join(configElement.value, "epg.dat")
 	enigma.eEPGCache.getInstance().setCacheFile(configElement.value)
 
-enigma.eProfileWrite("ScreenSummary")
+profile("ScreenSummary")
 # from Screens.SimpleSummary import SimpleSummary
 from Screens.Screen import ScreenSummary
 
-enigma.eProfileWrite("LoadBouquets")
+profile("LoadBouquets")
 config.misc.load_unlinked_userbouquets = ConfigSelection(default="1", choices=[("0", _("Off")), ("1", _("Top")), ("2", _("Bottom"))])
 if config.misc.load_unlinked_userbouquets.value.lower() in ("true", "false"):
 	config.misc.load_unlinked_userbouquets.value = "1" if config.misc.load_unlinked_userbouquets.value.lower() == "true" else "0"
@@ -563,21 +570,21 @@ def setLoadUnlinkedUserbouquets(configElement):
 config.misc.load_unlinked_userbouquets.addNotifier(setLoadUnlinkedUserbouquets)
 enigma.eDVBDB.getInstance().reloadBouquets()
 
-enigma.eProfileWrite("ParentalControl")
+profile("ParentalControl")
 import Components.ParentalControl
 Components.ParentalControl.InitParentalControl()
 
-enigma.eProfileWrite("Navigation")
+profile("Navigation")
 from Navigation import Navigation
 
-enigma.eProfileWrite("ReadSkin")
+profile("ReadSkin")
 from skin import readSkin
 
-enigma.eProfileWrite("InitFallbackFiles")
-from Tools.Directories import InitFallbackFiles, resolveFilename, SCOPE_PLUGINS, SCOPE_CURRENT_SKIN
+profile("InitFallbackFiles")
+from Tools.Directories import InitFallbackFiles, resolveFilename, SCOPE_CONFIG, SCOPE_PLUGINS, SCOPE_CURRENT_SKIN
 InitFallbackFiles()
 
-enigma.eProfileWrite("ConfigMisc")
+profile("ConfigMisc")
 config.misc.radiopic = ConfigText(default=resolveFilename(SCOPE_CURRENT_SKIN, "radio.mvi"))
 config.misc.blackradiopic = ConfigText(default=resolveFilename(SCOPE_CURRENT_SKIN, "black.mvi"))
 config.misc.startCounter = ConfigInteger(default=0)  # number of e2 starts...
@@ -595,124 +602,170 @@ config.misc.SyncTimeUsing = ConfigSelection(default="0", choices=[
 ])
 config.misc.NTPserver = ConfigText(default="pool.ntp.org", fixed_size=False)
 
-enigma.eProfileWrite("AutoRunPlugins")
+profile("AutoRunPlugins")
 # Initialize autorun plugins and plugin menu entries.
 from Components.PluginComponent import plugins
 
-enigma.eProfileWrite("StartWizard")
+profile("StartWizard")
 from Screens.Wizard import wizardManager
 from Screens.StartWizard import *
 from Tools.BoundFunction import boundFunction
 from Plugins.Plugin import PluginDescriptor
 
-enigma.eProfileWrite("ScreenGlobals")
+profile("ScreenGlobals")
 from Screens.Globals import Globals
 from Screens.SessionGlobals import SessionGlobals
 from Screens.Screen import Screen
 Screen.globalScreen = Globals()
 
-enigma.eProfileWrite("Standby")
+profile("Standby")
 import Screens.Standby
 from Screens.Menu import MainMenu, mdom
 
-enigma.eProfileWrite("GlobalActionMap")
+profile("GlobalActionMap")
 from GlobalActions import globalActionMap
 
-enigma.eProfileWrite("Scart")
+profile("Scart")
 from Screens.Scart import Scart
 
-enigma.eProfileWrite("CIHandler")
+profile("CIHandler")
 from Screens.Ci import CiHandler
 
-enigma.eProfileWrite("VolumeControl")
+profile("VolumeControl")
 from Components.VolumeControl import VolumeControl
 
-enigma.eProfileWrite("Processing")
+profile("Processing")
 from Screens.Processing import Processing
 
-enigma.eProfileWrite("StackTracePrinter")
+profile("StackTracePrinter")
 from Components.StackTrace import StackTracePrinter
 StackTracePrinterInst = StackTracePrinter()
 
 from time import localtime, strftime
 from Tools.StbHardware import setFPWakeuptime, setRTCtime
 
-enigma.eProfileWrite("InitSkins")
-from skin import InitSkins
-InitSkins()
-
-enigma.eProfileWrite("InitInputDevices")
-from Components.InputDevice import InitInputDevices
-InitInputDevices()
-import Components.InputHotplug
-
-enigma.eProfileWrite("InitAVSwitch")
-from Components.AVSwitch import InitAVSwitch
-InitAVSwitch()
-
-enigma.eProfileWrite("InitHDMIRecord")
-from Components.HdmiRecord import InitHdmiRecord
-InitHdmiRecord()
-
-enigma.eProfileWrite("InitRecordingConfig")
-from Components.RecordingConfig import InitRecordingConfig
-InitRecordingConfig()
-
-enigma.eProfileWrite("InitUsageConfig")
-from Components.UsageConfig import InitUsageConfig, DEFAULTKEYMAP
-InitUsageConfig()
-
-enigma.eProfileWrite("InitTimeZones")
-from Components.Timezones import InitTimeZones
-InitTimeZones()
-
-enigma.eProfileWrite("AutoLogManager")
-from Screens.LogManager import AutoLogManager
-AutoLogManager()
-
-enigma.eProfileWrite("NTPSyncPoller")
-from Components.NetworkTime import ntpSyncPoller
-ntpSyncPoller.startTimer()
-
-enigma.eProfileWrite("KeymapParser")
-from Components.ActionMap import loadKeymap
-loadKeymap(DEFAULTKEYMAP)
-if config.usage.keymap.value != DEFAULTKEYMAP:
-	if exists(config.usage.keymap.value):
-		loadKeymap(config.usage.keymap.value, replace=True)
-if exists(config.usage.keymap_usermod.value):
-	loadKeymap(config.usage.keymap_usermod.value)
-
-enigma.eProfileWrite("InitNetwork")
-from Components.Network import InitNetwork
-InitNetwork()
-
-enigma.eProfileWrite("InitLCD")
-from Components.Lcd import IconCheck, InitLcd
-InitLcd()
-IconCheck()
-
-enigma.eAVControl.getInstance().disableHDMIIn()
-
-enigma.eProfileWrite("PowerOffTimer")
-from Components.PowerOffTimer import powerOffTimer
-
-enigma.eProfileWrite("InitOSDCalibration")
-from Screens.OSDCalibration import InitOSDCalibration
-InitOSDCalibration()
-
-enigma.eProfileWrite("EPGCacheCheck")
-from Components.EpgLoadSave import EpgCacheLoadCheck, EpgCacheSaveCheck
-EpgCacheSaveCheck()
-EpgCacheLoadCheck()
-
-enigma.eProfileWrite("InitRFmod")
-from Components.RFmod import InitRFmod
-InitRFmod()
-
-enigma.eProfileWrite("InitCiConfig")
-from Screens.Ci import InitCiConfig
-InitCiConfig()
+profile("StartupGraph")
+from Tools.StartupGraph import StartupGraph
+from Components.ActionMap import KEYMAP_CACHE
+startupGraph = StartupGraph()
+
+
+def initSkins():
+	from skin import InitSkins
+	InitSkins()
+
+
+def initInputDevices():
+	from Components.InputDevice import InitInputDevices
+	InitInputDevices()
+	import Components.InputHotplug
+
+
+def initAVSwitch():
+	from Components.AVSwitch import InitAVSwitch
+	InitAVSwitch()
+
+
+def initHDMIRecord():
+	from Components.HdmiRecord import InitHdmiRecord
+	InitHdmiRecord()
+
+
+def initRecordingConfig():
+	from Components.RecordingConfig import InitRecordingConfig
+	InitRecordingConfig()
+
+
+def initUsageConfig():
+	from Components.UsageConfig import InitUsageConfig
+	InitUsageConfig()
+
+
+def initTimeZones():
+	from Components.Timezones import InitTimeZones
+	InitTimeZones()
+
+
+def startAutoLogManager():
+	from Screens.LogManager import AutoLogManager
+	AutoLogManager()
+
+
+def startNTPSyncPoller():
+	from Components.NetworkTime import ntpSyncPoller
+	ntpSyncPoller.startTimer()
+
+
+def keymapParser():
+	from Components.ActionMap import loadKeymap
+	from Components.UsageConfig import DEFAULTKEYMAP
+	loadKeymap(DEFAULTKEYMAP)
+	if config.usage.keymap.value != DEFAULTKEYMAP:
+		if exists(config.usage.keymap.value):
+			loadKeymap(config.usage.keymap.value, replace=True)
+	if exists(config.usage.keymap_usermod.value):
+		loadKeymap(config.usage.keymap_usermod.value)
+
+
+def initNetwork():
+	from Components.Network import InitNetwork
+	InitNetwork()
+
+
+def initLCD():
+	from Components.Lcd import IconCheck, InitLcd
+	InitLcd()
+	IconCheck()
+	enigma.eAVControl.getInstance().disableHDMIIn()
+
+
+def initPowerOffTimer():
+	global powerOffTimer
+	from Components.PowerOffTimer import powerOffTimer
+
+
+def initOSDCalibration():
+	from Screens.OSDCalibration import InitOSDCalibration
+	InitOSDCalibration()
+
+
+def startEPGCacheCheck():
+	from Components.EpgLoadSave import EpgCacheLoadCheck, EpgCacheSaveCheck
+	EpgCacheSaveCheck()
+	EpgCacheLoadCheck()
+
+
+def initRFmod():
+	from Components.RFmod import InitRFmod
+	InitRFmod()
+
+
+def initCiConfig():
+	from Screens.Ci import InitCiConfig
+	InitCiConfig()
+
+
+# The steps that are not needed for the first screen are deferred until it is
+# shown.  The files of the steps are read ahead by the startup graph threads.
+#
+startupGraph.add("InitSkins", initSkins)
+startupGraph.add("InitInputDevices", initInputDevices)
+startupGraph.add("InitAVSwitch", initAVSwitch)
+startupGraph.add("InitHDMIRecord", initHDMIRecord)
+startupGraph.add("InitRecordingConfig", initRecordingConfig)
+startupGraph.add("InitUsageConfig", initUsageConfig, after=("InitAVSwitch",))
+startupGraph.add("InitTimeZones", initTimeZones, files=("/etc/timezone.xml", "/usr/share/zoneinfo/"))
+startupGraph.add("AutoLogManager", startAutoLogManager, after=("InitUsageConfig",), defer=True)
+startupGraph.add("NTPSyncPoller", startNTPSyncPoller, after=("InitTimeZones",), defer=True)
+startupGraph.add("KeymapParser", keymapParser, after=("InitInputDevices", "InitUsageConfig"), files=(resolveFilename(SCOPE_CONFIG, KEYMAP_CACHE), enigma.eEnv.resolve("${datadir}/enigma2/keymap.xml")))
+startupGraph.add("InitNetwork", initNetwork, files=("/etc/network/interfaces", "/etc/resolv.conf"))
+startupGraph.add("InitLCD", initLCD, after=("InitUsageConfig",))
+startupGraph.add("PowerOffTimer", initPowerOffTimer, after=("InitUsageConfig",))
+startupGraph.add("InitOSDCalibration", initOSDCalibration, after=("InitAVSwitch",))
+startupGraph.add("EPGCacheCheck", startEPGCacheCheck, after=("InitUsageConfig",), defer=True)
+startupGraph.add("InitRFmod", initRFmod, defer=True)
+startupGraph.add("InitCiConfig", initCiConfig)
+startupGraph.run()
 
 # from enigma import dump_malloc_stats
 # t = eTimer()
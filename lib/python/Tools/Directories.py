@@ -14,6 +14,7 @@ from traceback import print_exc
 from sys import _getframe as getframe
 from unicodedata import normalize
 from tempfile import mkstemp
+from time import time
 from datetime import datetime
 from xml.etree.ElementTree import Element, ParseError, fromstring, parse
 
@@ -103,11 +104,53 @@ scopeLCDSkin = defaultPaths[SCOPE_LCDSKIN][0]
 scopeFonts = defaultPaths[SCOPE_FONTS][0]
 scopePlugins = defaultPaths[SCOPE_PLUGINS][0]
 
+RESOLVE_CACHE_SCOPES = (SCOPE_GUISKIN, SCOPE_LCDSKIN, SCOPE_FONTS)  # Scopes that search a list of directories.
+RESOLVE_CHECK_INTERVAL = 10  # Minimum time in seconds between the checks of the searched directories.
+
+resolveCache = {}  # Dictionary of (scope, base, primary skin, display skin): resolved path, both found and not found paths are cached.
+resolveDirectories = {}  # Dictionary of searched directory: mtime or None if the directory doesn't exist.
+resolveCheckTime = 0
+resolveStatistics = {
+	"hits": 0,
+	"misses": 0,
+	"invalidations": 0
+}
+
 
 def InitDefaultPaths():
+	clearResolveCache()
 	resolveFilename(SCOPE_CONFIG)
 
 
+def clearResolveCache():
+	if resolveCache or resolveDirectories:
+		resolveStatistics["invalidations"] += 1
+	resolveCache.clear()
+	resolveDirectories.clear()
+
+
+def getResolveStatistics():
+	return dict(resolveStatistics, entries=len(resolveCache), directories=len(resolveDirectories))
+
+
+def directoryMtime(directory):
+	try:
+		return stat(directory).st_mtime_ns
+	except OSError:
+		return None
+
+
+def checkResolveCache():  # A file added to or removed from any of the searched directories invalidates the cache.
+	global resolveCheckTime
+	now = time()
+	if now - resolveCheckTime >= RESOLVE_CHECK_INTERVAL:
+		resolveCheckTime = now
+		for directory, mtime in resolveDirectories.items():
+			if directoryMtime(directory) != mtime:
+				clearResolveCache()
+				break
+
+
 def resolveFilename(scope, base="", path_prefix=None):
 	if str(base).startswith(f"~{sep}"):  # You can only use the ~/ if we have a prefix directory.
 		if path_prefix:
@@ -132,6 +175,17 @@ def resolveFilename(scope, base="", path_prefix=None):
 		base = data[0]
 		suffix = data[1]
 	path = base
+	cacheKey = None
+	cached = None
+	if base and scope in RESOLVE_CACHE_SCOPES:
+		from Components.config import config  # This import must be here as this module finds the config file as part of the config initialization.
+		cacheKey = (scope, base, config.skin.primary_skin.value, config.skin.display_skin.value if hasattr(config.skin, "display_skin") else "")
+		checkResolveCache()
+		cached = resolveCache.get(cacheKey)
+		if cached is None:
+			resolveStatistics["misses"] += 1
+		else:
+			resolveStatistics["hits"] += 1
 
 	def itemExists(resolveList, base):
 		baseList = [base]
@@ -140,13 +194,18 @@ def resolveFilename(scope, base="", path_prefix=None):
 		elif base.endswith(".svg"):
 			baseList.append(f"{base[:-3]}png")
 		for item in resolveList:
+			directory = dirname(join(item, base))
+			if directory not in resolveDirectories:
+				resolveDirectories[directory] = directoryMtime(directory)
 			for base in baseList:
 				file = join(item, base)
 				if pathExists(file):
 					return file
 		return base
 
-	if base == "":  # If base is "" then set path to the scope.  Otherwise use the scope to resolve the base filename.
+	if cached is not None:
+		path = cached
+	elif base == "":  # If base is "" then set path to the scope.  Otherwise use the scope to resolve the base filename.
 		path, flags = defaultPaths.get(scope)
 		if scope == SCOPE_GUISKIN:  # If the scope is SCOPE_GUISKIN append the current skin to the scope path.
 			from Components.config import config  # This import must be here as this module finds the config file as part of the config initialization.
@@ -227,9 +286,12 @@ def resolveFilename(scope, base="", path_prefix=None):
 	else:
 		path, flags = defaultPaths.get(scope)
 		path = join(path, base)
-	path = normpath(path)
-	if isdir(path) and not path.endswith(sep):  # If the path is a directory then ensure that it ends with a "/".
-		path = join(path, "")
+	if cached is None:
+		path = normpath(path)
+		if isdir(path) and not path.endswith(sep):  # If the path is a directory then ensure that it ends with a "/".
+			path = join(path, "")
+		if cacheKey:
+			resolveCache[cacheKey] = path
 	if scope == SCOPE_PLUGIN_RELATIVE:
 		path = path[len(plugins) + 1:]
 	if suffix is not None:  # If a suffix was supplier restore it.
@@ -1,15 +1,16 @@
 from os import stat
+from os.path import basename, dirname
 from time import time
+from traceback import print_exc
+
+from enigma import eTimer
+
 from Components.config import config
 
 ECM_INFO = "/tmp/ecm.info"
+ECM_INFO_POLL = 1000  # Interval in ms of the shared poll that is used when inotify is not available.
 EMPTY_ECM_INFO = "", "0", "0", "0"
 
-old_ecm_time = time()
-info = {}
-ecm = ""
-data = EMPTY_ECM_INFO
-
 
 def getCaidData():
 	return (
@@ -30,71 +31,144 @@ def getCaidData():
 	)
 
 
-class GetEcmInfo:
-
+# The ECM info of the softcam.  The file is watched with inotify, or by one
+# shared poll when inotify is not available, and parsed once per change.  The
+# subscribers are called after every change, the converters that show ECM
+# information subscribe with the EcmInfoSubscriber mixin instead of polling the
+# file themselves.
+#
+class EcmInfo:
 	def __init__(self):
-		self.textValue = ""
+		self.serial = 0  # Incremented on every change of the ECM info.
+		self.key = None  # The (modification time in ns, size) of the file or None if there is no file.
+		self.mtime = None
+		self.lines = []
+		self.info = {}
+		self.data = EMPTY_ECM_INFO
+		self.parsed = {}  # Dictionary of parser: result of the parser for the current ECM info.
+		self.subscribers = {}  # Dictionary of callback: None.
+		self.started = False
+		self.notifier = None
+		self.pollTimer = None
+
+	def start(self):
+		if self.started:
+			return
+		self.started = True
+		try:
+			from twisted.internet import inotify
+			from twisted.python.filepath import FilePath
+			self.notifier = inotify.INotify()
+			self.notifier.startReading()
+			self.notifier.watch(FilePath(dirname(ECM_INFO)), mask=inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_DELETE | inotify.IN_MOVED_FROM, callbacks=[self.fileEvent])
+		except Exception as err:
+			print(f"[GetEcmInfo] Warning: Unable to watch '{ECM_INFO}' with inotify, polling it instead!  ({err})")
+			self.notifier = None
+			self.pollTimer = eTimer()
+			self.pollTimer.callback.append(self.poll)
+			self.pollTimer.start(ECM_INFO_POLL)
+		self.check()
+
+	def subscribe(self, callback):
+		self.start()
+		self.subscribers[callback] = None
+
+	def unsubscribe(self, callback):
+		self.subscribers.pop(callback, None)
+
+	def fileEvent(self, ignored, filePath, mask):
+		name = filePath.basename()
+		if (name.decode() if isinstance(name, bytes) else name) == basename(ECM_INFO):
+			self.check(force=True)
 
-	def pollEcmData(self):
-		global data, ecm, info, old_ecm_time
+	def poll(self):
+		self.check()
+
+	def check(self, force=False):  # Read the file if it has changed and notify the subscribers.
 		try:
-			ecm_time = stat(ECM_INFO).st_mtime
+			status = stat(ECM_INFO)
+			key = (status.st_mtime_ns, status.st_size)
 		except OSError:
-			ecm_time = old_ecm_time
-			data = EMPTY_ECM_INFO
-			info = {}
-			ecm = ""
-		if ecm_time != old_ecm_time:
-			oecmi1 = info.get("ecminterval1", "")
-			oecmi0 = info.get("ecminterval0", "")
-			info = {}
-			info["ecminterval2"] = oecmi1
-			info["ecminterval1"] = oecmi0
-			old_ecm_time = ecm_time
+			key = None
+		if key == self.key and not force:
+			return
+		if key is None:
+			if self.key is None:
+				return
+			self.lines = []
+			self.info = {}
+			self.data = EMPTY_ECM_INFO
+		else:
 			try:
-				ecm = open(ECM_INFO).readlines()
-			except OSError:
-				ecm = ""
-			for line in ecm:
-				d = line.split(":", 1)
-				if len(d) > 1:
-					info[d[0].strip()] = d[1].strip()
-			if info and info.get("from") and config.oscaminfo.hideServerName.value:
+				with open(ECM_INFO) as fd:
+					lines = fd.readlines()
+			except (OSError, UnicodeDecodeError):
+				lines = []
+			mtime = key[0] / 1000000000
+			info = {
+				"ecminterval2": self.info.get("ecminterval1", ""),
+				"ecminterval1": int(mtime - self.mtime + 0.5) if self.mtime else ""
+			}
+			for line in lines:
+				item = line.split(":", 1)
+				if len(item) > 1:
+					info[item[0].strip()] = item[1].strip()
+			if info.get("from") and config.oscaminfo.hideServerName.value:
 				info["from"] = "".join(["\u2022"] * len(info.get("from")))
-			data = self.getText()
-			return True
-		else:
-			info["ecminterval0"] = int(time() - ecm_time + 0.5)
+			self.mtime = mtime
+			self.lines = lines
+			self.info = info
+			self.data = self.parseText()
+		self.key = key
+		self.parsed = {}
+		self.serial += 1
+		for callback in list(self.subscribers):
+			try:
+				callback()
+			except Exception:
+				print("[GetEcmInfo] Error: ECM info subscriber failed!")
+				print_exc()
 
-	def getEcm(self):
-		return (self.pollEcmData(), ecm)
+	def exists(self):
+		self.start()
+		return self.key is not None
 
-	def getEcmData(self):
-		self.pollEcmData()
-		return data
+	def getLines(self):
+		self.start()
+		return self.lines
 
-	def getInfo(self, member, ifempty=""):
-		self.pollEcmData()
-		return str(info.get(member, ifempty))
+	def getInfo(self):
+		self.start()
+		if self.mtime:
+			self.info["ecminterval0"] = int(time() - self.mtime + 0.5)
+		return self.info
 
-	def getInfoRaw(self):
-		self.pollEcmData()
-		return info
+	def getData(self):
+		self.start()
+		return self.data
 
-	def getText(self):
-		global ecm
+	def getParsed(self, parser):  # Returns the result of parser(lines), the parser is only run once per change of the ECM info.
+		self.start()
+		result = self.parsed.get(parser)
+		if result is None:
+			result = self.parsed[parser] = parser(self.lines)
+		return result
+
+	def parseText(self):  # Returns (text, caid, provider id, ECM pid) of the info.
+		info = self.info
+		ecm = self.lines
 		try:
 			using = info.get("using", "")  # Info is a dictionary.
 			if using:
 				# CCcam.
 				if using == "fta":
-					self.textValue = _("FTA")
+					textValue = _("FTA")
 				elif using == "emu":
-					self.textValue = f"EMU ({info.get('ecm time', '?')}s)"
+					textValue = f"EMU ({info.get('ecm time', '?')}s)"
 				else:
 					hops = info.get("hops", None)
 					hops = f" @{hops}" if hops and hops != "0" else ""
-					self.textValue = f"{info.get('address', '?')}{hops} ({info.get('ecm time', '?')}s)"
+					textValue = f"{info.get('address', '?')}{hops} ({info.get('ecm time', '?')}s)"
 			else:
 				decode = info.get("decode", None)
 				if decode:
@@ -105,18 +179,18 @@ class GetEcmInfo:
 							share = open("/tmp/share.info").readlines()
 							for line in share:
 								if cardid in line:
-									self.textValue = line.strip()
+									textValue = line.strip()
 									break
 							else:
-								self.textValue = cardid
+								textValue = cardid
 						except Exception:
-							self.textValue = decode
+							textValue = decode
 					else:
-						self.textValue = decode
+						textValue = decode
 					if ecm[1].startswith("SysID"):
 						info["prov"] = ecm[1].strip()[6:]
 					if info["response"] and "CaID 0x" in ecm[0] and "pid 0x" in ecm[0]:
-						self.textValue += f" (0.{info['response']}s)"
+						textValue += f" (0.{info['response']}s)"
 						info["caid"] = ecm[0][ecm[0].find("CaID 0x") + 7:ecm[0].find(",")]
 						info["pid"] = ecm[0][ecm[0].find("pid 0x") + 6:ecm[0].find(" =")]
 						info["provid"] = info.get("prov", "0")[:4]
@@ -136,28 +210,92 @@ class GetEcmInfo:
 								if line[0]:
 									timeString = f" ({float(line[0]) / 1000.0}s)"
 									continue
-						self.textValue = f"{source}{timeString}"
+						textValue = f"{source}{timeString}"
 					else:
 						reader = info.get("reader", "")
 						if reader:
 							hops = info.get("hops", None)
 							hops = f" @{hops}" if hops and hops != "0" else ""
-							self.textValue = f"{reader}{hops} ({info.get('ecm time', '?')}s)"
+							textValue = f"{reader}{hops} ({info.get('ecm time', '?')}s)"
 						else:
 							response = info.get("response time", None)
 							if response:
 								# Wicardd - type 1.
 								response = response.split(" ")
-								self.textValue = f"{response[4]} ({float(response[0]) / 1000.0}s)"
+								textValue = f"{response[4]} ({float(response[0]) / 1000.0}s)"
 							else:
-								self.textValue = ""
+								textValue = ""
 			decCI = info.get("caid", info.get("CAID", "0"))
 			provid = info.get("provid", info.get("prov", info.get("Provider", "0")))
 			ecmpid = info.get("pid", info.get("ECM PID", "0"))
 		except Exception:
-			ecm = ""
-			self.textValue = ""
+			self.lines = []
+			textValue = ""
 			decCI = "0"
 			provid = "0"
 			ecmpid = "0"
-		return self.textValue, decCI, provid, ecmpid
+		return textValue, decCI, provid, ecmpid
+
+
+ecmInfo = EcmInfo()
+
+
+class EcmInfoSubscriber:  # Mixin for converters that are refreshed when the ECM info changes.
+	def __init__(self):
+		self.ecmInfoWatched = False
+		self.ecmInfoSuspended = False
+
+	def watchEcmInfo(self):
+		if not self.ecmInfoWatched:
+			self.ecmInfoWatched = True
+			if not self.ecmInfoSuspended:
+				ecmInfo.subscribe(self.ecmInfoChanged)
+
+	def ecmInfoChanged(self):
+		self.changed((self.CHANGED_POLL,))
+
+	def doSuspend(self, suspended):
+		self.ecmInfoSuspended = suspended
+		if self.ecmInfoWatched:
+			if suspended:
+				ecmInfo.unsubscribe(self.ecmInfoChanged)
+			else:
+				ecmInfo.subscribe(self.ecmInfoChanged)
+				self.ecmInfoChanged()
+		super().doSuspend(suspended)
+
+	def destroy(self):
+		ecmInfo.unsubscribe(self.ecmInfoChanged)
+		self.ecmInfoWatched = False
+		super().destroy()
+
+
+class GetEcmInfo:
+	def __init__(self):
+		self.textValue = ""
+		self.serial = 0  # The ECM info is only new to the first call if there is a file.
+
+	def pollEcmData(self):  # Returns True if the ECM info has changed since the last call.
+		ecmInfo.start()
+		if ecmInfo.serial != self.serial:
+			self.serial = ecmInfo.serial
+			self.textValue = ecmInfo.data[0]
+			return True
+		return None
+
+	def getEcm(self):
+		return (self.pollEcmData(), ecmInfo.getLines())
+
+	def getEcmData(self):
+		self.pollEcmData()
+		return ecmInfo.getData()
+
+	def getInfo(self, member, ifempty=""):
+		return str(ecmInfo.getInfo().get(member, ifempty))
+
+	def getInfoRaw(self):
+		return ecmInfo.getInfo()
+
+	def getText(self):
+		self.pollEcmData()
+		return ecmInfo.getData()
@@ -1,67 +1,244 @@
 # -*- coding: utf-8 -*-
-# the implementation here is a bit crappy.
-import time
+# Hierarchical startup profiler.
+#
+# The startup is traced as a tree of spans.  StartEnigma marks its phases with
+# profile(), which also drives the boot progress display and eProfileWrite(),
+# other code can be traced with profileBegin() / profileEnd() or the profiled()
+# decorator and all module imports are traced by an import hook.  Tracing stops
+# with profileFinal() once the first screen is up, then the boot is added to
+# the history, compared with the previous boot and written as folded stacks
+# that can be turned into a flame graph with flamegraph.pl.
+#
+import sys
+from functools import wraps
+from json import dump, load
+from os import rename
+from threading import get_ident
+from time import perf_counter, time
+
+from enigma import eProfileWrite
+
 from Tools.Directories import resolveFilename, SCOPE_CONFIG
 
 PERCENTAGE_START = 0
 PERCENTAGE_END = 100
 
-profile_start = time.time()
+PROFILE_HISTORY = "profile_history.json"
+PROFILE_FOLDED = "profile.folded"
+PROFILE_HISTORY_SIZE = 5  # Number of boots kept in the history.
+PROFILE_DIFF_LINES = 15  # Number of the largest changes against the previous boot that are logged.
+PROFILE_MINIMUM_IMPORT = 0.001  # Imports faster than this many seconds are only added to their parent.
 
-profile_data = {}
-total_time = 1
-profile_file = None
+profile_start = perf_counter()
+profileTime = time()
+profiling = True
+mainThread = get_ident()  # Only the main thread is traced.
+spanStack = []  # List of open spans as [name, start, time of the children, checkpoint].
+spanTimes = {}  # Dictionary of span path tuple: [total time, self time, count].
+checkpoints = {}  # Dictionary of checkpoint name: time since the start of the boot.
+previousCheckpoints = None
+previousTotal = 0
 # model = BoxInfo.get("machinebuild")  # For when we can use BoxInfo.
 model = None
 
-try:
-	profile_old = open(resolveFilename(SCOPE_CONFIG, "profile")).readlines()
-
-	t = None
-	for line in profile_old:
-		(t, id) = line[:-1].split('\t')
-		t = float(t)
-		total_time = t
-		profile_data[id] = t
-except:
-	print("no profile data available")
-
-try:
-	profile_file = open(resolveFilename(SCOPE_CONFIG, "profile"), "w")
-except IOError:
-	print("WARNING: couldn't open profile file!")
-
-
-def profile(id):
-	now = time.time() - profile_start
-	if profile_file:
-		profile_file.write("%7.3f\t%s\n" % (now, id))
-
-		if id in profile_data:
-			t = profile_data[id]
-			if total_time:
-				perc = t * (PERCENTAGE_END - PERCENTAGE_START) / total_time + PERCENTAGE_START
-			else:
-				perc = PERCENTAGE_START
+
+def isProfiling():
+	return profiling and get_ident() == mainThread
+
+
+def profileBegin(name, checkpoint=False):
+	if isProfiling():
+		spanStack.append([name, perf_counter(), 0.0, checkpoint])
+
+
+def profileEnd():
+	if isProfiling() and spanStack:
+		if spanStack[-1][3]:  # End the last phase within the span.
+			closeSpan()
+		if spanStack and not spanStack[-1][3]:
+			closeSpan()
+
+
+def closeSpan():
+	path = tuple(span[0] for span in spanStack)
+	name, start, childTime, checkpoint = spanStack.pop()
+	duration = perf_counter() - start
+	if spanStack:
+		spanStack[-1][2] += duration
+	times = spanTimes.get(path)
+	if times is None:
+		times = spanTimes[path] = [0.0, 0.0, 0]
+	times[0] += duration
+	times[1] += duration - childTime
+	times[2] += 1
+
+
+def profiled(name):  # Decorator to trace the calls of a function during the startup.
+	def decorator(function):
+		@wraps(function)
+		def wrapper(*args, **kwargs):
+			if not isProfiling():
+				return function(*args, **kwargs)
+			profileBegin(name)
 			try:
-				if model == "axodin":
-					open("/dev/dbox/oled0", "w").write("%d" % perc)
-				elif model in ("gb800solo", "gb800se", "gb800seplus", "gbultrase"):
-					open("/dev/mcu", "w").write("%d  \n" % perc)
-				elif model in ("ebox5000", "osmini", "spycatmini", "osminiplus", "spycatminiplus"):
-					open("/proc/progress", "w").write("%d" % perc)
-				elif model in ("sezammarvel", "xpeedlx3", "atemionemesis"):
-					open("/proc/vfd", "w").write("Loading %d %%" % perc)
-				elif model == "beyonwizu4":
-					open("/dev/dbox/oled0", "w").write("Loading %d%%\n" % perc)
+				return function(*args, **kwargs)
+			finally:
+				profileEnd()
+		return wrapper
+	return decorator
+
+
+def profile(id):  # Start the next startup phase at the current level.
+	eProfileWrite(id)
+	if not isProfiling():
+		return
+	if spanStack and spanStack[-1][3]:
+		closeSpan()
+	profileBegin(id, checkpoint=True)
+	now = perf_counter() - profile_start
+	checkpoints[id] = now
+	showProgress(id)
+
+
+def profileCheckpointEnd():  # End the current startup phase without starting the next one.
+	if isProfiling() and spanStack and spanStack[-1][3]:
+		closeSpan()
+
+
+def showProgress(id):
+	global previousCheckpoints, previousTotal
+	if previousCheckpoints is None:
+		history = readHistory()
+		previousCheckpoints = history[-1].get("checkpoints", {}) if history else {}
+		previousTotal = history[-1].get("total", 0) if history else 0
+	if id in previousCheckpoints:
+		t = previousCheckpoints[id]
+		if previousTotal:
+			perc = t * (PERCENTAGE_END - PERCENTAGE_START) / previousTotal + PERCENTAGE_START
+		else:
+			perc = PERCENTAGE_START
+		try:
+			if model == "axodin":
+				open("/dev/dbox/oled0", "w").write("%d" % perc)
+			elif model in ("gb800solo", "gb800se", "gb800seplus", "gbultrase"):
+				open("/dev/mcu", "w").write("%d  \n" % perc)
+			elif model in ("ebox5000", "osmini", "spycatmini", "osminiplus", "spycatminiplus"):
+				open("/proc/progress", "w").write("%d" % perc)
+			elif model in ("sezammarvel", "xpeedlx3", "atemionemesis"):
+				open("/proc/vfd", "w").write("Loading %d %%" % perc)
+			elif model == "beyonwizu4":
+				open("/dev/dbox/oled0", "w").write("Loading %d%%\n" % perc)
+			else:
+				open("/proc/progress", "w").write("%d \n" % perc)
+		except IOError:
+			pass
+
+
+# Import hook that traces the execution of every module imported during the
+# startup.
+#
+class TracedLoader:
+	def __init__(self, loader, name):
+		self.loader = loader
+		self.name = name
+
+	def __getattr__(self, attr):
+		return getattr(self.loader, attr)
+
+	def create_module(self, spec):
+		return self.loader.create_module(spec)
+
+	def exec_module(self, module):
+		if not isProfiling():
+			return self.loader.exec_module(module)
+		name = f"import {self.name}"
+		profileBegin(name)
+		try:
+			self.loader.exec_module(module)
+		finally:
+			if spanStack and spanStack[-1][0] == name:
+				if perf_counter() - spanStack[-1][1] < PROFILE_MINIMUM_IMPORT and spanStack[-1][2] == 0.0:
+					spanStack.pop()  # Leave the time to the parent span and keep the tree readable.
 				else:
-					open("/proc/progress", "w").write("%d \n" % perc)
-			except IOError:
-				pass
+					closeSpan()
+
+
+class ImportTracer:
+	def find_spec(self, name, path=None, target=None):
+		if not profiling:
+			return None
+		for finder in sys.meta_path:
+			if finder is self or not hasattr(finder, "find_spec"):
+				continue
+			spec = finder.find_spec(name, path, target)
+			if spec is not None:
+				if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+					spec.loader = TracedLoader(spec.loader, name)
+				return spec
+		return None
+
+
+importTracer = ImportTracer()
+sys.meta_path.insert(0, importTracer)
+
+
+def readHistory():
+	try:
+		with open(resolveFilename(SCOPE_CONFIG, PROFILE_HISTORY)) as fd:
+			history = load(fd)
+		if isinstance(history, list):
+			return history
+	except FileNotFoundError:
+		pass
+	except Exception as err:
+		print(f"[Profile] Error: Unable to read the profile history!  ({err})")
+	return []
+
+
+def getProfileDiff(current, previous):  # Returns a list of (path, previous seconds, current seconds) ordered by the size of the change.
+	paths = set(current) | set(previous)
+	diff = [(path, previous.get(path, 0.0), current.get(path, 0.0)) for path in paths]
+	return sorted(diff, key=lambda x: abs(x[2] - x[1]), reverse=True)
+
+
+def getFoldedStacks():  # Returns the self times of the spans in the folded stack format of flamegraph.pl in microseconds.
+	return [f"{';'.join(path)} {int(times[1] * 1000000)}" for path, times in sorted(spanTimes.items()) if times[1] >= 0.000001]
 
 
 def profile_final():
-	global profile_file
-	if profile_file is not None:
-		profile_file.close()
-		profile_file = None
+	global profiling
+	if not isProfiling():
+		return
+	while spanStack:
+		closeSpan()
+	profiling = False
+	if importTracer in sys.meta_path:
+		sys.meta_path.remove(importTracer)
+	total = perf_counter() - profile_start
+	spans = {";".join(path): round(times[0], 6) for path, times in spanTimes.items()}
+	history = readHistory()
+	print(f"[Profile] Startup took {total:.3f}s.")
+	if history:
+		previous = history[-1]
+		print(f"[Profile] Largest changes against the boot of {previous.get('start', 0):.0f} which took {previous.get('total', 0):.3f}s:")
+		for path, old, new in getProfileDiff(spans, previous.get("spans", {}))[:PROFILE_DIFF_LINES]:
+			print(f"[Profile]   {(new - old) * 1000:+9.1f}ms  {old * 1000:9.1f}ms -> {new * 1000:9.1f}ms  {path}")
+	history.append({
+		"start": profileTime,
+		"total": round(total, 6),
+		"checkpoints": {id: round(t, 6) for id, t in checkpoints.items()},
+		"spans": spans
+	})
+	filename = resolveFilename(SCOPE_CONFIG, PROFILE_HISTORY)
+	try:
+		with open(f"{filename}.tmp", "w") as fd:
+			dump(history[-PROFILE_HISTORY_SIZE:], fd)
+		rename(f"{filename}.tmp", filename)
+		with open(resolveFilename(SCOPE_CONFIG, PROFILE_FOLDED), "w") as fd:
+			fd.write("\n".join(getFoldedStacks()))
+			fd.write("\n")
+	except OSError as err:
+		print(f"[Profile] Error {err.errno}: Unable to save the startup profile!  ({err.strerror})")
+
+
+profileFinal = profile_final
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Dependency graph of the startup initialisation steps.
+#
+# Each step is added with the names of the steps it depends on.  The steps
+# change the configuration and the enigma objects, so they all run on the
+# main thread in dependency order.  The files a step reads can be declared so
+# that a small pool of threads reads them ahead into the page cache while the
+# earlier steps run.  Steps that are not needed for the first screen can be
+# deferred until after the first frame, they are then run one per main loop
+# cycle.
+#
+from os import scandir
+from os.path import isdir
+from time import perf_counter
+from traceback import print_exc
+
+from enigma import eTimer
+
+from Tools.Profile import profile, profileCheckpointEnd, profile_start
+
+STARTUP_THREADS = 2  # Number of threads reading the files of the steps ahead.
+READ_AHEAD_BLOCK = 65536
+READ_AHEAD_DEPTH = 4  # Maximum depth of the directories that are read ahead.
+
+
+def readAhead(paths):  # Read the files and directory trees so that the steps find them in the page and directory caches.
+	def readTree(path, depth):
+		try:
+			with scandir(path) as entries:
+				for entry in entries:
+					if depth and entry.is_dir(follow_symlinks=False):
+						readTree(entry.path, depth - 1)
+		except OSError:
+			pass
+
+	for path in paths:
+		if isdir(path):
+			readTree(path, READ_AHEAD_DEPTH)
+		else:
+			try:
+				with open(path, "rb", buffering=0) as fd:
+					while fd.read(READ_AHEAD_BLOCK):
+						pass
+			except OSError:
+				pass
+
+
+class StartupGraph:
+	def __init__(self, threads=STARTUP_THREADS):
+		self.threads = threads
+		self.steps = {}  # Dictionary of step name: (function, dependencies, files, deferred).
+		self.deferred = []
+		self.times = {}  # Dictionary of step name: seconds on the main thread.
+		self.readAheadWait = 0.0
+		self.graphTime = 0.0
+		self.firstFrameTime = None
+		self.deferTimer = None
+
+	def add(self, name, function, after=(), files=(), defer=False):
+		if name in self.steps:
+			raise ValueError(f"Startup step '{name}' already exists!")
+		for dependency in after:
+			if dependency not in self.steps:
+				raise ValueError(f"Startup step '{name}' depends on the unknown step '{dependency}'!")
+			if self.steps[dependency][3] and not defer:
+				raise ValueError(f"Startup step '{name}' depends on the deferred step '{dependency}' and must be deferred too!")
+		self.steps[name] = (function, tuple(after), tuple(files), defer)
+
+	def run(self):  # Run all steps that are not deferred.
+		start = perf_counter()
+		order = [name for name in self.steps if not self.steps[name][3]]
+		readAheads = {}
+		executor = None
+		files = [(name, self.steps[name][2]) for name in order if self.steps[name][2]]
+		if files and self.threads:
+			from concurrent.futures import ThreadPoolExecutor
+			executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="StartupGraph")
+			for name, paths in files:
+				readAheads[name] = executor.submit(readAhead, paths)
+		try:
+			for name in order:  # Steps can only depend on earlier steps so the order they were added in is a valid order.
+				readAheadFuture = readAheads.get(name)
+				if readAheadFuture is not None:
+					wait = perf_counter()
+					readAheadFuture.result()
+					self.readAheadWait += perf_counter() - wait
+				self.runStep(name)
+		finally:
+			if executor:
+				executor.shutdown(wait=False, cancel_futures=True)
+		profileCheckpointEnd()  # The code after the graph must not be counted as part of the last step.
+		self.deferred = [name for name in self.steps if self.steps[name][3]]
+		self.graphTime = perf_counter() - start
+
+	def runStep(self, name):
+		profile(name)
+		start = perf_counter()
+		self.steps[name][0]()
+		self.times[name] = perf_counter() - start
+
+	def firstFrame(self):  # Report the time to the first frame and start the deferred steps.
+		self.firstFrameTime = perf_counter() - profile_start
+		slowest = ", ".join(f"{name} {self.times[name] * 1000:.0f}ms" for name in sorted(self.times, key=lambda x: self.times[x], reverse=True)[:3])
+		print(f"[StartupGraph] Time to first frame {self.firstFrameTime:.3f}s, {len(self.times)} initialisation steps took {self.graphTime:.3f}s ({self.readAheadWait * 1000:.0f}ms waiting for read ahead), slowest: {slowest}, {len(self.deferred)} steps deferred.")
+		if self.deferred:
+			self.deferTimer = eTimer()
+			self.deferTimer.callback.append(self.runDeferred)
+			self.deferTimer.start(0, True)
+
+	def runDeferred(self):  # Run the next deferred step, one step per main loop cycle.
+		if self.deferred:
+			name = self.deferred.pop(0)
+			try:
+				self.runStep(name)
+			except Exception:
+				print(f"[StartupGraph] Error: Deferred startup step '{name}' failed!")
+				print_exc()
+		if self.deferred:
+			self.deferTimer.start(0, True)
+
+	def getStatistics(self):  # Returns a list of (step name, milliseconds), slowest first.
+		return sorted([(name, duration * 1000) for name, duration in self.times.items()], key=lambda x: x[1], reverse=True)
@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
+import json
+import stat
 import time
 import os
 import enigma
+from threading import Lock
 from Components.config import config
 from Components import Harddisk
 from twisted.internet import threads
 
+TRASH_INDEX = ".trashindex"
+TRASH_INDEX_VERSION = 1
+
 
 def getTrashFolder(path):
 	# Returns trash folder without symlinks. Path may be file or directory or whatever.
@@ -39,11 +45,182 @@ def enumTrashFolders():
 				yield result
 
 
+# The index of a trash folder holds the (ctime, size) of every file in the
+# trash and the mtime of every directory of the trash.  It is kept in the
+# trash folder itself and is brought up to date by only listing the
+# directories that have been changed since they were indexed, so that a
+# purge does not have to stat every file on the disk.  The index is only
+# used by the purge thread, the paths moved into the trash are queued by
+# markTrashed() and added to the index by the next purge.
+#
+class TrashIndex:
+	def __init__(self, trash):
+		self.trash = trash
+		self.files = {}  # Dictionary of relative path: (ctime, size).
+		self.directories = {}  # Dictionary of relative path: [mtime, set of subdirectory names, set of file names].
+		self.statCount = 0
+		self.load()
+
+	def load(self):
+		try:
+			with open(os.path.join(self.trash, TRASH_INDEX)) as fd:
+				data = json.load(fd)
+			if data.get("version") == TRASH_INDEX_VERSION:
+				self.files = dict((path, tuple(entry)) for path, entry in data["files"].items())
+				self.directories = dict((path, [entry[0], set(entry[1]), set(entry[2])]) for path, entry in data["directories"].items())
+		except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+			if not isinstance(e, FileNotFoundError):
+				print("[Trashcan] Failed to read index of %s:" % self.trash, e)
+			self.files = {}
+			self.directories = {}
+
+	def save(self):
+		filename = os.path.join(self.trash, TRASH_INDEX)
+		data = {
+			"version": TRASH_INDEX_VERSION,
+			"files": self.files,
+			"directories": dict((path, [entry[0], sorted(entry[1]), sorted(entry[2])]) for path, entry in self.directories.items())
+		}
+		try:
+			with open(filename + ".tmp", "w") as fd:
+				json.dump(data, fd)
+			os.rename(filename + ".tmp", filename)
+		except OSError as e:
+			print("[Trashcan] Failed to write index of %s:" % self.trash, e)
+
+	def getDirectory(self, path):
+		directory = self.directories.get(path)
+		if directory is None:
+			directory = self.directories[path] = [None, set(), set()]
+			if path:
+				parent, name = os.path.split(path)
+				self.getDirectory(parent)[1].add(name)
+		return directory
+
+	def removeDirectory(self, path):
+		directory = self.directories.pop(path, None)
+		if directory is not None:
+			for name in directory[1]:
+				self.removeDirectory(os.path.join(path, name))
+			for name in directory[2]:
+				self.files.pop(os.path.join(path, name), None)
+
+	def addFile(self, path, st):
+		parent, name = os.path.split(path)
+		self.getDirectory(parent)[2].add(name)
+		self.files[path] = (st.st_ctime, st.st_size)
+
+	def removeFile(self, path):
+		parent, name = os.path.split(path)
+		self.files.pop(path, None)
+		directory = self.directories.get(parent)
+		if directory is not None:
+			directory[2].discard(name)
+
+	def reconcile(self):
+		# Only list the directories whose mtime has changed and only stat
+		# the names that are not in the index yet.
+		self.statCount = 0
+		pending = [""]
+		while pending:
+			path = pending.pop()
+			fullPath = os.path.join(self.trash, path)
+			try:
+				mtime = os.stat(fullPath).st_mtime
+				self.statCount += 1
+			except OSError:
+				self.removeDirectory(path)
+				continue
+			directory = self.getDirectory(path)
+			if directory[0] != mtime:
+				try:
+					names = set(os.listdir(fullPath))
+				except OSError as e:
+					print("[Trashcan] Failed to list %s:" % fullPath, e)
+					continue
+				if not path:
+					names.discard(TRASH_INDEX)
+					names.discard(TRASH_INDEX + ".tmp")
+				for name in directory[1] - names:
+					self.removeDirectory(os.path.join(path, name))
+				for name in directory[2] - names:
+					self.files.pop(os.path.join(path, name), None)
+				directory[1] &= names
+				directory[2] &= names
+				for name in names - directory[1] - directory[2]:
+					try:
+						st = os.lstat(os.path.join(fullPath, name))
+						self.statCount += 1
+					except OSError as e:
+						print("[Trashcan] Failed to stat %s:" % name, e)
+						continue
+					if stat.S_ISDIR(st.st_mode):
+						self.getDirectory(os.path.join(path, name))
+					else:
+						self.addFile(os.path.join(path, name), st)
+				directory[0] = mtime
+			pending.extend([os.path.join(path, name) for name in directory[1]])
+
+	def removeEmptyDirectories(self):
+		for path in sorted(self.directories, reverse=True):  # Children sort after their parents.
+			directory = self.directories[path]
+			if path and not directory[1] and not directory[2]:
+				try:
+					os.rmdir(os.path.join(self.trash, path))
+				except OSError:
+					pass
+				else:
+					self.removeDirectory(path)
+					parent, name = os.path.split(path)
+					self.getDirectory(parent)[1].discard(name)
+
+	def trashed(self, path):
+		# Add a file or a directory tree just moved into the trash.
+		for root, dirs, files in os.walk(path) if os.path.isdir(path) else [(os.path.dirname(path), [], [os.path.basename(path)])]:
+			relativeRoot = os.path.relpath(root, self.trash)
+			relativeRoot = "" if relativeRoot == "." else relativeRoot
+			self.getDirectory(relativeRoot)
+			for name in dirs:
+				self.getDirectory(os.path.join(relativeRoot, name))
+			for name in files:
+				try:
+					self.addFile(os.path.join(relativeRoot, name), os.stat(os.path.join(root, name)))
+				except OSError as e:
+					print("[Trashcan] Failed to stat %s:" % name, e)
+
+
+trashIndexes = {}
+trashIndexesLock = Lock()
+trashedPaths = {}  # Dictionary of trash folder: [paths moved into the trash since the last purge].
+trashedPathsLock = Lock()
+
+
+def getTrashIndex(trash):
+	with trashIndexesLock:
+		index = trashIndexes.get(trash)
+		if index is None:
+			index = trashIndexes[trash] = TrashIndex(trash)
+		return index
+
+
+def markTrashed(trash, paths):
+	# Called on the UI thread after files or directories have been moved
+	# into the trash folder, they are indexed by the next purge.
+	with trashedPathsLock:
+		trashedPaths.setdefault(trash, []).extend(paths)
+
+
+def takeTrashed(trash):
+	with trashedPathsLock:
+		return trashedPaths.pop(trash, [])
+
+
 class Trashcan:
 	def __init__(self):
 		self.isCleaning = False
 		self.session = None
 		self.dirty = set()
+		self.statistics = {}  # Dictionary of trash folder: statistics of the last purge.
 
 	def init(self, session):
 		self.session = session
@@ -90,6 +267,8 @@ class Trashcan:
 
 	def cleanReady(self, result=None):
 		self.isCleaning = False
+		if result:
+			self.statistics.update(result)
 		# schedule another clean loop if needed (so we clean up all devices, not just one)
 		self.cleanIfIdle()
 
@@ -101,46 +280,65 @@ class Trashcan:
 def purge(cleanset, ctimeLimit, reserveBytes):
 	# Remove expired items from trash, and attempt to have
 	# reserveBytes of free disk space.
+	result = {}
 	for trash in cleanset:
 		if not os.path.isdir(trash):
 			print("[Trashcan] No trash.", trash)
-			return 0
+			continue
+		start = time.time()
 		diskstat = os.statvfs(trash)
 		free = diskstat.f_bfree * diskstat.f_bsize
 		bytesToRemove = reserveBytes - free
 		candidates = []
 		print("[Trashcan] bytesToRemove", bytesToRemove, trash)
 		size = 0
-		for root, dirs, files in os.walk(trash, topdown=False):
-			for name in files:
-				try:
-					fn = os.path.join(root, name)
-					st = os.stat(fn)
-					if st.st_ctime < ctimeLimit:
-						print("[Trashcan] Too old:", name, st.st_ctime)
-						enigma.eBackgroundFileEraser.getInstance().erase(fn)
-						bytesToRemove -= st.st_size
-					else:
-						candidates.append((st.st_ctime, fn, st.st_size))
-						size += st.st_size
-				except Exception as e:
-					print("[Trashcan] Failed to stat %s:" % name, e)
-			# Remove empty directories if possible
-			for name in dirs:
-				try:
-					os.rmdir(os.path.join(root, name))
-				except:
-					pass
+		erasedFiles = 0
+		erasedBytes = 0
+		index = getTrashIndex(trash)
+		for path in takeTrashed(trash):
+			try:
+				index.trashed(path)
+			except Exception as e:
+				print("[Trashcan] Failed to index %s:" % path, e)
+		index.reconcile()
+		for path, (st_ctime, st_size) in list(index.files.items()):
+			fn = os.path.join(trash, path)
+			if st_ctime < ctimeLimit:
+				print("[Trashcan] Too old:", path, st_ctime)
+				enigma.eBackgroundFileEraser.getInstance().erase(fn)
+				index.removeFile(path)
+				bytesToRemove -= st_size
+				erasedFiles += 1
+				erasedBytes += st_size
+			else:
+				candidates.append((st_ctime, fn, st_size, path))
+				size += st_size
 		candidates.sort()
 		# Now we have a list of ctime, candidates, size. Sorted by ctime (=deletion time)
 		print("[Trashcan] Bytes to remove remaining:", bytesToRemove, trash)
-		for st_ctime, fn, st_size in candidates:
+		for st_ctime, fn, st_size, path in candidates:
 			if bytesToRemove < 0:
 				break
 			enigma.eBackgroundFileEraser.getInstance().erase(fn)
+			index.removeFile(path)
 			bytesToRemove -= st_size
 			size -= st_size
+			erasedFiles += 1
+			erasedBytes += st_size
+		index.removeEmptyDirectories()
+		index.save()
+		result[trash] = {
+			"time": time.time() - start,
+			"directories": len(index.directories),
+			"files": len(index.files),
+			"stats": index.statCount,
+			"erasedFiles": erasedFiles,
+			"erasedBytes": erasedBytes,
+			"size": size
+		}
 		print("[Trashcan] Size after purging:", size, trash)
+		print("[Trashcan] Purged %d files (%d bytes) in %.3fs, %d stat calls for %d indexed files." % (erasedFiles, erasedBytes, result[trash]["time"], index.statCount, len(index.files)))
+	return result
 
 
 def cleanAll(trash):
@@ -149,6 +347,8 @@ def cleanAll(trash):
 		return 0
 	for root, dirs, files in os.walk(trash, topdown=False):
 		for name in files:
+			if name in (TRASH_INDEX, TRASH_INDEX + ".tmp"):
+				continue
 			fn = os.path.join(root, name)
 			try:
 				enigma.eBackgroundFileEraser.getInstance().erase(fn)
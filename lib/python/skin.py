@@ -1,10 +1,14 @@
+from collections import OrderedDict
 from glob import glob
+from marshal import dump as marshalDump, load as marshalLoad
 from os.path import dirname, getmtime, isfile, join as pathjoin, splitext
-from os import listdir, unlink
+from os import listdir, rename, stat, unlink
+from time import perf_counter
 from traceback import print_exc
+from weakref import WeakKeyDictionary
 from xml.etree.ElementTree import Element, ElementTree, fromstring
 
-from enigma import BT_ALPHABLEND, BT_ALPHATEST, BT_HALIGN_CENTER, BT_HALIGN_LEFT, BT_HALIGN_RIGHT, BT_KEEP_ASPECT_RATIO, BT_SCALE, BT_VALIGN_BOTTOM, BT_VALIGN_CENTER, BT_VALIGN_TOP, addFont, eLabel, eListbox, eListboxPythonMultiContent, ePixmap, ePoint, eRect, eRectangle, eSize, eSlider, eSubtitleWidget, eWidget, eWindow, eWindowStyleManager, eWindowStyleSkinned, getDesktop, gFont, getFontFaces, gMainDC, gRGB
+from enigma import BT_ALPHABLEND, BT_ALPHATEST, BT_HALIGN_CENTER, BT_HALIGN_LEFT, BT_HALIGN_RIGHT, BT_KEEP_ASPECT_RATIO, BT_SCALE, BT_VALIGN_BOTTOM, BT_VALIGN_CENTER, BT_VALIGN_TOP, addFont, eLabel, eListbox, eListboxPythonMultiContent, ePixmap, ePoint, eRect, eRectangle, eSize, eSlider, eSubtitleWidget, eTimer, eWidget, eWindow, eWindowStyleManager, eWindowStyleSkinned, getDesktop, gFont, getFontFaces, gMainDC, gRGB
 
 from Components.config import ConfigEnableDisable, ConfigSelection, ConfigSubsection, ConfigText, config
 from Components.SystemInfo import BoxInfo
@@ -12,6 +16,7 @@ from Components.Sources.Source import ObsoleteSource
 from Tools.Directories import SCOPE_CONFIG, SCOPE_LCDSKIN, SCOPE_GUISKIN, SCOPE_FONTS, SCOPE_SKINS, pathExists, resolveFilename, fileReadLines, fileReadXML
 from Tools.Import import my_import
 from Tools.LoadPixmap import LoadPixmap
+from Tools.Profile import profiled
 
 MODULE_NAME = __name__.split(".")[-1].capitalize()
 
@@ -22,6 +27,10 @@ DEFAULT_DISPLAY_SKIN = "skin_default/skin_display.xml"
 USER_SKIN = "skin_user.xml"
 USER_SKIN_TEMPLATE = "skin_user_%s.xml"
 SUBTITLE_SKIN = "skin_subtitles.xml"
+SKIN_CACHE = "skin_cache.bin"
+SKIN_CACHE_VERSION = 2
+SKIN_CACHE_DELAY = 60000  # Delay in ms before new skin cache data is written.
+PARSE_CACHE_SIZE = 256  # Maximum number of results remembered by each memoized parse function.
 
 GUI_SKIN_ID = 0  # Main frame-buffer.
 DISPLAY_SKIN_ID = 1  # Front panel / display / LCD.
@@ -51,6 +60,14 @@ scrollLabelStyle = {}  # Dictionary of scrollLabel widget defaults.
 constantWidgets = {}
 layouts = {}
 variables = {}
+embeddedSkins = {}  # Dictionary of parsed embedded skins.
+skinCache = None  # Dictionary of skin file: [signature, DOM tuples, compiled attributes].
+skinCacheNodes = WeakKeyDictionary()  # Dictionary of element: (compiled attributes, index) for cached skin files.
+skinCacheTimer = None
+compiledNodes = WeakKeyDictionary()  # Dictionary of element: {(skinPath, ignore): (items, compiled attributes)}.
+parseCaches = []  # List of the result caches of the memoized parse functions.
+parseStatistics = {}  # Dictionary of attribute: [hits, misses, time spent on misses] of the memoized parse functions.
+parseAttribute = None  # Name of the attribute currently being applied by an AttributeParser.
 isVTISkin = False  # Temporary flag to suppress errors in OpenPLI.
 
 config.skin = ConfigSubsection()
@@ -151,6 +168,7 @@ def InitSkins():
 	if resolution[0] and resolution[1]:
 		gMainDC.getInstance().setResolution(resolution[0], resolution[1])
 		getDesktop(GUI_SKIN_ID).resize(eSize(resolution[0], resolution[1]))
+	clearParseCaches()  # The skin factor may have changed.
 	runCallbacks = True
 	# Load all XML templates.
 	reloadSkinTemplates()
@@ -158,6 +176,7 @@ def InitSkins():
 
 # Method to load a skin XML file into the skin data structures.
 #
+@profiled("loadSkin")
 def loadSkin(filename, scope=SCOPE_SKINS, desktop=getDesktop(GUI_SKIN_ID), screenID=GUI_SKIN_ID):
 	global windowStyles, resolutions
 	filename = resolveFilename(scope, filename)
@@ -166,7 +185,7 @@ def loadSkin(filename, scope=SCOPE_SKINS, desktop=getDesktop(GUI_SKIN_ID), scree
 	debugMode = "config.crash.debugSkin=True" in lines
 	if debugMode:
 		print(f"[Skin] Loading skin file '{filename}'.")
-	domSkin = fileReadXML(filename, source=MODULE_NAME)
+	domSkin = readSkinFile(filename, desktop)
 	if domSkin is not None:
 		# For loadSingleSkinData colors, bordersets etc. are applied one after
 		# the other in order of ascending priority.
@@ -210,6 +229,9 @@ def loadSkin(filename, scope=SCOPE_SKINS, desktop=getDesktop(GUI_SKIN_ID), scree
 def reloadSkins():
 	global colors, domScreens, fonts, menus, parameters, setups, switchPixmap
 	domScreens.clear()
+	embeddedSkins.clear()
+	compiledNodes.clear()
+	clearParseCaches()
 	colors.clear()
 	colors = {
 		"key_back": gRGB(0x00313131),
@@ -233,6 +255,91 @@ def reloadSkins():
 	InitSkins()
 
 
+# The compiled skin cache holds every loaded skin file as a tree of element
+# tuples, along with the attributes collected from its screens and widgets.
+# The pixmap file names are kept as written in the skin and are resolved on
+# every use, so that added or removed pixmaps are found.  A skin file is only taken
+# from the cache when its mtime and size as well as the desktop resolution
+# and the selected skins are unchanged, otherwise it is parsed again.
+#
+def readSkinCache():
+	global skinCache
+	if skinCache is None:
+		skinCache = {}
+		filename = resolveFilename(SCOPE_CONFIG, SKIN_CACHE)
+		try:
+			with open(filename, "rb") as fd:
+				version, cache = marshalLoad(fd)
+			if version == SKIN_CACHE_VERSION:
+				skinCache = cache
+		except FileNotFoundError:
+			pass
+		except Exception as err:
+			print(f"[Skin] Error: Unable to read skin cache '{filename}'!  ({err})")
+	return skinCache
+
+
+def writeSkinCache():
+	filename = resolveFilename(SCOPE_CONFIG, SKIN_CACHE)
+	try:
+		with open(f"{filename}.tmp", "wb") as fd:
+			marshalDump((SKIN_CACHE_VERSION, skinCache), fd)
+		rename(f"{filename}.tmp", filename)
+	except Exception as err:
+		print(f"[Skin] Error: Unable to write skin cache '{filename}'!  ({err})")
+		try:
+			unlink(f"{filename}.tmp")
+		except OSError:
+			pass
+
+
+def saveSkinCache():
+	global skinCacheTimer
+	if skinCacheTimer is None:
+		skinCacheTimer = eTimer()
+		skinCacheTimer.callback.append(writeSkinCache)
+	if not skinCacheTimer.isActive():
+		skinCacheTimer.start(SKIN_CACHE_DELAY, True)
+
+
+def elementToTuple(element):
+	return (element.tag, element.attrib, element.text, element.tail, tuple([elementToTuple(x) for x in element]))
+
+
+def tupleToElement(data):
+	tag, attrib, text, tail, children = data
+	element = Element(tag, attrib)
+	element.text = text
+	element.tail = tail
+	element.extend([tupleToElement(x) for x in children])
+	return element
+
+
+def readSkinFile(filename, desktop):
+	try:
+		status = stat(filename)
+	except OSError:
+		return fileReadXML(filename, source=MODULE_NAME)  # Leave the error reporting to fileReadXML.
+	cache = readSkinCache()
+	size = desktop.size()
+	signature = (status.st_mtime_ns, status.st_size, size.width(), size.height(), config.skin.primary_skin.value, config.skin.display_skin.value)
+	entry = cache.get(filename)
+	if entry and entry[0] == signature:
+		domSkin = tupleToElement(entry[1])
+	else:
+		domSkin = fileReadXML(filename, source=MODULE_NAME)
+		if domSkin is None:
+			if cache.pop(filename, None):
+				saveSkinCache()
+			return None
+		entry = cache[filename] = [signature, elementToTuple(domSkin), {}]
+		saveSkinCache()
+	attributes = entry[2]
+	for index, element in enumerate(domSkin.iter()):
+		skinCacheNodes[element] = (attributes, index)
+	return domSkin
+
+
 # Method to load a skinTemplates.xml if one exists or load the templates from the screens.
 #
 def loadSkinTemplates(skinTemplatesFileNames):
@@ -308,6 +415,52 @@ def attribDeprecationWarning(attribute, replacement):
 	print(f"[Skin] Warning: Attribute '{attribute}' has been deprecated, use '{replacement}' instead!")
 
 
+# The parse functions below that only depend on their arguments and the
+# skin colors, fonts and skin factor remember their recent results.  The
+# results are shared, so they must never be modified by the caller.  The
+# caches are cleared whenever skin data is loaded.
+#
+def memoizeParser(function):
+	cache = OrderedDict()
+	parseCaches.append(cache)
+	name = function.__name__
+
+	def parser(*args, **kwargs):
+		key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+		statistics = parseStatistics.get(parseAttribute or name)
+		if statistics is None:
+			statistics = parseStatistics[parseAttribute or name] = [0, 0, 0.0]
+		try:
+			result = cache[key]
+		except KeyError:
+			start = perf_counter()
+			result = cache[key] = function(*args, **kwargs)
+			statistics[2] += perf_counter() - start
+			statistics[1] += 1
+			if len(cache) > PARSE_CACHE_SIZE:
+				cache.popitem(last=False)
+		except TypeError:  # Arguments that can't be hashed are not cached.
+			return function(*args, **kwargs)
+		else:
+			cache.move_to_end(key)
+			statistics[0] += 1
+		return result
+
+	parser.__name__ = name
+	parser.__doc__ = function.__doc__
+	parser.uncached = function
+	return parser
+
+
+def clearParseCaches():
+	for cache in parseCaches:
+		cache.clear()
+
+
+def getParseStatistics():
+	return {attribute: tuple(statistics) for attribute, statistics in parseStatistics.items()}
+
+
 def parseOptions(options, attribute, value, default):
 	if options and isinstance(options, dict):
 		if value in options.keys():
@@ -321,6 +474,7 @@ def parseOptions(options, attribute, value, default):
 	return value
 
 
+@memoizeParser
 def parseAlphaTest(value):
 	options = {
 		"on": BT_ALPHATEST,
@@ -348,6 +502,7 @@ def parseBoolean(attribute, value):
 	return value.lower() in ("1", attribute, "enabled", "on", "true", "yes")
 
 
+@memoizeParser
 def parseColor(value, default=0x00FFFFFF):
 	if value[0] == "#":
 		try:
@@ -385,6 +540,7 @@ def parseColor(value, default=0x00FFFFFF):
 #         h      : Multiply by current font height. (Only to be used in elements where the font attribute is available, i.e. not "None")
 #         f      : Replace with getSkinFactor().
 #
+@memoizeParser
 def parseCoordinate(value, parent, size=0, font=None, scale=(1, 1)):
 	def scaleNumbers(coordinate, scale):
 		inNumber = False
@@ -442,6 +598,7 @@ def parseCoordinate(value, parent, size=0, font=None, scale=(1, 1)):
 	return 0 if result < 0 else result
 
 
+@memoizeParser
 def parseFont(value, scale=((1, 1), (1, 1))):
 	if ";" in value:
 		(name, size) = value.split(";")
@@ -471,6 +628,7 @@ def parseFont(value, scale=((1, 1), (1, 1))):
 	return gFont(name, int(size * scale[1][0] / scale[1][1]))
 
 
+@memoizeParser
 def parseGradient(value):
 	def validColor(value):
 		if value[0] == "#" and len(value) in (9, 7):
@@ -504,6 +662,7 @@ def parseGradient(value):
 	return (gradientColors[0], gradientColors[1], gradientColors[2], direction, alphaBlend)
 
 
+@memoizeParser
 def parseHorizontalAlignment(value):
 	options = {
 		"left": 0,  # RT_HALIGN_LEFT,
@@ -523,6 +682,7 @@ def parseInteger(value, default=0):
 	return value
 
 
+@memoizeParser
 def parseItemAlignment(value):
 	options = {
 		"default": eListbox.itemAlignLeftTop,
@@ -565,6 +725,7 @@ def parseListOrientation(value):
 	return options.get(value, 0b01)
 
 
+@memoizeParser
 def parseOrientation(value):
 	options = {
 		"orHorizontal": 0x00,
@@ -626,6 +787,7 @@ def parsePosition(value, scale, object=None, desktop=None, size=None):
 	return ePoint(*parseValuePair(value, scale, object, desktop, size))
 
 
+@memoizeParser
 def parseRadius(value):
 	data = [x.strip() for x in value.split(";")]
 	if len(data) == 2:
@@ -690,6 +852,7 @@ def parseScale2(s):
 	return val
 
 
+@memoizeParser
 def parseScale(value):
 	options = {
 		"none": 0,
@@ -757,6 +920,7 @@ def parseScale(value):
 	return parseOptions(options, "scale", value, 0)
 
 
+@memoizeParser
 def parseScrollbarMode(value):
 	options = {
 		"showOnDemand": eListbox.showOnDemand,
@@ -816,6 +980,7 @@ def parsePadding(attribute, value):
 	return padding
 
 
+@memoizeParser
 def parseVerticalAlignment(value):
 	options = {
 		"top": 0,  # RT_VALIGN_TOP,
@@ -826,6 +991,7 @@ def parseVerticalAlignment(value):
 	return parseOptions(options, "verticalAlignment", value, 1)
 
 
+@memoizeParser
 def parseWrap(value):
 	options = {
 		"noWrap": 0,
@@ -848,7 +1014,62 @@ def parseZoom(mode, zoomType):
 	return parseOptions(options, zoomType, mode, eListbox.zoomContentZoom)
 
 
-def collectAttributes(skinAttributes, node, context, skinPath=None, ignore=(), filenames=frozenset(("pixmap", "pointer", "seekPointer", "seek_pointer", "backgroundPixmap", "selectionPixmap", "sliderPixmap", "scrollbarBackgroundPixmap", "scrollbarForegroundPixmap", "scrollbarbackgroundPixmap", "scrollbarBackgroundPicture", "scrollbarSliderPicture"))):
+SKIN_FILENAMES = frozenset(("pixmap", "pointer", "seekPointer", "seek_pointer", "backgroundPixmap", "selectionPixmap", "sliderPixmap", "scrollbarBackgroundPixmap", "scrollbarForegroundPixmap", "scrollbarbackgroundPixmap", "scrollbarBackgroundPicture", "scrollbarSliderPicture"))
+
+
+def collectAttributes(skinAttributes, node, context, skinPath=None, ignore=(), filenames=SKIN_FILENAMES):
+	if filenames is SKIN_FILENAMES:
+		attributes, pos, size, font = getCompiledAttributes(node, skinPath, ignore)
+	else:
+		attributes, pos, size, font = compileAttributes(node, skinPath, ignore, filenames)
+	skinAttributes.extend(attributes)
+	if pos is not None:  # The "position" attribute must be after the all other attributes.
+		pos, size = context.parse(pos, size, font)
+		skinAttributes.append(("position", pos))
+	if size is not None:  # The "size" attribute must be after the "position" attribute.
+		skinAttributes.append(("size", size))
+
+
+# Compiled attributes are reused as long as the attributes of the element
+# have not changed.  Elements of cached skin files also keep them in the
+# skin cache so that they are not compiled again after a restart.  The pixmap
+# file names are compiled unresolved and are resolved through the cache of
+# resolveFilename() on every use.
+#
+def getCompiledAttributes(node, skinPath, ignore):
+	items = tuple(node.items())
+	key = (skinPath, ignore)
+	nodeCache = compiledNodes.get(node)
+	if nodeCache is None:
+		nodeCache = compiledNodes[node] = {}
+	compiled = nodeCache.get(key)
+	if not compiled or compiled[0] != items:
+		attributes, index = skinCacheNodes.get(node, (None, None))
+		if attributes is not None:
+			compiled = attributes.get((index, skinPath, ignore))
+			if not compiled or compiled[0] != items:
+				compiled = attributes[(index, skinPath, ignore)] = (items, compileAttributes(node, skinPath, ignore, ()))
+				saveSkinCache()
+		else:
+			compiled = (items, compileAttributes(node, skinPath, ignore, ()))
+		nodeCache[key] = compiled
+	attributes, pos, size, font = compiled[1]
+	if any(attrib in SKIN_FILENAMES for attrib, value in attributes):
+		attributes = tuple((attrib, resolveSkinFilename(value, skinPath) if attrib in SKIN_FILENAMES else value) for attrib, value in attributes)
+	return attributes, pos, size, font
+
+
+def resolveSkinFilename(value, skinPath):
+	# DEBUG: Why does a SCOPE_LCDSKIN image replace the GUI image?!?!?!
+	pngFile = resolveFilename(SCOPE_GUISKIN, value, path_prefix=skinPath)
+	if isfile(pngFile):
+		return pngFile
+	lcdFile = resolveFilename(SCOPE_LCDSKIN, value, path_prefix=skinPath)
+	return lcdFile if isfile(lcdFile) else pngFile
+
+
+def compileAttributes(node, skinPath, ignore, filenames):
+	skinAttributes = []
 	size = None
 	pos = None
 	font = None
@@ -858,13 +1079,7 @@ def collectAttributes(skinAttributes, node, context, skinPath=None, ignore=(), f
 		if attrib not in ignore:
 			newValue = value
 			if attrib in filenames:
-				# DEBUG: Why does a SCOPE_LCDSKIN image replace the GUI image?!?!?!
-				pngFile = resolveFilename(SCOPE_GUISKIN, value, path_prefix=skinPath)
-				if isfile(pngFile):
-					newValue = pngFile
-				else:
-					lcdFile = resolveFilename(SCOPE_LCDSKIN, value, path_prefix=skinPath)
-					newValue = lcdFile if isfile(lcdFile) else pngFile
+				newValue = resolveSkinFilename(value, skinPath)
 			# Bit of a hack this, really.  When a window has a flag (e.g. wfNoBorder)
 			# it needs to be set at least before the size is set, in order for the
 			# window dimensions to be calculated correctly in all situations.
@@ -891,11 +1106,7 @@ def collectAttributes(skinAttributes, node, context, skinPath=None, ignore=(), f
 		skinAttributes.append(("selectionZoom", selectionZoom))
 	if selectionZoomSize is not None:  # The "selectionZoomSize" attribute must be after the item size attributes.
 		skinAttributes.append(("selectionZoomSize", selectionZoomSize))
-	if pos is not None:  # The "position" attribute must be after the all other attributes.
-		pos, size = context.parse(pos, size, font)
-		skinAttributes.append(("position", pos))
-	if size is not None:  # The "size" attribute must be after the "position" attribute.
-		skinAttributes.append(("size", size))
+	return (tuple(skinAttributes), pos, size, font)
 
 
 class AttributeParser:
@@ -910,10 +1121,13 @@ class AttributeParser:
 			self.applyOne(attribute, value)
 
 	def applyOne(self, attribute, value):
+		global parseAttribute
+		parseAttribute = attribute
 		try:
 			getattr(self, attribute)(value)
 		except Exception as err:
 			print(f"[Skin] Error: Attribute '{attribute}' with value '{value}' in object of type '{self.guiObject.__class__.__name__}' ({err})!")
+		parseAttribute = None
 
 	def applyHorizontalScale(self, value):
 		return int(parseInteger(value) * self.scaleTuple[0][0] / self.scaleTuple[0][1])
@@ -1363,6 +1577,7 @@ def loadSingleSkinData(desktop, screenID, domSkin, pathSkin, scope=SCOPE_GUISKIN
 	"""Loads skin data like colors, windowstyle etc."""
 	assert domSkin.tag == "skin", "root element in skin must be 'skin'!"
 	global colors, fonts, menus, parameters, setups, screens, switchPixmap, resolutions, scrollLabelStyle
+	clearParseCaches()
 	for tag in domSkin.findall("output"):
 		scrnID = parseInteger(tag.attrib.get("id", GUI_SKIN_ID), GUI_SKIN_ID)
 		if scrnID == GUI_SKIN_ID:
@@ -2174,6 +2389,8 @@ def readSkin(screen, skin, names, desktop):
 			skin = screen.skin[0] % tuple([int(x * getSkinFactor()) for x in screen.skin[1:]])
 		else:
 			skin = screen.skin
+		myScreen = embeddedSkins.get(skin)
+	if myScreen is None and getattr(screen, "skin", None):
 		print(f"[Skin] Parsing embedded skin '{myName}'.")
 		if isinstance(skin, tuple):
 			for xml in skin:
@@ -2188,6 +2405,7 @@ def readSkin(screen, skin, names, desktop):
 		else:
 			myScreen = fromstring(skin)
 		if myScreen is not None:
+			embeddedSkins[skin] = myScreen
 			screen.parsedSkin = myScreen
 	if myScreen is None:
 		print("[Skin] No skin to read or screen to display.")
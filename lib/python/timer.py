@@ -1,10 +1,124 @@
 # -*- coding: utf-8 -*-
+from array import array
 from bisect import insort
+from heapq import heapify, heappop, heappush
+from itertools import count
+from sys import intern
 from time import time, localtime, mktime
 from enigma import eTimer
 import datetime
 
 
+# Repeated timers are expanded in local (wall clock) time, so that a timer keeps its time of day
+# across daylight saving changes. "repeated" is the weekday bitmask of TimerEntry, bit 0 is Monday.
+# Days on which the begin time does not exist (skipped by a daylight saving change) are left out.
+
+def _localDay(base, days):
+	return (base + datetime.timedelta(days=days)).timetuple()
+
+
+def _existsOnDay(base, days):
+	return localtime(mktime(_localDay(base, days))).tm_hour == base.hour
+
+
+def _daysUntil(base, target):
+	# number of whole days to add to base to reach or pass target (both naive local datetimes)
+	delta = target - base
+	return max(0, delta.days + (1 if delta.seconds or delta.microseconds else 0))
+
+
+def nextRepeatedOccurrence(begin, end, repeated, notBefore, now, findRunningEvent=True):
+	"""Return (begin, end) of the first repetition of a begin/end pair on the weekdays in the
+	repeated bitmask which starts at or after notBefore and, with findRunningEvent, has not ended
+	before now, otherwise has not begun before now."""
+	repeated &= 0x7F
+	if not repeated:
+		return begin, end
+	localbegin = datetime.datetime.fromtimestamp(begin)
+	localend = datetime.datetime.fromtimestamp(end)
+	localnow = datetime.datetime.fromtimestamp(now)
+	# jump close to the answer, one day less for notBefore as daylight saving may shift it by an hour
+	day = max(_daysUntil(localbegin, datetime.datetime.fromtimestamp(notBefore)) - 1, _daysUntil(localend if findRunningEvent else localbegin, localnow))
+	if day and not _existsOnDay(localbegin, day):
+		day += 1
+	while True:
+		candidate = localbegin + datetime.timedelta(days=day)
+		if repeated & (1 << candidate.weekday()) and mktime(candidate.timetuple()) >= notBefore and ((localend + datetime.timedelta(days=day)) >= localnow if findRunningEvent else candidate >= localnow):
+			return int(mktime(candidate.timetuple())), int(mktime(_localDay(localend, day)))
+		day += 1 if _existsOnDay(localbegin, day + 1) else 2
+
+
+def repeatedOccurrences(begin, end, repeated, windowBegin, windowEnd):
+	"""Yield (begin, end) of every repetition starting at or after begin whose begin lies in
+	[windowBegin, windowEnd)."""
+	repeated &= 0x7F
+	if not repeated:
+		return
+	localbegin = datetime.datetime.fromtimestamp(begin)
+	localend = datetime.datetime.fromtimestamp(end)
+	day = max(_daysUntil(localbegin, datetime.datetime.fromtimestamp(windowBegin)) - 1, 0)
+	while True:
+		candidate = localbegin + datetime.timedelta(days=day)
+		occurrence = int(mktime(candidate.timetuple()))
+		if occurrence >= windowEnd:
+			return
+		if repeated & (1 << candidate.weekday()) and occurrence >= windowBegin and (not day or _existsOnDay(localbegin, day)):
+			yield occurrence, int(mktime(_localDay(localend, day)))
+		day += 1
+
+
+# (time, code, message) log of a timer which has ended, capped to the last "limit" lines.
+# times and codes are kept in arrays and the (very repetitive) messages are interned,
+# so the thousands of processed timers of big autotimer setups stay small.
+class CompactTimerLog:
+	__slots__ = ("times", "codes", "messages", "limit")
+
+	def __init__(self, entries=(), limit=25):
+		entries = list(entries)[-limit:] if limit else []
+		self.limit = limit
+		self.times = array("q", [x[0] for x in entries])
+		self.codes = array("h", [x[1] for x in entries])
+		self.messages = [intern(x[2]) if type(x[2]) is str else x[2] for x in entries]
+
+	def append(self, entry):
+		if len(self.messages) >= self.limit:
+			if not self.limit:
+				return
+			del self.times[0]
+			del self.codes[0]
+			del self.messages[0]
+		self.times.append(entry[0])
+		self.codes.append(entry[1])
+		self.messages.append(intern(entry[2]) if type(entry[2]) is str else entry[2])
+
+	def remove(self, entry):
+		index = list(self).index(tuple(entry))
+		del self.times[index]
+		del self.codes[index]
+		del self.messages[index]
+
+	def clear(self):
+		self.__init__(limit=self.limit)
+
+	def __len__(self):
+		return len(self.messages)
+
+	def __iter__(self):
+		return zip(self.times, self.codes, self.messages)
+
+	def __getitem__(self, index):
+		return list(self)[index]
+
+	def __eq__(self, other):
+		try:
+			return list(self) == [tuple(x) for x in other]
+		except TypeError:
+			return NotImplemented
+
+	def __repr__(self):
+		return "CompactTimerLog(%r)" % list(self)
+
+
 class TimerEntry:
 	StateWaiting = 0
 	StatePrepared = 1
@@ -64,31 +178,7 @@ class TimerEntry:
 				now = self.end + 120
 			self.findRunningEvent = findRunningEvent
 			self.findNextEvent = findNextEvent
-			# to avoid problems with daylight saving, we need to calculate with localtime, in struct_time representation
-			localrepeatedbegindate = localtime(self.repeatedbegindate)
-			localbegin = localtime(self.begin)
-			localend = localtime(self.end)
-			localnow = localtime(now)
-
-			day = []
-			flags = self.repeated
-			for x in (0, 1, 2, 3, 4, 5, 6):
-				if flags & 1 == 1:
-					day.append(0)
-				else:
-					day.append(1)
-				flags >>= 1
-
-			# if day is NOT in the list of repeated days
-			# OR if the day IS in the list of the repeated days, check, if event is currently running... then if findRunningEvent is false, go to the next event
-			while ((day[localbegin.tm_wday] != 0) or (mktime(localrepeatedbegindate) > mktime(localbegin)) or
-				((day[localbegin.tm_wday] == 0) and ((findRunningEvent and localend < localnow) or ((not findRunningEvent) and localbegin < localnow)))):
-				localbegin = self.addOneDay(localbegin)
-				localend = self.addOneDay(localend)
-
-			# we now have a struct_time representation of begin and end in localtime, but we have to calculate back to (gmt) seconds since epoch
-			self.begin = int(mktime(localbegin))
-			self.end = int(mktime(localend))
+			self.begin, self.end = nextRepeatedOccurrence(self.begin, self.end, self.repeated, self.repeatedbegindate, now, findRunningEvent)
 			if self.begin == self.end:
 				self.end += 1
 
@@ -101,6 +191,10 @@ class TimerEntry:
 	def activate(self):
 		pass
 
+	# can be overridden, called when the entry is moved to processed_timers
+	def compact(self):
+		pass
+
 	# can be overridden
 	def timeChanged(self):
 		pass
@@ -150,6 +244,14 @@ class Timer:
 		self.timer_list = []
 		self.processed_timers = []
 
+		# timer_list stays sorted for everybody iterating over it, the next activation
+		# is taken from a heap of [activation time, sequence, entry] items instead.
+		# removed or re-keyed entries leave their old item behind with entry set to None.
+		self.activation_queue = []
+		self.queued_timers = {}
+		self.disabled_timers = set()
+		self.queue_sequence = count()
+
 		self.timer = eTimer()
 		self.timer.callback.append(self.calcNextActivation)
 		self.lastActivation = time()
@@ -173,6 +275,46 @@ class Timer:
 		limit = time() - (days * 3600 * 24)
 		self.processed_timers = [entry for entry in self.processed_timers if (entry.disabled and entry.repeated) or (entry.end and (entry.end > limit))]
 
+	def insertTimer(self, entry):
+		insort(self.timer_list, entry)
+		self.queueTimer(entry)
+
+	def removeTimer(self, entry):
+		self.timer_list.remove(entry)
+		self.unqueueTimer(entry)
+
+	def queueTimer(self, entry):
+		self.unqueueTimer(entry)
+		if entry.disabled:
+			self.disabled_timers.add(entry)
+		else:
+			item = [entry.getNextActivation(), next(self.queue_sequence), entry]
+			self.queued_timers[entry] = item
+			heappush(self.activation_queue, item)
+
+	def unqueueTimer(self, entry):
+		item = self.queued_timers.pop(entry, None)
+		if item is not None:
+			item[2] = None
+			if len(self.activation_queue) > 2 * len(self.queued_timers) + 64:
+				self.activation_queue = [item for item in self.activation_queue if item[2] is not None]
+				heapify(self.activation_queue)
+		self.disabled_timers.discard(entry)
+
+	# returns the enabled entry with the earliest activation time, or None
+	def getNextTimer(self):
+		queue = self.activation_queue
+		while queue:
+			when, sequence, entry = queue[0]
+			if entry is None:
+				heappop(queue)
+			elif entry.disabled or entry.getNextActivation() != when:
+				# the entry was changed behind our back, re-key it
+				self.queueTimer(entry)
+			else:
+				return entry
+		return None
+
 	def addTimerEntry(self, entry, noRecalc=0):
 		entry.processRepeated()
 
@@ -182,10 +324,11 @@ class Timer:
 		if entry.shouldSkip() or entry.state == TimerEntry.StateEnded or (entry.state == TimerEntry.StateWaiting and entry.disabled):
 			if entry not in self.processed_timers:
 				insort(self.processed_timers, entry)
+				entry.compact()
 			entry.state = TimerEntry.StateEnded
 		else:
-			if entry not in self.timer_list:
-				insort(self.timer_list, entry)
+			if entry not in self.queued_timers and entry not in self.disabled_timers:
+				self.insertTimer(entry)
 			if not noRecalc:
 				self.calcNextActivation()
 
@@ -231,12 +374,14 @@ class Timer:
 
 		min = int(now) + self.MaxWaitTime
 
-		self.timer_list and self.timer_list.sort()  # resort/refresh list, try to fix hanging timers
+		self.timer_list and self.timer_list.sort(key=lambda entry: entry.getNextActivation())  # resort/refresh list, try to fix hanging timers
+		for entry in [entry for entry in self.disabled_timers if not entry.disabled]:
+			self.queueTimer(entry)
 
 		# calculate next activation point
-		timer_list = [t for t in self.timer_list if not t.disabled]
-		if timer_list:
-			w = timer_list[0].getNextActivation()
+		entry = self.getNextTimer()
+		if entry is not None:
+			w = entry.getNextActivation()
 			if w < min:
 				min = w
 
@@ -254,8 +399,8 @@ class Timer:
 				self.processed_timers.remove(timer)
 		else:
 			try:
-				self.timer_list.remove(timer)
-			except:
+				self.removeTimer(timer)
+			except ValueError:
 				print("[timer] Failed to remove, not in list")
 				return
 		# give the timer a chance to re-enqueue
@@ -264,7 +409,7 @@ class Timer:
 		self.addTimerEntry(timer)
 
 	def doActivate(self, w):
-		self.timer_list.remove(w)
+		self.removeTimer(w)
 
 		# when activating a timer which has already passed,
 		# simply abort the timer. don't run trough all the stages.
@@ -280,7 +425,7 @@ class Timer:
 		# did this timer reached the last state?
 		if w.state < TimerEntry.StateEnded:
 			# no, sort it into active list
-			insort(self.timer_list, w)
+			self.insertTimer(w)
 		else:
 			# yes. Process repeated, and re-add.
 			if w.repeated:
@@ -290,6 +435,7 @@ class Timer:
 			else:
 				if w not in self.processed_timers:
 					insort(self.processed_timers, w)
+					w.compact()
 
 		self.stateChanged(w)
 
@@ -297,8 +443,8 @@ class Timer:
 		t = int(time()) + 1
 		# we keep on processing the first entry until it goes into the future.
 		while True:
-			timer_list = [tmr for tmr in self.timer_list if not tmr.disabled]
-			if timer_list and timer_list[0].getNextActivation() < t:
-				self.doActivate(timer_list[0])
+			entry = self.getNextTimer()
+			if entry is not None and entry.getNextActivation() < t:
+				self.doActivate(entry)
 			else:
 				break
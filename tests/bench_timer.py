@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# Activation latency benchmark for timer.Timer with large (autotimer like) timer lists.
+#
+# Run it from this directory with
+# PYTHONPATH=../lib/python/ python bench_timer.py [count ...]
+import sys
+import types
+from random import Random
+from time import time, perf_counter
+
+
+# timer.py only needs eTimer from enigma, a dummy one is enough to drive the scheduler by hand
+class eTimer:
+	def __init__(self):
+		self.callback = []
+
+	def start(self, msec, singleshot=False):
+		pass
+
+	def stop(self):
+		pass
+
+
+enigma = types.ModuleType("enigma")
+enigma.eTimer = eTimer
+sys.modules["enigma"] = enigma
+
+import timer
+
+
+class BenchTimerEntry(timer.TimerEntry):
+	def getNextActivation(self):
+		if self.state == self.StateEnded:
+			return self.end
+		return {self.StatePrepared: self.begin - self.prepare_time,
+				self.StateRunning: self.begin,
+				self.StateEnded: self.end}[self.state + 1]
+
+	def activate(self):
+		return True
+
+
+def bench(count, seed=4711):
+	rnd = Random(seed)
+	now = int(time())
+	scheduler = timer.Timer()
+	scheduler.MaxWaitTime = 86400 * 1000
+
+	entries = []
+	for x in range(count):
+		begin = now + rnd.randint(3600, 86400 * 14)
+		entry = BenchTimerEntry(begin, begin + rnd.randint(600, 7200))
+		entry.disabled = rnd.random() < 0.2
+		entries.append(entry)
+
+	# make a burst of 10% of the enabled entries due at once
+	due = [entry for entry in entries if not entry.disabled][:count // 10]
+	for entry in due:
+		entry.begin = now - 60
+		entry.end = now + 3600
+
+	start = perf_counter()
+	for entry in entries:
+		scheduler.addTimerEntry(entry, noRecalc=1)
+	add_time = perf_counter() - start
+
+	start = perf_counter()
+	scheduler.calcNextActivation()
+	burst_time = perf_counter() - start
+
+	start = perf_counter()
+	scheduler.calcNextActivation()
+	idle_time = perf_counter() - start
+
+	start = perf_counter()
+	for entry in entries[-100:]:
+		entry.begin += 60
+		entry.end += 60
+		scheduler.timeChanged(entry)
+	change_time = (perf_counter() - start) / 100
+
+	print("%6d timers: add %8.1f ms, burst of %d activations %8.1f ms (%.3f ms each), idle activation %7.3f ms, timeChanged %7.3f ms" % (count, add_time * 1000, len(due), burst_time * 1000, burst_time * 1000 / max(len(due), 1), idle_time * 1000, change_time * 1000))
+
+
+for count in [int(x) for x in sys.argv[1:]] or (1000, 10000):
+	bench(count)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Memory benchmark of processed (ended) timers, with and without TimerEntry.compact().
+#
+# Run it from this directory with
+# PYTHONPATH=../lib/python/ python bench_timer_memory.py [count ...]
+import sys
+import tracemalloc
+import types
+from random import Random
+from time import time
+
+
+# timer.py only needs eTimer from enigma
+class eTimer:
+	def __init__(self):
+		self.callback = []
+
+	def start(self, msec, singleshot=False):
+		pass
+
+	def stop(self):
+		pass
+
+
+enigma = types.ModuleType("enigma")
+enigma.eTimer = eTimer
+sys.modules["enigma"] = enigma
+
+import timer
+
+
+# the typical log of a recording, as written by RecordTimerEntry.activate
+LOG = [
+	(0, "prepare: %s"),
+	(0, "Filename calculated as: '%s'"),
+	(1, "prepare ok, writing meta information to '%s'"),
+	(3, "start recording"),
+	(5, "stop recording"),
+	(12, "record time changed, start prepare is now: %s"),
+	(15, "ok, retuned..."),
+]
+
+
+class BenchTimerEntry(timer.TimerEntry):
+	def __init__(self, begin, end, compact):
+		timer.TimerEntry.__init__(self, begin, end)
+		self.log_entries = []
+		self.compacted = compact
+
+	def getNextActivation(self):
+		return self.end
+
+	def activate(self):
+		return True
+
+	def compact(self):
+		if self.compacted:
+			self.log_entries = timer.CompactTimerLog(self.log_entries, 25)
+
+
+def build(count, compact, seed=4711):
+	rnd = Random(seed)
+	now = int(time())
+	scheduler = timer.Timer()
+	for x in range(count):
+		begin = now - rnd.randint(3600, 86400 * 14)
+		entry = BenchTimerEntry(begin, begin + rnd.randint(600, 7200), compact)
+		for y in range(rnd.randint(6, 60)):
+			code, msg = LOG[y % len(LOG)]
+			if "%s" in msg:
+				msg = msg % ("/media/hdd/movie/%d - Channel %d - Title.ts" % (begin, x % 200))
+			entry.log_entries.append((begin + y, code, msg))
+		entry.state = timer.TimerEntry.StateEnded
+		scheduler.addTimerEntry(entry, noRecalc=1)
+	return scheduler
+
+
+def bench(count):
+	results = []
+	for compact in (False, True):
+		tracemalloc.start()
+		scheduler = build(count, compact)
+		current = tracemalloc.get_traced_memory()[0]
+		tracemalloc.stop()
+		results.append(current)
+		del scheduler
+	print("%6d processed timers: list logs %8.1f KiB, compact logs %8.1f KiB (%.0f%%)" % (count, results[0] / 1024.0, results[1] / 1024.0, results[1] * 100.0 / results[0]))
+
+
+for count in [int(x) for x in sys.argv[1:]] or (1000, 10000):
+	bench(count)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Property test of the repeated timer calculation in timer.py against the former day by day
+# stepping of TimerEntry.processRepeated.
+#
+# Run it from this directory with
+# PYTHONPATH=../lib/python/ python test_timer_repeat.py
+import datetime
+import os
+import sys
+import types
+from random import Random
+from time import localtime, mktime, tzset
+
+
+# timer.py only needs eTimer from enigma
+class eTimer:
+	def __init__(self):
+		self.callback = []
+
+	def start(self, msec, singleshot=False):
+		pass
+
+	def stop(self):
+		pass
+
+
+enigma = types.ModuleType("enigma")
+enigma.eTimer = eTimer
+sys.modules["enigma"] = enigma
+
+from timer import nextRepeatedOccurrence, repeatedOccurrences
+import tests
+
+
+def addOneDay(timedatestruct):
+	oldHour = timedatestruct.tm_hour
+	newdate = (datetime.datetime(timedatestruct.tm_year, timedatestruct.tm_mon, timedatestruct.tm_mday, timedatestruct.tm_hour, timedatestruct.tm_min, timedatestruct.tm_sec) + datetime.timedelta(days=1)).timetuple()
+	if localtime(mktime(newdate)).tm_hour != oldHour:
+		return (datetime.datetime(timedatestruct.tm_year, timedatestruct.tm_mon, timedatestruct.tm_mday, timedatestruct.tm_hour, timedatestruct.tm_min, timedatestruct.tm_sec) + datetime.timedelta(days=2)).timetuple()
+	return newdate
+
+
+def steppedOccurrence(begin, end, repeated, repeatedbegindate, now, findRunningEvent):
+	localrepeatedbegindate = localtime(repeatedbegindate)
+	localbegin = localtime(begin)
+	localend = localtime(end)
+	localnow = localtime(now)
+	day = []
+	flags = repeated
+	for x in (0, 1, 2, 3, 4, 5, 6):
+		day.append(0 if flags & 1 == 1 else 1)
+		flags >>= 1
+	while ((day[localbegin.tm_wday] != 0) or (mktime(localrepeatedbegindate) > mktime(localbegin)) or
+		((day[localbegin.tm_wday] == 0) and ((findRunningEvent and localend < localnow) or ((not findRunningEvent) and localbegin < localnow)))):
+		localbegin = addOneDay(localbegin)
+		localend = addOneDay(localend)
+	return int(mktime(localbegin)), int(mktime(localend))
+
+
+def inDaylightSavingGap(t):
+	# the stepping moved begin and end apart when one of them hit a skipped hour, leave those out
+	lt = localtime(t)
+	return lt.tm_hour in (1, 2, 3)
+
+
+def randomTimer(rnd, base):
+	begin = base + rnd.randint(-86400 * 400, 86400 * 30)
+	while inDaylightSavingGap(begin):
+		begin += 3 * 3600
+	end = begin + rnd.choice((0, 60, 1800, 5400, rnd.randint(1, 6 * 3600)))
+	while inDaylightSavingGap(end):
+		end += 3 * 3600
+	return begin, end
+
+
+def test_next_occurrence(rnd, base, count):
+	for x in range(count):
+		begin, end = randomTimer(rnd, base)
+		repeated = rnd.randint(1, 127)
+		repeatedbegindate = rnd.choice((begin, begin + rnd.randint(0, 86400 * 20), begin - rnd.randint(0, 86400 * 20)))
+		now = base + rnd.randint(-86400, 86400 * 60)
+		findRunningEvent = rnd.random() < 0.5
+		expected = steppedOccurrence(begin, end, repeated, repeatedbegindate, now, findRunningEvent)
+		result = nextRepeatedOccurrence(begin, end, repeated, repeatedbegindate, now, findRunningEvent)
+		if result != expected:
+			raise tests.TestError("nextRepeatedOccurrence(%d, %d, %d, %d, %d, %s) returned %s, expected %s" % (begin, end, repeated, repeatedbegindate, now, findRunningEvent, result, expected))
+
+
+def test_occurrences(rnd, base, count):
+	for x in range(count):
+		begin, end = randomTimer(rnd, base)
+		repeated = rnd.randint(1, 127)
+		windowBegin = begin + rnd.randint(-86400 * 3, 86400 * 30)
+		windowEnd = windowBegin + rnd.randint(0, 86400 * 21)
+		expected = []
+		now = max(begin, windowBegin)
+		while True:
+			occurrence = steppedOccurrence(begin, end, repeated, begin, now, False)
+			if occurrence[0] >= windowEnd:
+				break
+			expected.append(occurrence)
+			now = occurrence[0] + 1
+		result = list(repeatedOccurrences(begin, end, repeated, windowBegin, windowEnd))
+		if result != expected:
+			raise tests.TestError("repeatedOccurrences(%d, %d, %d, %d, %d) returned %s, expected %s" % (begin, end, repeated, windowBegin, windowEnd, result, expected))
+
+
+for tz in ("CET", "America/New_York", "UTC", "Australia/Sydney"):
+	os.environ["TZ"] = tz
+	tzset()
+	rnd = Random(tz)
+	base = int(mktime((2024, 3, 20, 12, 0, 0, 0, 0, -1)))
+	test_next_occurrence(rnd, base, 2000)
+	test_occurrences(rnd, base, 500)
+	print("[test_timer_repeat] %s ok" % tz)